@@ -0,0 +1,387 @@
+"""保存前のバックアップ（zip メンバー単位の内容アドレス型ストア）
+
+在庫表・売上表を書き換える直前に、ブックの zip メンバー（シート XML など）を
+settings.json と同じフォルダの backups/ に保存する。
+
+- objects/<先頭2文字>/<SHA-256>: メンバーの圧縮済みデータ（zip 内のバイト列そのまま）。同じ内容は 1 つだけ保存
+- manifests/<実行ID>-<パスのハッシュ>.json: 1 ファイル分のメンバーの並び・属性と参照するオブジェクト
+- 同じファイルの直前のバックアップと CRC・サイズが同じメンバーは読まずに同じオブジェクトを参照する
+  （部分書き換え保存では変更していないシートのバイト列が変わらないため、コストは変わったメンバーの分だけ）
+- 1 回の転記（在庫表→売上表のまとめて転記を含む）で書き換えるファイルは同じ実行ID にまとめ、実行単位で復元する
+  （同じ実行でファイルを 2 回以上書き換えても、バックアップは実行前の状態の 1 つだけ）
+- BACKUP_KEEP_RUNS 回・BACKUP_MAX_DAYS 日・BACKUP_MAX_MB を超えた古い実行から削除し、参照されないオブジェクトも削除
+  （自動更新の実行は転記とは別に BACKUP_KEEP_RUNS 回まで残し、監視中の書き込みで転記のバックアップを押し出さない）
+"""
+import datetime
+import hashlib
+import json
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+
+import session_cache
+from settings import Settings
+
+BACKUP_VERSION = 1
+OBJECTS_DIR_NAME = "objects"
+MANIFESTS_DIR_NAME = "manifests"
+MANIFEST_SUFFIX = ".json"
+RUN_ID_FORMAT = "%Y%m%d-%H%M%S-%f"
+# 実行の種類（manifest の origin）。回数の上限は種類ごとに数える
+ORIGIN_TRANSFER = "transfer"
+ORIGIN_WATCH = "watch"
+_LOCAL_HEADER = struct.Struct("<4s22xHH")
+# 参照されないオブジェクトでも、作成からこの秒数以内のものは削除しない（別プロセスで作成中のバックアップ用）
+ORPHAN_GRACE_SEC = 600
+# 同じプロセス内のバックアップ・削除を直列にする（ストアのインスタンスによらない）
+_lock = threading.Lock()
+
+
+def new_run_id():
+    """実行ID（日時。名前順 = 作成順）"""
+    return datetime.datetime.now().strftime(RUN_ID_FORMAT)
+
+
+def run_time(run):
+    """実行ID の日時（形式が違えば None）"""
+    try:
+        return datetime.datetime.strptime(run, RUN_ID_FORMAT)
+    except ValueError:
+        return None
+
+
+def _path_key(path):
+    return hashlib.sha256(os.path.normcase(os.path.abspath(path)).encode("utf-8")).hexdigest()[:16]
+
+
+def _member_key(member):
+    """直前のバックアップと同じメンバーとみなすキー（名前・圧縮方式・CRC・サイズ）"""
+    return member["name"], member["method"], member["crc"], member["compress_size"], member["file_size"]
+
+
+def _read_raw(fp, info):
+    """zip メンバーの圧縮済みデータをそのまま読む"""
+    fp.seek(info.header_offset)
+    signature, name_len, extra_len = _LOCAL_HEADER.unpack(fp.read(_LOCAL_HEADER.size))
+    if signature != b"PK\x03\x04":
+        raise zipfile.BadZipFile(f"zip ヘッダーが不正です: {info.filename}")
+    fp.seek(info.header_offset + _LOCAL_HEADER.size + name_len + extra_len)
+    data = fp.read(info.compress_size)
+    if len(data) != info.compress_size:
+        raise zipfile.BadZipFile(f"zip データが途中で終わっています: {info.filename}")
+    return data
+
+
+def _decompress(member, raw):
+    if member["method"] == zipfile.ZIP_STORED:
+        data = raw
+    elif member["method"] == zipfile.ZIP_DEFLATED:
+        data = zlib.decompressobj(-15).decompress(raw)
+    else:
+        raise ValueError(f"対応していない圧縮方式です: {member['name']}")
+    if zlib.crc32(data) & 0xFFFFFFFF != member["crc"]:
+        raise ValueError(f"バックアップのデータが壊れています: {member['name']}")
+    return data
+
+
+@dataclass
+class Run:
+    """1 回の転記で作成したバックアップ（manifests は書き換えたファイルごと）"""
+    run: str
+    manifests: list = field(default_factory=list)
+
+    @property
+    def created(self):
+        return run_time(self.run)
+
+    @property
+    def origin(self):
+        return self.manifests[0].get("origin", ORIGIN_TRANSFER) if self.manifests else ORIGIN_TRANSFER
+
+    @property
+    def sources(self):
+        return [manifest["source"] for manifest in self.manifests]
+
+    @property
+    def stored_bytes(self) -> int:
+        """この実行で新たに保存したオブジェクトのバイト数"""
+        return sum(manifest.get("stored_bytes", 0) for manifest in self.manifests)
+
+    def describe(self) -> str:
+        names = ", ".join(f"{manifest['label']}（{os.path.basename(manifest['source'])}）" for manifest in self.manifests)
+        if self.origin == ORIGIN_WATCH:
+            names += "（自動更新）"
+        created = self.created
+        return f"{created:%Y-%m-%d %H:%M:%S} {names}" if created else f"{self.run} {names}"
+
+
+class BackupStore:
+    def __init__(self, directory, keep_runs=0, max_days=0, max_bytes=0):
+        self.directory = directory
+        # 0 はそれぞれ無制限
+        self.keep_runs = keep_runs
+        self.max_days = max_days
+        self.max_bytes = max_bytes
+
+    @property
+    def objects_dir(self):
+        return os.path.join(self.directory, OBJECTS_DIR_NAME)
+
+    @property
+    def manifests_dir(self):
+        return os.path.join(self.directory, MANIFESTS_DIR_NAME)
+
+    def _object_path(self, object_id):
+        return os.path.join(self.objects_dir, object_id[:2], object_id)
+
+    def _manifest_names(self):
+        try:
+            return sorted(n for n in os.listdir(self.manifests_dir) if n.endswith(MANIFEST_SUFFIX))
+        except OSError:
+            return []
+
+    def _load_manifest(self, name):
+        try:
+            with open(os.path.join(self.manifests_dir, name), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != BACKUP_VERSION:
+            return None
+        manifest["file"] = name
+        return manifest
+
+    def _latest_manifest(self, path):
+        suffix = f"-{_path_key(path)}{MANIFEST_SUFFIX}"
+        for name in reversed(self._manifest_names()):
+            if name.endswith(suffix):
+                manifest = self._load_manifest(name)
+                if manifest is not None:
+                    return manifest
+        return None
+
+    def _put_object(self, raw):
+        """raw を保存してオブジェクトID と新たに書いたバイト数を返す（同じ内容があれば書かない）"""
+        object_id = hashlib.sha256(raw).hexdigest()
+        object_path = self._object_path(object_id)
+        if os.path.exists(object_path):
+            return object_id, 0
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = f"{object_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, object_path)
+        return object_id, len(raw)
+
+    def backup(self, path, label, run=None, evict=True, origin=ORIGIN_TRANSFER, verbose=False):
+        """path（xlsx）のバックアップを作成して manifest（dict）を返す。
+
+        同じ実行ID のバックアップが既にあれば（保存の再試行・自動更新の同じ周期での再書き込みなど）
+        実行前の状態としてそれを返す。
+        evict: 作成後に古い実行を削除する（復元中は復元元を消さないよう False）
+        origin: 実行の種類（ORIGIN_TRANSFER / ORIGIN_WATCH）。verbose: 作成したバックアップを表示する
+        """
+        run = run or new_run_id()
+        stat = os.stat(path)
+        with _lock:
+            previous = self._latest_manifest(path)
+            if previous is not None and previous["run"] == run:
+                return previous
+            known = {_member_key(member): member["object"] for member in previous["members"]} if previous else {}
+            members = []
+            stored_bytes = 0
+            read_members = 0
+            with open(path, "rb") as fp, zipfile.ZipFile(fp) as zf:
+                for info in zf.infolist():
+                    member = {
+                        "name": info.filename,
+                        "method": info.compress_type,
+                        "crc": info.CRC,
+                        "compress_size": info.compress_size,
+                        "file_size": info.file_size,
+                        "date_time": list(info.date_time),
+                        "external_attr": info.external_attr,
+                    }
+                    object_id = known.get(_member_key(member))
+                    if object_id is None or not os.path.exists(self._object_path(object_id)):
+                        object_id, written = self._put_object(_read_raw(fp, info))
+                        stored_bytes += written
+                        read_members += 1
+                    member["object"] = object_id
+                    members.append(member)
+            manifest = {
+                "version": BACKUP_VERSION,
+                "run": run,
+                "source": os.path.abspath(path),
+                "label": label,
+                "origin": origin,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "stored_bytes": stored_bytes,
+                "members": members,
+            }
+            os.makedirs(self.manifests_dir, exist_ok=True)
+            name = f"{run}-{_path_key(path)}{MANIFEST_SUFFIX}"
+            tmp_path = os.path.join(self.manifests_dir, f".{name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, os.path.join(self.manifests_dir, name))
+            manifest["file"] = name
+        if verbose:
+            print(f"バックアップを作成しました: {label} {read_members}/{len(members)}メンバーを読み込み"
+                  f" 新規 {stored_bytes / 1024:.0f}KB")
+        if evict:
+            self.evict(keep={run})
+        return manifest
+
+    def runs(self):
+        """バックアップの一覧 [Run, ...]（新しい順）"""
+        runs = {}
+        for name in self._manifest_names():
+            manifest = self._load_manifest(name)
+            if manifest is not None:
+                runs.setdefault(manifest["run"], Run(manifest["run"])).manifests.append(manifest)
+        return [runs[run] for run in sorted(runs, reverse=True)]
+
+    def get_run(self, run):
+        for item in self.runs():
+            if item.run == run:
+                return item
+        raise KeyError(f"バックアップが見つかりません: {run}")
+
+    def restore_file(self, manifest, path=None):
+        """manifest のファイルを path（省略時は元の場所）に復元する。一時ファイルに書いてから置き換える"""
+        path = path or manifest["source"]
+        # 置き換え前に全メンバーを確認し、欠けていれば元のファイルに触れない
+        for member in manifest["members"]:
+            if not os.path.exists(self._object_path(member["object"])):
+                raise ValueError(f"バックアップのデータが見つかりません: {member['name']}")
+        tmp_path = os.path.join(os.path.dirname(os.path.abspath(path)), f".~{os.path.basename(path)}.restore.tmp")
+        try:
+            with zipfile.ZipFile(tmp_path, "w") as zf:
+                for member in manifest["members"]:
+                    with open(self._object_path(member["object"]), "rb") as f:
+                        data = _decompress(member, f.read())
+                    info = zipfile.ZipInfo(member["name"], tuple(member["date_time"]))
+                    info.external_attr = member["external_attr"]
+                    info.compress_type = member["method"]
+                    zf.writestr(info, data)
+            session_cache.invalidate(path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def restore(self, run):
+        """実行ID run のバックアップを元の場所に復元し、復元したパスのリストを返す。
+
+        復元前の状態も新しい実行としてバックアップする（復元を取り消せるように）。
+        古い実行の削除は復元が終わってから行い、復元元と復元前の実行は残す。
+        """
+        item = self.get_run(run)
+        undo_run = new_run_id()
+        for manifest in item.manifests:
+            if os.path.exists(manifest["source"]):
+                # Excel で開かれていれば PermissionError（何も復元しない）
+                with open(manifest["source"], "r+b"):
+                    pass
+        for manifest in item.manifests:
+            if os.path.exists(manifest["source"]):
+                self.backup(manifest["source"], f"{manifest['label']}（復元前）", undo_run, evict=False)
+        paths = [self.restore_file(manifest) for manifest in item.manifests]
+        self.evict(keep={run, undo_run})
+        return paths
+
+    def evict(self, keep=()):
+        """保持期間・回数・容量を超えた古い実行を削除し、参照されないオブジェクトを削除する（keep の実行ID は残す）"""
+        with _lock:
+            runs = self.runs()
+            removed = set()
+            if self.keep_runs > 0:
+                # 種類ごとに keep の実行を数に含め、残りの枠を新しい順に割り当てる
+                for origin in {item.origin for item in runs}:
+                    group = [item for item in runs if item.origin == origin]
+                    kept = sum(1 for item in group if item.run in keep)
+                    others = [item.run for item in group if item.run not in keep]
+                    removed.update(others[max(0, self.keep_runs - kept):])
+            if self.max_days > 0:
+                limit = datetime.datetime.now() - datetime.timedelta(days=self.max_days)
+                removed.update(item.run for item in runs if item.created and item.created < limit)
+            removed.difference_update(keep)
+            for item in runs:
+                if item.run in removed:
+                    self._remove_run(item)
+            runs = [item for item in runs if item.run not in removed]
+            objects = self._object_sizes()
+            referenced = {member["object"] for item in runs for manifest in item.manifests
+                          for member in manifest["members"]}
+            recent = datetime.datetime.now().timestamp() - ORPHAN_GRACE_SEC
+            for object_id in set(objects) - referenced:
+                size, mtime = objects[object_id]
+                if mtime < recent:
+                    self._discard(self._object_path(object_id))
+                    objects.pop(object_id)
+            objects = {object_id: size for object_id, (size, _) in objects.items()}
+            if self.max_bytes <= 0:
+                return
+            # 容量超過: 古い実行から削除し、他の実行から参照されなくなったオブジェクトの分だけ減らす
+            total = sum(objects.values())
+            for item in [item for item in reversed(runs) if item.run not in keep]:
+                if total <= self.max_bytes or len(runs) <= 1:
+                    break
+                runs.remove(item)
+                self._remove_run(item)
+                still = {member["object"] for other in runs for manifest in other.manifests
+                         for member in manifest["members"]}
+                for manifest in item.manifests:
+                    for member in manifest["members"]:
+                        object_id = member["object"]
+                        if object_id not in still and object_id in objects:
+                            self._discard(self._object_path(object_id))
+                            total -= objects.pop(object_id)
+
+    def _remove_run(self, item):
+        for manifest in item.manifests:
+            self._discard(os.path.join(self.manifests_dir, manifest["file"]))
+
+    def _object_sizes(self):
+        """{オブジェクトID: (サイズ, 更新時刻)}"""
+        sizes = {}
+        try:
+            prefixes = os.listdir(self.objects_dir)
+        except OSError:
+            return sizes
+        for prefix in prefixes:
+            directory = os.path.join(self.objects_dir, prefix)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                sizes[name] = stat.st_size, stat.st_mtime
+        return sizes
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def from_settings():
+    """Settings に従ったバックアップストアを返す（無効設定時は None）"""
+    if not Settings.BACKUP_ENABLED:
+        return None
+    return BackupStore(Settings.backup_dir(), int(Settings.BACKUP_KEEP_RUNS), Settings.BACKUP_MAX_DAYS,
+                       int(Settings.BACKUP_MAX_MB * 1024 * 1024))
@@ -0,0 +1,4 @@
+"""転記処理のベンチマーク（合成ブック生成と計測）
+
+    python -m bench.run --months 12 --ids 300 --stock-rows 2000 --sales-rows 20000
+"""
@@ -0,0 +1,104 @@
+"""ベンチマーク用の合成ブック生成
+
+実運用のファイルと同じレイアウト（Positions の行・列番号）で
+単価表・在庫表・売上表を作成する。Excel・画面は不要。
+"""
+import os
+import random
+
+import openpyxl as opx
+
+import engine
+
+PRICE_FILE_NAME = "price.xlsx"
+STOCK_FILE_NAME = "stock.xlsx"
+SALES_FILE_NAME = "sales.xlsx"
+
+
+def product_ids(count):
+    return [f"R{index:05}" for index in range(count)]
+
+
+def year_months(start_year, months):
+    year, month = start_year, 1
+    for _ in range(months):
+        yield engine.to_year_month(year, month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def write_price_table(path, months, ids, positions, start_year=2025, seed=0):
+    """一般総平均シート: 1 行目に年月見出し、ID 行・単価行に月ごとの ID/単価を横に並べる（月の間に空列 1 列）"""
+    rng = random.Random(seed)
+    workbook = opx.Workbook()
+    sheet = workbook.active
+    sheet.title = engine.PRICE_SHEET_NAME
+    column = 2
+    for year_month in year_months(start_year, months):
+        sheet.cell(row=1, column=column, value=int(year_month))
+        for offset, id in enumerate(ids):
+            sheet.cell(row=positions.id_row_in_price, column=column + offset, value=id)
+            sheet.cell(row=positions.price_row_in_price, column=column + offset,
+                       value=round(rng.uniform(500, 5000), 1))
+        column += len(ids) + 1
+    workbook.save(path)
+
+
+def write_stock_workbook(path, months, ids, rows, positions, start_year=2025, seed=1):
+    """年月ごとに YYYYMM在庫 シートを作り、データ開始行から rows 行の ID・単価・数量・金額（数式）を置く"""
+    rng = random.Random(seed)
+    workbook = opx.Workbook()
+    workbook.remove(workbook.active)
+    qty_col = positions.price_column_in_stock + 1
+    amount_col = positions.price_column_in_stock + 2
+    price_letter = opx.utils.get_column_letter(positions.price_column_in_stock)
+    qty_letter = opx.utils.get_column_letter(qty_col)
+    for year_month in year_months(start_year, months):
+        sheet = workbook.create_sheet(f"{year_month}在庫")
+        sheet.cell(row=1, column=1, value=f"{year_month} 在庫表")
+        for offset in range(rows):
+            row = positions.data_start_row_in_stock + offset
+            sheet.cell(row=row, column=positions.id_column_in_stock, value=rng.choice(ids))
+            sheet.cell(row=row, column=positions.price_column_in_stock, value=0)
+            sheet.cell(row=row, column=qty_col, value=rng.randint(1, 50))
+            sheet.cell(row=row, column=amount_col, value=f"={price_letter}{row}*{qty_letter}{row}")
+    workbook.save(path)
+
+
+def write_sales_workbook(path, ids, rows, positions, seed=2):
+    """売上表: 1 行目が見出し、以降 rows 行に ID・売上金額・売上数量を置き、最終行に合計の数式"""
+    rng = random.Random(seed)
+    workbook = opx.Workbook()
+    sheet = workbook.active
+    sheet.title = "売上分析表"
+    headers = {
+        positions.id_column_in_sales: "商品ID",
+        positions.sales_column_in_sales: "売上金額",
+        positions.sales_num_column_in_sales: "売上数量",
+        positions.profit_column_in_sales: "利益",
+        positions.profit_rate_column_in_sales: "利益率",
+    }
+    for column, text in headers.items():
+        sheet.cell(row=1, column=column, value=text)
+    for row in range(2, rows + 2):
+        qty = rng.randint(1, 20)
+        sheet.cell(row=row, column=1, value=f"得意先{row % 37:02}")
+        sheet.cell(row=row, column=positions.id_column_in_sales, value=rng.choice(ids))
+        sheet.cell(row=row, column=positions.sales_num_column_in_sales, value=qty)
+        sheet.cell(row=row, column=positions.sales_column_in_sales, value=qty * rng.randint(600, 6000))
+    sales_letter = opx.utils.get_column_letter(positions.sales_column_in_sales)
+    sheet.cell(row=rows + 2, column=positions.sales_column_in_sales, value=f"=SUM({sales_letter}2:{sales_letter}{rows + 1})")
+    workbook.save(path)
+
+
+def generate(directory, months=12, id_count=300, stock_rows=2000, sales_rows=20000, positions=None):
+    """directory に 3 ファイルを作成し、(単価表, 在庫表, 売上表) のパスを返す"""
+    positions = positions or engine.Positions.from_defaults()
+    os.makedirs(directory, exist_ok=True)
+    ids = product_ids(id_count)
+    price_path = os.path.join(directory, PRICE_FILE_NAME)
+    stock_path = os.path.join(directory, STOCK_FILE_NAME)
+    sales_path = os.path.join(directory, SALES_FILE_NAME)
+    write_price_table(price_path, months, ids, positions)
+    write_stock_workbook(stock_path, months, ids, stock_rows, positions)
+    write_sales_workbook(sales_path, ids, sales_rows, positions)
+    return price_path, stock_path, sales_path
@@ -0,0 +1,203 @@
+"""転記処理のベンチマーク
+
+合成ブックを生成し、各処理のフェーズ別所要時間（index / load / transfer / save）と
+ピークメモリ（tracemalloc）を計測する。結果は JSONL に追記し、同じ条件の
+前回結果との比較を表示する。各回の計測前に生成直後のブックをコピーし直すため、
+どの回も転記・保存まで行う（保存前バックアップと実行ログは無効にして計測する）。
+
+    python -m bench.run --months 12 --ids 300 --stock-rows 2000 --sales-rows 20000
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+import engine
+import xlsx_reader
+from bench import generate
+from settings import Settings
+
+DEFAULT_RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+
+
+def _months(months):
+    all_months = list(generate.year_months(2025, months))
+    # 単独月は最後の月（単価表の末尾で次月見出しが無いケース）を対象にする
+    return all_months[0], all_months[-1], all_months[-1]
+
+
+def _operations(paths, months, positions):
+    price_path, stock_path, sales_path = paths
+    first, last, target = _months(months)
+    return {
+        "transfer_stock": lambda: engine.transfer_stock(price_path, stock_path, target, positions),
+        "transfer_stock_range": lambda: engine.transfer_stock_range(price_path, stock_path, first, last, positions),
+        "transfer_sales": lambda: engine.transfer_sales(stock_path, sales_path, target, positions),
+        "transfer_all": lambda: engine.transfer_stock_and_sales(price_path, stock_path, sales_path, target, positions),
+    }
+
+
+# 在庫表へ単価を転記済みのブックから計測する処理（生成直後の在庫表には単価が無く、売上表を保存しないため）
+STOCKED_OPERATIONS = ("transfer_sales",)
+
+
+def _stocked_sources(sources, directory, months, positions):
+    """生成直後のブックを directory にコピーし、在庫表へ対象月の単価を転記したパスを返す（計測外）"""
+    os.makedirs(directory, exist_ok=True)
+    paths = tuple(os.path.join(directory, os.path.basename(source)) for source in sources)
+    _fresh_copy(sources, paths)
+    engine.transfer_stock(paths[0], paths[1], _months(months)[2], positions)
+    return paths
+
+
+def _fresh_copy(sources, paths):
+    """生成直後のブックを計測用のパスへコピーし直す（前回の転記結果が残っていると保存まで進まないため）"""
+    for source, path in zip(sources, paths):
+        shutil.copy2(source, path)
+
+
+def _measure(operation, repeat, trace_memory, prepare):
+    runs = []
+    for _ in range(repeat):
+        prepare()
+        start = time.perf_counter()
+        result = operation()
+        runs.append((time.perf_counter() - start, result))
+    best_time, best = min(runs, key=lambda run: run[0])
+    record = {
+        "wall": round(best_time, 4),
+        "wall_median": round(statistics.median(run[0] for run in runs), 4),
+        "phases": {name: round(sec, 4) for name, sec in best.timings.items()},
+        "updated": best.updated,
+        "scanned": best.scanned,
+        # 全回で保存まで行ったか（False なら保存時間を含まない計測）
+        "saved": all(any(phase.endswith("save") for phase in run[1].timings) for run in runs),
+    }
+    if trace_memory:
+        prepare()
+        tracemalloc.start()
+        try:
+            operation()
+            record["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        finally:
+            tracemalloc.stop()
+    return record
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _previous(results_path, params):
+    previous = None
+    try:
+        with open(results_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("params") == params:
+                    previous = record
+    except OSError:
+        pass
+    return previous
+
+
+def _print_report(record, previous):
+    print(f"条件: {record['params']}")
+    for name, data in record["results"].items():
+        phases = ", ".join(f"{phase} {sec:.3f}s" for phase, sec in data["phases"].items())
+        line = f"{name:22} {data['wall']:.3f}s ({phases})"
+        if "peak_mb" in data:
+            line += f" peak {data['peak_mb']:.1f}MB"
+        if previous and name in previous.get("results", {}):
+            before = previous["results"][name]["wall"]
+            if before:
+                line += f"  前回比 {data['wall'] / before:.2f}x"
+        print(line)
+    if previous:
+        print(f"前回: {previous.get('timestamp')} ({previous.get('revision') or '-'})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="転記処理のベンチマーク")
+    parser.add_argument("--months", type=int, default=12, help="単価表・在庫表の月数")
+    parser.add_argument("--ids", type=int, default=300, help="単価表の ID 数（1 か月あたり）")
+    parser.add_argument("--stock-rows", type=int, default=2000, help="在庫表 1 シートあたりの行数")
+    parser.add_argument("--sales-rows", type=int, default=20000, help="売上表の行数")
+    parser.add_argument("--repeat", type=int, default=3, help="各処理の繰り返し回数（最速値を採用）")
+    parser.add_argument("--no-memory", action="store_true", help="ピークメモリを計測しない")
+    parser.add_argument("--workdir", help="合成ブックの作成先（省略時は一時フォルダ）")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH, help="結果を追記する JSONL")
+    parser.add_argument("--session-cache", action="store_true",
+                        help="セッションキャッシュを有効にして計測（省略時は毎回ブックを読む）")
+    parser.add_argument("--reader", choices=xlsx_reader.BACKENDS, default=Settings.get_default_value("READER_BACKEND"),
+                        help="入力ブックの読み込み方式（省略時は設定の既定値）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    params = {"months": args.months, "ids": args.ids, "stock_rows": args.stock_rows, "sales_rows": args.sales_rows}
+    # 繰り返し計測で 2 回目以降がメモリ上のデータを使わないよう、既定では無効にする
+    Settings.SESSION_CACHE_ENABLED = args.session_cache
+    # 計測対象外の書き込み（backups/ への保存前バックアップ・logs/ の実行ログ）を作業フォルダ外に残さない
+    Settings.BACKUP_ENABLED = False
+    Settings.RUN_LOG_ENABLED = False
+    if args.session_cache:
+        params["session_cache"] = True
+    Settings.READER_BACKEND = args.reader
+    params["reader"] = args.reader
+    positions = engine.Positions.from_defaults()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        start = time.perf_counter()
+        sources = generate.generate(os.path.join(workdir, "source"), args.months, args.ids, args.stock_rows,
+                                    args.sales_rows, positions)
+        print(f"合成ブック生成 {time.perf_counter() - start:.1f}s: {workdir}", file=sys.stderr)
+        paths = tuple(os.path.join(workdir, os.path.basename(source)) for source in sources)
+        stocked = _stocked_sources(sources, os.path.join(workdir, "stocked"), args.months, positions)
+        results = {}
+        for name, operation in _operations(paths, args.months, positions).items():
+            print(f"計測中: {name}", file=sys.stderr)
+            source = stocked if name in STOCKED_OPERATIONS else sources
+            results[name] = _measure(operation, args.repeat, not args.no_memory,
+                                     lambda: _fresh_copy(source, paths))
+            if not results[name]["saved"]:
+                print(f"警告: {name} で保存が行われなかった回があります", file=sys.stderr)
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    previous = _previous(args.results, params)
+    _print_report(record, previous)
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
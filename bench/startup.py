@@ -0,0 +1,98 @@
+"""起動時間のベンチマーク
+
+新しい Python プロセスで GUI・CLI のモジュールを import するまでの時間（インタプリタの起動を含む）を
+計測し、起動時に読み込まれた重いモジュール（openpyxl・NumPy）を表示する。結果は bench.run と同じ
+JSONL に追記し、前回結果との比較を表示する。画面は不要（ウィンドウは作成しない）。
+
+    python -m bench.startup
+    python -m bench.startup --max-ratio 1.2   # 前回より 20% 以上遅ければ終了コード 1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.run import DEFAULT_RESULTS_PATH, _git_revision, _previous, _print_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 起動時に読み込まれていないことを確認するモジュール
+HEAVY_MODULES = ("openpyxl", "numpy")
+TARGETS = {
+    "import_gui": "gui",
+    "import_cli": "cli",
+}
+
+
+def _measure(module, repeat):
+    """module を import する子プロセスを repeat 回起動し、(所要時間のリスト, 読み込まれた重いモジュール) を返す"""
+    code = (f"import sys, {module}; "
+            f"print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    times = []
+    loaded = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                                   timeout=120)
+        times.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{module} の import に失敗しました: {completed.stderr.strip()}")
+        for line in completed.stdout.splitlines():
+            if line.startswith("loaded:"):
+                loaded = [name for name in line[len("loaded:"):].split(",") if name]
+    return times, loaded
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="起動時間のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数（最速値を採用）")
+    parser.add_argument("--max-ratio", type=float, help="前回比がこれを超えたら終了コード 1")
+    parser.add_argument("--results", default=DEFAULT_RESULTS_PATH, help="結果を追記する JSONL")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    params = {"benchmark": "startup"}
+    results = {}
+    for name, module in TARGETS.items():
+        print(f"計測中: {name}", file=sys.stderr)
+        times, loaded = _measure(module, args.repeat)
+        results[name] = {
+            "wall": round(min(times), 4),
+            "wall_median": round(statistics.median(times), 4),
+            "phases": {},
+            "heavy_modules": loaded,
+        }
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    previous = _previous(args.results, params)
+    _print_report(record, previous)
+    status = 0
+    for name, data in results.items():
+        if data["heavy_modules"]:
+            print(f"警告: {name} の時点で {', '.join(data['heavy_modules'])} が読み込まれています")
+        if args.max_ratio and previous and name in previous.get("results", {}):
+            before = previous["results"][name]["wall"]
+            if before and data["wall"] / before > args.max_ratio:
+                print(f"{name} が前回より遅くなっています（{data['wall'] / before:.2f}x > {args.max_ratio}）")
+                status = 1
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""コマンドライン実行（夜間バッチ等の無人実行向け）
+
+例:
+    python main.py transfer-stock --month 202509
+    python main.py transfer-sales --month 202509 --sales "R706 得意先別売上分析表.xlsx"
+    python main.py transfer-sales --month 202509 --sales a.xlsx b.xlsx --sheets "*"
+    python main.py transfer-stock --month 202509 --dry-run --export preview.csv
+    python main.py transfer-all --month 202509
+    python main.py transfer-sales --month 202509 --dry-run --profit-report profit.csv
+    python main.py watch --month 202509
+    python main.py serve
+    python main.py transfer-stock --month 202509 --daemon
+    python main.py retry-save logs/pending/pending-20250901-120000-000000.json
+
+GUI ライブラリ（tkinter / customtkinter）は import しない。
+"""
+import argparse
+import functools
+import os
+import sys
+import time
+
+import daemon_client
+import engine
+import index_cache
+import journal
+import run_log
+import watch
+from settings import Settings
+
+
+def _year_month(text):
+    try:
+        engine.parse_year_month(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def _add_common_arguments(parser):
+    parser.add_argument("--month", required=True, type=_year_month, help="対象年月 (YYYYMM)")
+    parser.add_argument("--settings", help="settings.json のパス（省略時はカレントの settings.json）")
+    parser.add_argument("--stock", help="在庫表ファイル（省略時は設定値）")
+    parser.add_argument("--no-cache", action="store_true", help="インデックスキャッシュを使わない")
+    parser.add_argument("--dry-run", action="store_true", help="保存せずに変更内容だけを表示（プレビュー）")
+    parser.add_argument("--export", help="--dry-run の変更内容を書き出すファイル（.csv / .jsonl）")
+    parser.add_argument("--daemon", action="store_true",
+                        help="常駐転記サービス（serve）が起動していればサービスに依頼（起動していなければこのプロセスで実行）")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description=f"{Settings.APP_NAME} バッチ実行")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stock = sub.add_parser("transfer-stock", help="単価表の単価を在庫表に転記")
+    _add_common_arguments(stock)
+    stock.add_argument("--price", help="単価表ファイル（省略時は設定値）")
+    stock.add_argument("--to", type=_year_month,
+                       help="期間指定の終了年月 (YYYYMM)。--month〜--to の各月をまとめて転記し 1 回だけ保存")
+
+    sales = sub.add_parser("transfer-sales", help="在庫表の単価で売上表の利益・利益率を計算")
+    _add_common_arguments(sales)
+    sales.add_argument("--sales", nargs="+", help="売上表ファイル（複数指定可。省略時は設定値）")
+    sales.add_argument("--sheets", help="処理するシート名のパターン（\"*\" で全シート。省略時は設定値、設定も空なら作業中のシート）")
+    sales.add_argument("--profit-report", help="商品別・得意先別の利益集計を書き出す CSV ファイル（--dry-run でも書き出す）")
+
+    both = sub.add_parser("transfer-all", help="在庫表への転記と売上表の利益計算を続けて実行（在庫表を読み直さない）")
+    _add_common_arguments(both)
+    both.add_argument("--price", help="単価表ファイル（省略時は設定値）")
+    both.add_argument("--sales", nargs="+", help="売上表ファイル（複数指定可。省略時は設定値）")
+    both.add_argument("--sheets", help="処理するシート名のパターン（\"*\" で全シート。省略時は設定値、設定も空なら作業中のシート）")
+    both.add_argument("--profit-report", help="商品別・得意先別の利益集計を書き出す CSV ファイル（--dry-run でも書き出す）")
+
+    watcher = sub.add_parser("watch", help="単価表・在庫表を監視し、変更された ID の行だけを自動で転記（Ctrl+C で終了）")
+    watcher.add_argument("--month", required=True, type=_year_month, help="対象年月 (YYYYMM)")
+    watcher.add_argument("--settings", help="settings.json のパス（省略時はカレントの settings.json）")
+    watcher.add_argument("--price", help="単価表ファイル（省略時は設定値）")
+    watcher.add_argument("--stock", help="在庫表ファイル（省略時は設定値）")
+    watcher.add_argument("--sales", help="売上表ファイル（省略時は設定値）")
+    watcher.add_argument("--no-cache", action="store_true", help="インデックスキャッシュを使わない")
+    watcher.add_argument("--interval", type=float, help="監視間隔[秒]（省略時は設定値）")
+    watcher.add_argument("--debounce", type=float, help="更新後に処理を始めるまでの安定待ち時間[秒]（省略時は設定値）")
+
+    server = sub.add_parser("serve", help="常駐転記サービスを起動（127.0.0.1 の HTTP・JSON API。Ctrl+C で終了）")
+    server.add_argument("--settings", help="settings.json のパス（省略時はカレントの settings.json）")
+    server.add_argument("--port", type=int, help="待ち受けポート（省略時は設定値）")
+
+    retry = sub.add_parser("retry-save", help="保存先が開かれていて保存できなかった転記の保存だけを再実行（計算はやり直さない）")
+    retry.add_argument("pending", help="保存できなかったときに書き出した保存待ちファイル（logs/pending/*.json）")
+    retry.add_argument("--settings", help="settings.json のパス（省略時はカレントの settings.json）")
+    return parser
+
+
+def _print_progress(done, total, message):
+    if not total:
+        print(f"{message}...", file=sys.stderr, flush=True)
+        return
+    print(f"\r{message} {done}/{total}", end="", file=sys.stderr, flush=True)
+    if done >= total:
+        print(file=sys.stderr)
+
+
+def run(args):
+    if args.settings:
+        Settings.SETTINGS_FILE = args.settings
+        Settings.load_settings()
+    year_month = args.month
+    positions = engine.Positions.from_settings()
+    stock_path = args.stock or Settings.STOCK_FILE_PATH
+    cache = None if args.no_cache else index_cache.from_settings()
+
+    if args.command == "transfer-stock":
+        price_path = args.price or Settings.PRICE_FILE_PATH
+        if args.to:
+            operation, call = "transfer_stock_range", functools.partial(
+                engine.transfer_stock_range, price_path, stock_path, year_month, args.to, positions,
+                cache=cache, dry_run=args.dry_run)
+        else:
+            operation, call = "transfer_stock", functools.partial(
+                engine.transfer_stock, price_path, stock_path, year_month, positions,
+                cache=cache, dry_run=args.dry_run)
+    else:
+        sales_paths = args.sales or engine.split_sales_paths(Settings.SALES_FILE_PATH)
+        sheet_pattern = args.sheets if args.sheets is not None else Settings.SALES_SHEET_PATTERN
+        if args.command == "transfer-all":
+            operation, call = "transfer_all", functools.partial(
+                engine.transfer_stock_and_sales, args.price or Settings.PRICE_FILE_PATH, stock_path, sales_paths,
+                year_month, positions, cache=cache, dry_run=args.dry_run, sheet_pattern=sheet_pattern)
+        else:
+            operation, call = "transfer_sales", functools.partial(
+                engine.transfer_sales, stock_path, sales_paths, year_month, positions,
+                cache=cache, dry_run=args.dry_run, sheet_pattern=sheet_pattern)
+    if args.daemon:
+        # GUI からの利用設定によらず、起動していればサービスに依頼する
+        client = daemon_client.DaemonClient(Settings.DAEMON_PORT, Settings.DAEMON_TOKEN)
+        job = daemon_client.job(operation, call, client)
+    else:
+        job = run_log.instrumented(operation, call)
+    return job(progress=_print_progress)
+
+
+def _spool_pending(error):
+    """保存できなかった計算結果を logs/pending に書き出し、再試行の方法を表示"""
+    pending = error.pending
+    if not isinstance(pending, engine.PendingSave):
+        # サービスに依頼した場合、計算結果はサービス側で保持している
+        print(f"保存待ちの結果は転記サービスが保持しています（POST /jobs/{pending.job_id}/retry で再試行）",
+              file=sys.stderr)
+        return
+    try:
+        path = pending.spool(os.path.join(Settings.log_dir(), "pending"))
+    except (OSError, TypeError, ValueError) as e:
+        print(f"エラー: 保存待ちファイルを書き出せません: {e}", file=sys.stderr)
+        return
+    print(f"ファイルを閉じてから次のコマンドで保存を再試行してください:\n"
+          f"  python main.py retry-save \"{path}\"", file=sys.stderr)
+
+
+def run_retry_save(args):
+    """保存待ちファイルの保存を再試行。保存できたらファイルを削除"""
+    if args.settings:
+        Settings.SETTINGS_FILE = args.settings
+        Settings.load_settings()
+    try:
+        pending = engine.PendingSave.load(args.pending)
+    except (OSError, ValueError) as e:
+        print(f"エラー: 保存待ちファイルを読み込めません: {e}", file=sys.stderr)
+        return 1
+    job = run_log.instrumented("save_retry", lambda progress, cancel: pending.retry(progress=progress, cancel=cancel))
+    try:
+        result = job(progress=_print_progress)
+    except engine.SavePending as e:
+        # 書けた分を除いた残りで保存待ちファイルを更新
+        e.pending.save(args.pending)
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    except engine.TransferError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    os.remove(args.pending)
+    print(result.summary())
+    return 0
+
+
+def run_serve(args):
+    """常駐転記サービスを Ctrl+C まで実行。ポートを使えなければ 1"""
+    if args.settings:
+        Settings.SETTINGS_FILE = args.settings
+        Settings.load_settings()
+    import daemon
+    try:
+        daemon.serve(args.port)
+    except OSError as e:
+        print(f"エラー: 転記サービスを開始できません: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_watch(args):
+    """Ctrl+C まで監視し、差分転記の結果を表示する。開始時の読み込みに失敗したら 1"""
+    if args.settings:
+        Settings.SETTINGS_FILE = args.settings
+        Settings.load_settings()
+    # 自動更新は 1 つ目の売上表が対象
+    sales_path = args.sales or (engine.split_sales_paths(Settings.SALES_FILE_PATH) or [""])[0]
+    if not sales_path:
+        print("エラー: 売上表のパスが設定されていません", file=sys.stderr)
+        return 1
+    transfer = watch.IncrementalTransfer(
+        args.price or Settings.PRICE_FILE_PATH, args.stock or Settings.STOCK_FILE_PATH,
+        sales_path, args.month, engine.Positions.from_settings(),
+        cache=None if args.no_cache else index_cache.from_settings())
+    interval = args.interval if args.interval is not None else Settings.WATCH_INTERVAL_SEC
+    debounce = args.debounce if args.debounce is not None else Settings.WATCH_DEBOUNCE_SEC
+    session = watch.WatchSession(transfer, interval, debounce)
+    session.start()
+    ready = False
+    try:
+        while session.is_alive() or not session.queue.empty():
+            for kind, payload in session.poll():
+                if kind == "ready":
+                    ready = True
+                    print(f"{args.month} の監視を開始しました（Ctrl+C で終了）")
+                elif kind == "applied":
+                    for result in payload:
+                        print(result.summary())
+                        for error in result.errors:
+                            print(f"  {error}", file=sys.stderr)
+                elif kind == "error":
+                    print(f"エラー: {payload}", file=sys.stderr)
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        session.stop()
+        print("監視を終了しました")
+    return 0 if ready else 1
+
+
+def main(argv=None):
+    """終了コード: 0=成功, 1=転記エラー, 2=引数エラー"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "serve":
+        return run_serve(args)
+    if args.command == "retry-save":
+        return run_retry_save(args)
+    if args.export and not args.dry_run:
+        parser.error("--export は --dry-run と併せて指定してください")
+    try:
+        result = run(args)
+    except ValueError as e:
+        parser.error(str(e))
+    except engine.SavePending as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        _spool_pending(e)
+        return 1
+    except (engine.TransferError, daemon_client.DaemonError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    print(result.summary())
+    for error in result.errors:
+        print(f"  {error}", file=sys.stderr)
+    if args.export:
+        try:
+            journal.export_preview(args.export, result.journal, result.unmatched)
+        except OSError as e:
+            print(f"エラー: 書き出しに失敗しました: {e}", file=sys.stderr)
+            return 1
+        print(f"変更内容を書き出しました: {args.export}")
+    if getattr(args, "profit_report", None):
+        if result.profit_summary is None:
+            print("エラー: 利益集計が無効です（設定の profit_report_enabled）", file=sys.stderr)
+            return 1
+        try:
+            result.profit_summary.write_csv(args.profit_report)
+        except OSError as e:
+            print(f"エラー: 書き出しに失敗しました: {e}", file=sys.stderr)
+            return 1
+        print(f"利益集計を書き出しました: {args.profit_report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
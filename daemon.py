@@ -0,0 +1,361 @@
+"""常駐転記サービス（ローカル HTTP・JSON API）
+
+    python main.py serve [--port 8765] [--settings settings.json]
+
+127.0.0.1 だけで待ち受け、RPA・タスクスケジューラ・GUI から転記を受け付ける。起動し続けるため
+import のコストは 1 回だけで、読み込み済みの単価表・在庫表・売上表のデータ（session_cache）と
+インデックスキャッシュを次の要求で再利用する（元ファイルが更新されていれば読み直す）。
+要求は 1 本のキューで順に処理するため、同じブックへ同時に書き込むことはない。
+
+エンドポイント（DAEMON_TOKEN を設定した場合は X-Token ヘッダーが必要。POST は Content-Type: application/json が必要。
+Host ヘッダーが 127.0.0.1:<ポート> / localhost:<ポート> 以外の要求と Origin ヘッダー付きの要求は拒否する）:
+    GET  /status                 稼働状況（待ち件数・実行中の要求・キャッシュ）
+    POST /transfer/<処理>        転記（処理: stock / stock_range / sales / all）
+    POST /preview/<処理>         プレビュー（保存しない。dry_run と同じ）
+    GET  /jobs/<要求ID>          要求の状態（queued / running / done / error / cancelled）・進捗・結果
+    POST /jobs/<要求ID>/cancel   キャンセル（保存開始前まで）
+    POST /jobs/<要求ID>/retry    保存先が開かれていて保存できなかった要求（error_type: SavePending）の
+                                 保存だけを再実行（新しい要求 ID を返す。計算はやり直さない）
+
+本文は engine の転記関数と同じ名前の引数（year_month, start, end, price_path, stock_path, sales_path,
+sheet_pattern, dry_run, positions）の JSON。省略したパス・行列位置・シート名はサービスの設定値を使う。
+"wait": false なら受け付けた時点で要求 ID を返す（省略時は完了まで待って結果を返す）。
+
+    curl -X POST http://127.0.0.1:8765/transfer/stock -H "Content-Type: application/json" -d "{\"year_month\": \"202509\"}"
+"""
+import dataclasses
+import datetime
+import hmac
+import inspect
+import itertools
+import json
+import os
+import queue
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import daemon_client
+import engine
+import index_cache
+import run_log
+import session_cache
+import startup
+from settings import Settings
+
+FUNCTIONS = {
+    "transfer_stock": engine.transfer_stock,
+    "transfer_stock_range": engine.transfer_stock_range,
+    "transfer_sales": engine.transfer_sales,
+    "transfer_all": engine.transfer_stock_and_sales,
+}
+# 完了した要求を状態確認用に保持する件数
+KEEP_FINISHED_JOBS = 50
+# 要求本文の上限サイズ
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def build_call(name, request):
+    """URL の処理名と要求本文から (処理名, 関数, 引数 dict) を作成。本文が不正なら ValueError"""
+    operation = daemon_client.OPERATIONS.get(name)
+    if operation is None:
+        raise LookupError(name)
+    func = FUNCTIONS[operation]
+    parameters = inspect.signature(func).parameters
+    args = {key: value for key, value in request.items() if key != "wait"}
+    unknown = [key for key in args if key not in parameters or key in daemon_client.INTERNAL_ARGS]
+    if unknown:
+        raise ValueError(f"不明な項目です: {', '.join(unknown)}")
+
+    defaults = {
+        "price_path": Settings.PRICE_FILE_PATH,
+        "stock_path": Settings.STOCK_FILE_PATH,
+        "sales_path": engine.split_sales_paths(Settings.SALES_FILE_PATH),
+        "sheet_pattern": Settings.SALES_SHEET_PATTERN,
+    }
+    for key, value in defaults.items():
+        if key in parameters and args.get(key) is None:
+            args[key] = value
+    for key in ("year_month", "start", "end"):
+        if key in parameters:
+            if args.get(key) is None:
+                raise ValueError(f"{key} を指定してください")
+            args[key] = str(args[key])
+            engine.parse_year_month(args[key])
+
+    positions = dataclasses.asdict(engine.Positions.from_settings())
+    overrides = args.get("positions") or {}
+    if not isinstance(overrides, dict) or any(key not in positions for key in overrides):
+        raise ValueError("positions の項目が不正です")
+    for key, value in overrides.items():
+        # 得意先列だけは 0（集計しない）を許す。bool は int の一種のため除く
+        minimum = 0 if key == "customer_column_in_sales" else 1
+        if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+            raise ValueError(f"positions の {key} は {minimum} 以上の整数で指定してください")
+    args["positions"] = engine.Positions(**{**positions, **overrides})
+    args["dry_run"] = bool(args.get("dry_run", False))
+    return operation, func, args
+
+
+class Job:
+    """キューに入れた 1 件の要求"""
+
+    def __init__(self, job_id, operation, func, args):
+        self.id = job_id
+        self.operation = operation
+        self.func = func
+        self.args = args
+        self.state = "queued"
+        # 最新の進捗 [done, total, message]
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.error_type = None
+        # 保存できなかった計算結果（engine.PendingSave）
+        self.pending = None
+        self.submitted = datetime.datetime.now()
+        self.cancel_event = threading.Event()
+        self.finished = threading.Event()
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "operation": self.operation,
+            "state": self.state,
+            "submitted": self.submitted.isoformat(timespec="seconds"),
+            "progress": self.progress,
+        }
+        if self.result is not None:
+            data["summary"] = self.result.summary()
+            data["result"] = self.result.to_dict()
+        if self.error is not None:
+            data["error"] = self.error
+            data["error_type"] = self.error_type
+        return data
+
+
+class TransferService:
+    """要求を 1 本のキューで順に実行する（同じブックへの同時書き込みを防ぐ）"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._current = None
+        self.started = datetime.datetime.now()
+        # 停止時に保存途中のまま打ち切られないよう daemon にはしない
+        self._thread = threading.Thread(target=self._run, name="TransferService")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """受け付け済みの要求を破棄し、実行中の要求が終わるまで待つ"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state == "queued":
+                    job.cancel_event.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, operation, func, args):
+        with self._lock:
+            job = Job(str(next(self._ids)), operation, func, args)
+            self._jobs[job.id] = job
+            finished = [key for key, item in self._jobs.items() if item.finished.is_set()]
+            for key in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+                del self._jobs[key]
+        self._queue.put(job)
+        return job
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def retry(self, job_id):
+        """保存できなかった要求の保存を再実行する要求を入れる。要求が無ければ None、保存待ちでなければ ValueError"""
+        job = self.job(job_id)
+        if job is None:
+            return None
+        pending = job.pending
+        if pending is None:
+            raise ValueError(f"要求 {job_id} は保存待ちではありません")
+        job.pending = None
+        return self.submit("save_retry", lambda progress, cancel, **_: pending.retry(progress=progress, cancel=cancel),
+                           {})
+
+    def cancel(self, job_id):
+        """キャンセルを要求（保存開始後は無効）。要求が無ければ None"""
+        job = self.job(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job
+
+    def status(self):
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.state == "queued")
+            current = self._current.to_dict() if self._current is not None else None
+        status = {
+            "status": "ok",
+            "app": Settings.APP_NAME,
+            "pid": os.getpid(),
+            "started": self.started.isoformat(timespec="seconds"),
+            "queued": queued,
+            "running": current,
+            "settings": os.path.abspath(Settings.SETTINGS_FILE),
+        }
+        cache = session_cache.from_settings()
+        if cache is not None:
+            status["session_cache"] = {"hits": cache.hits, "misses": cache.misses,
+                                       "mb": round(cache.total_bytes / 1024 / 1024, 2)}
+        return status
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancel_event.is_set():
+                job.state = "cancelled"
+                job.finished.set()
+                continue
+            with self._lock:
+                self._current = job
+                job.state = "running"
+            self._execute(job)
+            with self._lock:
+                self._current = None
+            job.finished.set()
+
+    @staticmethod
+    def _execute(job):
+        def progress(done, total, message):
+            job.progress = [done, total, message]
+
+        call = run_log.instrumented(job.operation, lambda progress, cancel: job.func(
+            **job.args, progress=progress, cancel=cancel, cache=index_cache.from_settings()))
+        try:
+            job.result = call(progress=progress, cancel=job.cancel_event)
+            job.state = "done"
+        except engine.TransferCancelled:
+            job.state = "cancelled"
+        except engine.SavePending as e:
+            job.pending = e.pending
+            job.error = str(e)
+            job.error_type = type(e).__name__
+            job.state = "error"
+        except Exception as e:
+            job.error = str(e)
+            job.error_type = type(e).__name__
+            job.state = "error"
+            print(f"転記サービス: 要求 {job.id}（{job.operation}）でエラー: {e}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "AohongTransfer/1"
+
+    def log_message(self, format, *args):
+        print(f"転記サービス: {self.address_string()} {format % args}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _send(self, code, data):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("要求が大きすぎます")
+        if not length:
+            return {}
+        data = json.loads(self.rfile.read(length).decode("utf-8"))
+        if not isinstance(data, dict):
+            raise ValueError("本文は JSON のオブジェクトで指定してください")
+        return data
+
+    def _dispatch(self, method):
+        service = self.server.service
+        # DNS リバインディング対策: 別のホスト名で届いた要求（同一オリジン扱いの GET を含む）を拒否する
+        port = self.server.server_address[1]
+        if (self.headers.get("Host") or "").strip().lower() not in (f"127.0.0.1:{port}", f"localhost:{port}"):
+            return self._send(403, {"error": "Host ヘッダーが不正です"})
+        # CSRF 対策: 他のサイトのページからの要求（Origin ヘッダー付き）を拒否する
+        if self.headers.get("Origin") is not None:
+            return self._send(403, {"error": "ブラウザーからの要求は受け付けません"})
+        if Settings.DAEMON_TOKEN and not hmac.compare_digest(self.headers.get("X-Token", "").encode("utf-8"),
+                                                             Settings.DAEMON_TOKEN.encode("utf-8")):
+            return self._send(401, {"error": "トークンが違います"})
+        # フォーム送信など、CORS の事前確認なしに送れる形式の POST を拒否する
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if method == "POST" and content_type != "application/json":
+            return self._send(415, {"error": "Content-Type は application/json で指定してください"})
+        parts = [part for part in urllib.parse.urlsplit(self.path).path.split("/") if part]
+        try:
+            if method == "GET" and parts == ["status"]:
+                return self._send(200, service.status())
+            if method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+                job = service.job(parts[1])
+                return self._send(200, job.to_dict()) if job else self._send(404, {"error": "要求が見つかりません"})
+            if method == "POST" and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "retry":
+                job = service.retry(parts[1])
+                return self._send(202, job.to_dict()) if job else self._send(404, {"error": "要求が見つかりません"})
+            if method == "POST" and len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                job = service.cancel(parts[1])
+                return self._send(200, job.to_dict()) if job else self._send(404, {"error": "要求が見つかりません"})
+            if method == "POST" and len(parts) == 2 and parts[0] in ("transfer", "preview"):
+                return self._transfer(service, parts[0], parts[1])
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        return self._send(404, {"error": f"不明な要求です: {method} {self.path}"})
+
+    def _transfer(self, service, kind, name):
+        request = self._read_body()
+        if kind == "preview":
+            request["dry_run"] = True
+        try:
+            operation, func, args = build_call(name, request)
+        except LookupError:
+            return self._send(404, {"error": f"不明な処理です: {name}"})
+        job = service.submit(operation, func, args)
+        if not request.get("wait", True):
+            return self._send(202, job.to_dict())
+        job.finished.wait()
+        codes = {"done": 200, "cancelled": 409}
+        if job.state == "error":
+            return self._send(422 if job.error_type in ("TransferError", "FileLocked", "SavePending") else 500,
+                              job.to_dict())
+        return self._send(codes.get(job.state, 500), job.to_dict())
+
+
+def serve(port=None):
+    """Ctrl+C まで待ち受ける。ポートを使えない場合は OSError"""
+    port = port or Settings.DAEMON_PORT
+    service = TransferService()
+    server = ThreadingHTTPServer((daemon_client.HOST, port), _Handler)
+    server.service = service
+    service.start()
+    if Settings.PREWARM_ENABLED:
+        today = datetime.date.today()
+        startup.start_prewarm(Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH,
+                              engine.to_year_month(today.year, today.month), engine.Positions.from_settings(),
+                              index_cache.from_settings())
+    print(f"転記サービスを開始しました: http://{daemon_client.HOST}:{port}（Ctrl+C で終了）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("転記サービスを終了しています（実行中の転記の完了を待ちます）")
+        service.stop()
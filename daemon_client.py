@@ -0,0 +1,187 @@
+"""常駐転記サービス（daemon.py）のクライアント
+
+GUI・CLI（--daemon）はサービスが起動していれば転記をサービスに依頼し、起動していなければ
+これまでどおり手元で実行する（job を参照）。依頼はサービスの要求 ID をポーリングし、
+進捗の表示・キャンセルも手元で実行した場合と同じように行える。
+urllib.request は import に時間がかかるため、初めて通信する時点で読み込む。
+"""
+import dataclasses
+import inspect
+import json
+import os
+import time
+
+import engine
+import run_log
+from settings import Settings
+
+HOST = "127.0.0.1"
+# URL の処理名 → 処理名（run_log の operation と同じ）
+OPERATIONS = {
+    "stock": "transfer_stock",
+    "stock_range": "transfer_stock_range",
+    "sales": "transfer_sales",
+    "all": "transfer_all",
+}
+# 要求に含めない引数（サービス側で設定する）
+INTERNAL_ARGS = ("progress", "cancel", "cache", "stock_prices")
+# サービスが起動しているかの確認の待ち時間[秒]（起動していなければ接続拒否ですぐ返る）
+STATUS_TIMEOUT = 0.5
+POLL_INTERVAL = 0.2
+
+
+class DaemonError(Exception):
+    """サービスとの通信エラー・サービス側の予期しないエラー"""
+
+
+def route(operation):
+    """処理名（"transfer_stock" など）→ URL の処理名（"stock" など）"""
+    for name, value in OPERATIONS.items():
+        if value == operation:
+            return name
+    raise ValueError(f"不明な処理です: {operation}")
+
+
+def request_from_call(call):
+    """engine の転記関数の functools.partial から要求の本文を作成（行列位置は dict に変換）。
+
+    パスは絶対パスにする（サービスは別の作業フォルダで起動している場合があるため）
+    """
+    arguments = inspect.signature(call.func).bind_partial(*call.args, **call.keywords).arguments
+    request = {name: value for name, value in arguments.items() if name not in INTERNAL_ARGS}
+    for key in ("price_path", "stock_path"):
+        if request.get(key):
+            request[key] = os.path.abspath(request[key])
+    sales_path = request.get("sales_path")
+    if isinstance(sales_path, str):
+        request["sales_path"] = os.path.abspath(sales_path) if sales_path else sales_path
+    elif sales_path is not None:
+        request["sales_path"] = [os.path.abspath(path) for path in sales_path]
+    if request.get("positions") is not None:
+        request["positions"] = dataclasses.asdict(request["positions"])
+    return request
+
+
+class DaemonClient:
+    def __init__(self, port, token="", timeout=10):
+        self.base_url = f"http://{HOST}:{port}"
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None, timeout=None):
+        """JSON で要求して応答の dict を返す（エラー応答も本文が JSON なら返す）"""
+        import urllib.error
+        import urllib.request
+
+        data = None if body is None else json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["X-Token"] = self.token
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                return json.loads(e.read().decode("utf-8"))
+            except ValueError:
+                raise DaemonError(f"サービスの応答エラー: {e.code} {e.reason}")
+        except (OSError, ValueError) as e:
+            raise DaemonError(f"サービスに接続できません: {e}")
+
+    def status(self, timeout=None):
+        return self._request("GET", "/status", timeout=timeout)
+
+    def available(self) -> bool:
+        """サービスが起動していて要求を受け付けられるか"""
+        try:
+            return self.status(timeout=STATUS_TIMEOUT).get("status") == "ok"
+        except DaemonError:
+            return False
+
+    def submit(self, operation, request):
+        """要求をキューに入れて要求 ID を返す"""
+        job = self._request("POST", f"/transfer/{route(operation)}", {**request, "wait": False})
+        if "id" not in job:
+            raise DaemonError(job.get("error") or "サービスが要求を受け付けませんでした")
+        return job["id"]
+
+    def job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self._request("POST", f"/jobs/{job_id}/cancel")
+
+    def retry(self, job_id):
+        """保存できなかった要求の保存を再実行する要求を入れて、新しい要求 ID を返す"""
+        job = self._request("POST", f"/jobs/{job_id}/retry")
+        if "id" not in job:
+            raise DaemonError(job.get("error") or "サービスが要求を受け付けませんでした")
+        return job["id"]
+
+    def run(self, operation, request, progress=None, cancel=None):
+        """要求して完了まで待ち、転記結果（TransferResult / PipelineResult）を返す。
+        エラー・キャンセルは手元で実行した場合と同じ例外にする"""
+        return self.wait(self.submit(operation, request), progress, cancel)
+
+    def wait(self, job_id, progress=None, cancel=None):
+        """要求 job_id の完了を待ち、転記結果を返す"""
+        cancel_sent = False
+        while True:
+            if cancel is not None and cancel.is_set() and not cancel_sent:
+                self.cancel(job_id)
+                cancel_sent = True
+            job = self.job(job_id)
+            state = job.get("state")
+            if progress is not None and job.get("progress"):
+                progress(*job["progress"])
+            if state == "done":
+                return engine.result_from_dict(job["result"])
+            if state == "cancelled":
+                raise engine.TransferCancelled()
+            if state == "error":
+                error_type = job.get("error_type")
+                if error_type == "SavePending":
+                    raise engine.SavePending(job.get("error"), RemotePendingSave(self, job_id))
+                if error_type == "FileLocked":
+                    raise engine.FileLocked(job.get("error"))
+                if error_type == "TransferError":
+                    raise engine.TransferError(job.get("error"))
+                raise DaemonError(job.get("error"))
+            if state not in ("queued", "running"):
+                raise DaemonError(job.get("error") or f"要求 {job_id} の状態を取得できません")
+            time.sleep(POLL_INTERVAL)
+
+
+class RemotePendingSave:
+    """サービス側で保持している保存できなかった計算結果（engine.PendingSave と同じく retry で保存を再実行）"""
+
+    def __init__(self, client, job_id):
+        self.client = client
+        self.job_id = job_id
+
+    def retry(self, progress=None, cancel=None):
+        return self.client.wait(self.client.retry(self.job_id), progress, cancel)
+
+
+def from_settings():
+    """設定に従ったクライアント（GUI からの利用が無効なら None）。起動しているかは available で確認する"""
+    if not Settings.DAEMON_CLIENT_ENABLED:
+        return None
+    return DaemonClient(Settings.DAEMON_PORT, Settings.DAEMON_TOKEN)
+
+
+def job(operation, call, client=None):
+    """call（engine の転記関数の functools.partial）を、サービスが起動していればサービスに依頼し、
+    起動していなければ run_log.instrumented(operation, call) と同じく手元で実行する job を返す。
+    起動の確認は job の実行時（ワーカースレッド）に行う"""
+    local = run_log.instrumented(operation, call)
+
+    def run(progress=None, cancel=None):
+        remote = client or from_settings()
+        if remote is None or not remote.available():
+            return local(progress=progress, cancel=cancel)
+        print(f"転記サービスに依頼します: {operation}")
+        return remote.run(operation, request_from_call(call), progress, cancel)
+
+    return run
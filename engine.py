@@ -0,0 +1,1338 @@
+"""在庫単価転記の処理本体（UI 非依存）
+
+GUI (gui.py) と CLI (cli.py) の双方から利用する。
+このモジュールからは tkinter / customtkinter を import しないこと。
+openpyxl は import に時間がかかるため、ブックを初めて開く時点で読み込む（起動時間短縮）。
+入力ブックの読み込みは xlsx_reader のバックエンド（READER_BACKEND）で行う。
+"""
+import base64
+import datetime
+import fnmatch
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+import backup_store
+import parallel_load
+import price_index
+import price_matrix
+import profit_calc
+import session_cache
+from journal import ChangeJournal
+from profit_report import ProfitSummary
+import xlsx_patch
+import xlsx_reader
+from settings import Settings
+
+# 単価表で参照するシート名
+PRICE_SHEET_NAME = "一般総平均"
+# 単価表の上部で読み込む最低行数（年月の区切りとなる空列の判定に使う）
+BLANK_COLUMN_SCAN_ROWS = 25
+# session_cache で「シートが無い」ことも保持するため、ミスはこの値で区別する
+_MISSING = object()
+# 売上表ファイルを複数指定する場合の区切り（SALES_FILE_PATH、TransferResult.target_path）
+SALES_PATH_SEPARATOR = ";"
+
+
+class TransferError(Exception):
+    """転記を継続できないエラー。メッセージはそのまま利用者へ表示する。"""
+
+
+class TransferCancelled(Exception):
+    """利用者のキャンセル要求により中断した（ファイルは書き込まれていない）"""
+
+
+class FileLocked(TransferError):
+    """保存先が他のアプリ（Excel など）で開かれていて書き込めない"""
+
+
+class SavePending(FileLocked):
+    """計算は終わったが保存先が開かれていて保存できなかった。
+
+    pending（PendingSave）が未保存の変更を保持しており、pending.retry() で書き込みだけをやり直せる。
+    """
+
+    def __init__(self, message, pending):
+        super().__init__(message)
+        self.pending = pending
+
+
+@dataclass
+class Positions:
+    """Excel 上の行・列番号（Settings の positions に対応）"""
+    id_row_in_price: int
+    price_row_in_price: int
+    id_column_in_stock: int
+    price_column_in_stock: int
+    data_start_row_in_stock: int
+    id_column_in_sales: int
+    profit_column_in_sales: int
+    profit_rate_column_in_sales: int
+    sales_column_in_sales: int
+    sales_num_column_in_sales: int
+    # 得意先列（0 なら得意先別の利益集計をしない）
+    customer_column_in_sales: int
+
+    @classmethod
+    def from_settings(cls):
+        """現在の Settings クラス変数から生成"""
+        return cls(
+            id_row_in_price=Settings.ID_ROW_IN_PRICE,
+            price_row_in_price=Settings.PRICE_ROW_IN_PRICE,
+            id_column_in_stock=Settings.ID_COLUMN_IN_STOCK,
+            price_column_in_stock=Settings.PRICE_COLUMN_IN_STOCK,
+            data_start_row_in_stock=Settings.DATA_START_ROW_IN_STOCK,
+            id_column_in_sales=Settings.ID_COLUMN_IN_SALES,
+            profit_column_in_sales=Settings.PROFIT_COLUMN_IN_SALES,
+            profit_rate_column_in_sales=Settings.PROFIT_RATE_COLUMN_IN_SALES,
+            sales_column_in_sales=Settings.SALES_COLUMN_IN_SALES,
+            sales_num_column_in_sales=Settings.SALES_NUM_COLUMN_IN_SALES,
+            customer_column_in_sales=Settings.CUSTOMER_COLUMN_IN_SALES,
+        )
+
+    @classmethod
+    def from_defaults(cls):
+        """Settings のデフォルト値（settings.json を反映しない）から生成"""
+        return cls(**{name: Settings.get_default_value(name.upper()) for name in cls.__dataclass_fields__})
+
+
+@dataclass
+class TransferResult:
+    """1 回の転記結果（件数・行エラー・フェーズ別所要時間[秒]）"""
+    kind: str
+    year_month: str
+    target_path: str
+    updated: int = 0
+    scanned: int = 0
+    # 保存時に書き込んだセル数
+    cells_written: int = 0
+    # 変更前と同じ値のため書き込まなかったセル数
+    unchanged: int = 0
+    errors: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+    # 期間指定時の年月別更新件数 {YYYYMM: 件数}
+    per_month: dict = field(default_factory=dict)
+    # 売上表を複数シート・複数ファイル処理した場合のシート別更新件数 {"ファイル名:シート名": 件数}
+    per_sheet: dict = field(default_factory=dict)
+    # tracemalloc によるピークメモリ[MB]（計測時のみ。run_log.instrumented が設定）
+    peak_memory_mb: float = None
+    # 書き換えたセルの記録（保存後に run_log.instrumented が書き出す）
+    journal: ChangeJournal = field(default_factory=ChangeJournal, repr=False)
+    # 単価が見つからなかった行 [(シート名, 行, ID), ...]
+    unmatched: list = field(default_factory=list, repr=False)
+    # プレビュー（書き込みなし）の結果か
+    dry_run: bool = False
+    # 売上表の商品別・得意先別の利益集計（売上の転記で PROFIT_REPORT_ENABLED の場合のみ）
+    profit_summary: ProfitSummary = field(default=None, repr=False)
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.timings.values())
+
+    def metrics(self) -> str:
+        """計測値の 1 行表示（ステータスバー用）"""
+        phases = " ".join(f"{name} {sec:.1f}" for name, sec in self.timings.items())
+        text = f"{self.total_time:.1f}s ({phases}) {self.scanned}行 {self.cells_written}セル"
+        if self.peak_memory_mb is not None:
+            text += f" {self.peak_memory_mb:.0f}MB"
+        return text
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{name} {sec:.2f}s" for name, sec in self.timings.items())
+        if self.dry_run:
+            text = (f"[{self.kind}] {self.year_month} プレビュー: {self.updated}件更新予定 ({len(self.journal)}セル)"
+                    f" / 単価なし {len(self.unmatched)}行 / {self.scanned}行走査 (合計 {self.total_time:.2f}s: {phases})")
+        else:
+            text = (f"[{self.kind}] {self.year_month}: {self.updated}件更新 / {self.scanned}行走査"
+                    f" / {self.cells_written}セル書込 (合計 {self.total_time:.2f}s: {phases})")
+        if self.unchanged:
+            text += f" 同値スキップ {self.unchanged}セル"
+        if self.peak_memory_mb is not None:
+            text += f" ピークメモリ {self.peak_memory_mb:.1f}MB"
+        if self.errors:
+            text += f" エラー {len(self.errors)}件"
+        for year_month, count in self.per_month.items():
+            text += f"\n  {year_month}: {count}件"
+        if len(self.per_sheet) > 1:
+            for label, count in self.per_sheet.items():
+                text += f"\n  {label}: {count}件"
+        return text
+
+    def to_dict(self) -> dict:
+        """JSON 化できる dict（常駐転記サービスの応答用。変更ジャーナル・単価なしの行を含む）"""
+        data = {name: getattr(self, name) for name in self.__dataclass_fields__
+                if name not in ("journal", "profit_summary")}
+        data["journal"] = {"entries": self.journal.entries, "unchanged": self.journal.unchanged}
+        if self.profit_summary is not None:
+            data["profit_summary"] = self.profit_summary.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """to_dict の結果（JSON を経由したもの）から復元"""
+        data = dict(data)
+        journal_data = data.pop("journal", None) or {}
+        summary_data = data.pop("profit_summary", None)
+        result = cls(**data)
+        if summary_data is not None:
+            result.profit_summary = ProfitSummary.from_dict(summary_data)
+        result.journal.entries = [tuple(entry) for entry in journal_data.get("entries", [])]
+        result.journal.unchanged = journal_data.get("unchanged", 0)
+        result.unmatched = [tuple(item) for item in result.unmatched]
+        return result
+
+
+@dataclass
+class PipelineResult:
+    """在庫表 → 売上表 の連続転記（transfer_stock_and_sales）の結果"""
+    stock: TransferResult
+    sales: TransferResult
+    # tracemalloc によるピークメモリ[MB]（計測時のみ。run_log.instrumented が設定）
+    peak_memory_mb: float = None
+
+    @property
+    def stages(self):
+        return [self.stock, self.sales]
+
+    @property
+    def dry_run(self) -> bool:
+        return self.stock.dry_run
+
+    @property
+    def year_month(self) -> str:
+        return self.stock.year_month
+
+    @property
+    def updated(self) -> int:
+        return self.stock.updated + self.sales.updated
+
+    @property
+    def scanned(self) -> int:
+        return self.stock.scanned + self.sales.scanned
+
+    @property
+    def unchanged(self) -> int:
+        return self.stock.unchanged + self.sales.unchanged
+
+    @property
+    def total_time(self) -> float:
+        return self.stock.total_time + self.sales.total_time
+
+    @property
+    def errors(self):
+        return self.stock.errors + self.sales.errors
+
+    @property
+    def timings(self) -> dict:
+        """段階別・フェーズ別の所要時間 {"stock_load": 秒, ...}"""
+        return {f"{stage.kind}_{name}": sec for stage in self.stages for name, sec in stage.timings.items()}
+
+    @property
+    def journal(self) -> ChangeJournal:
+        """在庫表・売上表の変更をまとめたジャーナル（プレビュー表示用）"""
+        journal = ChangeJournal()
+        for stage in self.stages:
+            journal.entries.extend(stage.journal.entries)
+            journal.unchanged += stage.journal.unchanged
+        return journal
+
+    @property
+    def unmatched(self):
+        return self.stock.unmatched + self.sales.unmatched
+
+    @property
+    def profit_summary(self):
+        return self.sales.profit_summary
+
+    def metrics(self) -> str:
+        text = " / ".join(f"{stage.kind} {stage.metrics()}" for stage in self.stages)
+        if self.peak_memory_mb is not None:
+            text += f" {self.peak_memory_mb:.0f}MB"
+        return text
+
+    def summary(self) -> str:
+        text = "\n".join(stage.summary() for stage in self.stages)
+        if self.peak_memory_mb is not None:
+            text += f"\nピークメモリ {self.peak_memory_mb:.1f}MB"
+        return text
+
+    def to_dict(self) -> dict:
+        return {"stages": [stage.to_dict() for stage in self.stages], "peak_memory_mb": self.peak_memory_mb}
+
+    @classmethod
+    def from_dict(cls, data):
+        stock, sales = (TransferResult.from_dict(stage) for stage in data["stages"])
+        return cls(stock, sales, data.get("peak_memory_mb"))
+
+
+def result_from_dict(data):
+    """TransferResult / PipelineResult の to_dict の結果から復元"""
+    return PipelineResult.from_dict(data) if "stages" in data else TransferResult.from_dict(data)
+
+
+@contextmanager
+def _phase(result: TransferResult, name: str):
+    """with ブロックの所要時間を result.timings[name] に加算"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        result.timings[name] = result.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _notify(progress, done, total, message):
+    """進捗を通知。total=0 は件数の無いフェーズ（読み込み・保存など）を表す"""
+    if progress is None:
+        return
+    try:
+        progress(done, total, message)
+    except Exception:
+        pass
+
+
+def _check_cancel(cancel):
+    """cancel（threading.Event 互換）がセットされていれば中断"""
+    if cancel is not None and cancel.is_set():
+        raise TransferCancelled()
+
+
+# --- 年月ユーティリティ ---
+def to_year_month(year: int, month: int) -> str:
+    """年・月の数値から YYYYMM 文字列を生成"""
+    return f"{year}{month:02}"
+
+
+def parse_year_month(text: str):
+    """YYYYMM 文字列を (year, month) に変換。不正な場合は ValueError"""
+    text = str(text).strip()
+    if len(text) != 6 or not text.isdigit():
+        raise ValueError(f"年月は YYYYMM 形式で指定してください: {text}")
+    year, month = int(text[:4]), int(text[4:])
+    if not 1 <= month <= 12:
+        raise ValueError(f"月が不正です: {text}")
+    return year, month
+
+
+def iter_year_months(start: str, end: str):
+    """start から end まで（両端含む）の YYYYMM を順に返す"""
+    year, month = parse_year_month(start)
+    end_year, end_month = parse_year_month(end)
+    if (year, month) > (end_year, end_month):
+        raise ValueError(f"期間の指定が不正です: {start}〜{end}")
+    while (year, month) <= (end_year, end_month):
+        yield to_year_month(year, month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+# --- シート検索 ---
+def find_month_sheetname(sheetnames, year_month):
+    """シート名一覧から YYYYMM を含む最初のシート名を返す（無ければ None）"""
+    for sheetname in sheetnames:
+        if year_month in sheetname:
+            return sheetname
+    return None
+
+
+def _load_workbook(path, **kwargs):
+    import openpyxl
+    try:
+        return openpyxl.load_workbook(path, **kwargs)
+    except FileNotFoundError as e:
+        raise TransferError(f"ファイルが見つかりません: {e}") from e
+    except Exception as e:
+        raise TransferError(f"ファイルの読み込みに失敗しました: {e}") from e
+
+
+def _open_book(path, reader_class):
+    try:
+        return reader_class(path)
+    except xlsx_reader.ReaderUnsupported:
+        raise
+    except FileNotFoundError as e:
+        raise TransferError(f"ファイルが見つかりません: {e}") from e
+    except Exception as e:
+        raise TransferError(f"ファイルの読み込みに失敗しました: {e}") from e
+
+
+def _read_book(path, read, backend=None):
+    """path を読み込みバックエンドで開き、read(book) の結果を返す。
+
+    fast で読めないブック・セル（ReaderUnsupported）は openpyxl で最初から読み直す。
+    backend を省略すると Settings.READER_BACKEND（並列読み込みの子プロセスには明示的に渡すこと）。
+    """
+    backend = backend or Settings.READER_BACKEND
+    if backend == "fast":
+        try:
+            with _open_book(path, xlsx_reader.FastReader) as book:
+                return read(book)
+        except xlsx_reader.ReaderUnsupported as e:
+            print(f"高速読み込みを使えないため openpyxl で読み込みます（{os.path.basename(path)}: {e}）")
+    with _open_book(path, xlsx_reader.OpenpyxlReader) as book:
+        return read(book)
+
+
+def _locked_message(label):
+    return f"{label}ファイルが開かれています。閉じてから再度実行してください。"
+
+
+def _save_workbook(workbook, path, label):
+    """同じフォルダの一時ファイルに保存してから置き換える（保存途中で止まっても元のファイルは壊れない）"""
+    tmp_path = xlsx_patch.temp_path(path)
+    try:
+        workbook.save(tmp_path)
+        os.replace(tmp_path, path)
+    except PermissionError as e:
+        raise FileLocked(_locked_message(label)) from e
+    except Exception as e:
+        raise TransferError(f"予期しないエラーが発生しました: {e}") from e
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def check_writable(path, label):
+    """保存先に書き込めるかを重い処理の前に確認する。
+
+    Excel で開かれているファイルは書き込みモードで開けない（Windows）ため FileLocked、
+    一時ファイルを作れないフォルダは TransferError。ファイルが無い場合は読み込み時のエラーに任せる。
+    """
+    try:
+        with open(path, "r+b"):
+            pass
+    except PermissionError as e:
+        raise FileLocked(_locked_message(label)) from e
+    except OSError:
+        return
+    if not os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+        raise TransferError(f"{label}ファイルのフォルダに書き込めません: {os.path.dirname(os.path.abspath(path))}")
+
+
+def _session_read(kind, path, params, read):
+    """session_cache にあれば返し、無ければ read() の結果を保持して返す"""
+    session = session_cache.from_settings()
+    if session is None:
+        return read()
+    data = session.get(kind, path, params, _MISSING)
+    if data is not _MISSING:
+        return data
+    signature = session_cache.file_signature(path)
+    data = read()
+    session.put(kind, path, params, data, signature)
+    return data
+
+
+def _price_rows_params(positions):
+    return {"last_row": max(BLANK_COLUMN_SCAN_ROWS, positions.id_row_in_price, positions.price_row_in_price)}
+
+
+def read_price_rows(price_path, positions, backend=None):
+    """単価表の一般総平均シートを開き、処理に必要な上部の行だけを値で取得。
+
+    戻り値は 1 行目からの値タプルのリスト（rows[行-1][列-1]）。値のある最後の列より右は含めない。
+    """
+    last_row = max(BLANK_COLUMN_SCAN_ROWS, positions.id_row_in_price, positions.price_row_in_price)
+
+    def read(book):
+        if PRICE_SHEET_NAME not in book.sheetnames:
+            raise TransferError(f"{PRICE_SHEET_NAME}シートが見つかりません")
+        return list(book.rows(PRICE_SHEET_NAME, min_row=1, max_row=last_row))
+
+    rows = _read_book(price_path, read, backend)
+    # 書式だけの列（max_column を押し上げる空の列）を除き、値のある最後の列までにする
+    width = max((_used_width(values) for values in rows), default=0)
+    return [values[:width] for values in rows]
+
+
+def _used_width(values):
+    """値タプルの最後の None でない要素までの長さ"""
+    for index in range(len(values), 0, -1):
+        if values[index - 1] is not None:
+            return index
+    return 0
+
+
+def extract_month_prices(price_rows, year_month, positions, layout=None):
+    """単価表の行データ（read_price_rows の戻り値）から対象年月の ID→単価 辞書を作成
+
+    layout: price_index.MonthLayout（省略時は price_rows から作成）
+    """
+    layout = layout or price_index.MonthLayout.build(price_rows)
+    span = layout.span(year_month)
+    if not span:
+        raise TransferError(f"{year_month}のセルが見つかりません")
+    matrix = price_matrix.PriceMatrix.build(
+        price_rows, [span], positions.id_row_in_price, positions.price_row_in_price)
+    return matrix.month_prices(year_month)
+
+
+def _cache_get(cache, kind, path, params):
+    """cache（index_cache.IndexCache）から ID→単価 辞書を復元（無ければ None）"""
+    if cache is None:
+        return None
+    pairs = cache.get(kind, path, params)
+    return None if pairs is None else {id: price for id, price in pairs}
+
+
+def _cache_put(cache, kind, path, params, id_price_dict, signature):
+    """signature: id_price_dict の元にした path の版の署名（読み込み前・保存直後に取ったもの）"""
+    if cache is not None:
+        cache.put(kind, path, params, [[id, price] for id, price in id_price_dict.items()], signature)
+
+
+def _cached_index(cache, kind, path, params, build):
+    """cache にあれば復元、無ければ build() して保存した ID→単価 辞書を返す"""
+    id_price_dict = _cache_get(cache, kind, path, params)
+    if id_price_dict is None:
+        signature = session_cache.file_signature(path)
+        id_price_dict = build()
+        _cache_put(cache, kind, path, params, id_price_dict, signature)
+    return id_price_dict
+
+
+class PriceTable:
+    """単価表の行データと全月分の単価（price_matrix.PriceMatrix）を必要になった時点で 1 回だけ作成して保持する。
+
+    複数月を続けて抽出する場合も単価表の読み込み・見出し解析は 1 回で済む。
+    全月分の単価は session_cache と cache（index_cache.IndexCache）に保持し、どの月の転記でも再利用する。
+    """
+
+    def __init__(self, price_path, positions, cache=None):
+        self.price_path = price_path
+        self.positions = positions
+        self.cache = cache
+        self._rows = None
+        # 行データを読み込む前の単価表の署名（cache への保存時に読み込み中の更新を検知する）
+        self._rows_signature = None
+        self._layout = None
+        self._matrix = None
+
+    @property
+    def loaded(self) -> bool:
+        """単価表ブックを実際に読み込んだか"""
+        return self._rows is not None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows_signature = session_cache.file_signature(self.price_path)
+            self._rows = _session_read("price_rows", self.price_path, _price_rows_params(self.positions),
+                                       lambda: read_price_rows(self.price_path, self.positions))
+        return self._rows
+
+    def set_rows(self, rows, signature):
+        """別途読み込んだ行データ（read_price_rows の戻り値）と読み込み前の署名を設定"""
+        self._rows = rows
+        self._rows_signature = signature
+
+    def needs_rows(self, year_months) -> bool:
+        """year_months の抽出に単価表ブックの読み込みが必要か（全月分の単価・行データがキャッシュに無いか）。
+        全月分の単価は単価表全体から作るため、year_months によらず判定は同じ"""
+        if self._rows is not None or self._matrix is not None:
+            return False
+        self._matrix = self._stored_matrix()
+        if self._matrix is not None:
+            return False
+        session = session_cache.from_settings()
+        if session is not None:
+            signature = session_cache.file_signature(self.price_path)
+            rows = session.get("price_rows", self.price_path, _price_rows_params(self.positions))
+            if rows is not None:
+                self.set_rows(rows, signature)
+                return False
+        return True
+
+    @property
+    def layout(self):
+        if self._layout is None:
+            params = {"scan_rows": len(self.rows)}
+            data = self.cache.get("layout", self.price_path, params) if self.cache is not None else None
+            if data is not None:
+                self._layout = price_index.MonthLayout.from_list(data)
+            else:
+                self._layout = price_index.MonthLayout.build(self.rows)
+                if self.cache is not None:
+                    self.cache.put("layout", self.price_path, params, self._layout.to_list(),
+                                   self._rows_signature)
+        return self._layout
+
+    def _matrix_params(self):
+        return {
+            "format": price_matrix.FORMAT_VERSION,
+            "id_row_in_price": self.positions.id_row_in_price,
+            "price_row_in_price": self.positions.price_row_in_price,
+        }
+
+    def _stored_matrix(self):
+        """session_cache・cache に保持した全月分の単価（無ければ None）"""
+        params = self._matrix_params()
+        session = session_cache.from_settings()
+        matrix = session.get("price_matrix", self.price_path, params) if session is not None else None
+        if matrix is not None or self.cache is None:
+            return matrix
+        data = self.cache.get("price_matrix", self.price_path, params)
+        if data is None:
+            return None
+        try:
+            matrix = price_matrix.PriceMatrix.from_bytes(base64.b64decode(data))
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"キャッシュ読み込みエラー: {e}")
+            return None
+        if session is not None:
+            session.put("price_matrix", self.price_path, params, matrix)
+        return matrix
+
+    @property
+    def matrix(self):
+        """全月分の単価（キャッシュに無ければ単価表の行データから作成して保持）"""
+        if self._matrix is None:
+            self._matrix = self._stored_matrix()
+        if self._matrix is None:
+            months = self.layout.months()
+            self._matrix = price_matrix.PriceMatrix.build(
+                self.rows, [self.layout.span(year_month) for year_month in months],
+                self.positions.id_row_in_price, self.positions.price_row_in_price)
+            params = self._matrix_params()
+            session = session_cache.from_settings()
+            if session is not None:
+                session.put("price_matrix", self.price_path, params, self._matrix)
+            if self.cache is not None:
+                try:
+                    data = base64.b64encode(self._matrix.to_bytes()).decode("ascii")
+                except (TypeError, ValueError) as e:
+                    print(f"キャッシュ保存エラー: {e}")
+                else:
+                    self.cache.put("price_matrix", self.price_path, params, data, self._rows_signature)
+        return self._matrix
+
+    def month_prices(self, year_month):
+        """対象年月の ID→単価 辞書（キャッシュが有効ならブックを開かない）"""
+        matrix = self.matrix
+        if not matrix.has_month(year_month):
+            raise TransferError(f"{year_month}のセルが見つかりません")
+        return matrix.month_prices(year_month)
+
+
+def load_month_prices(price_path, year_month, positions, cache=None):
+    """単価表から対象年月の ID→単価 辞書を取得（キャッシュが有効ならブックを開かない）"""
+    return PriceTable(price_path, positions, cache).month_prices(year_month)
+
+
+def used_rows(rows, key, blank_limit=None):
+    """読み込みバックエンドの columns の行（(行番号, (列の値, ...))）を、key 番目の列（ID 列）が空でない最後の行までのリストにする。
+
+    ID 列が空の行が blank_limit 行続いた時点で読むのをやめる（書式・罫線だけの行で max_row が
+    大きいシートで、空の行を最後まで読まない）。blank_limit が 0 なら最後まで読む。
+    省略時は Settings.USED_RANGE_BLANK_ROWS（並列読み込みの子プロセスには明示的に渡すこと）。
+    """
+    blank_limit = Settings.USED_RANGE_BLANK_ROWS if blank_limit is None else blank_limit
+    result = []
+    used = 0
+    for row in rows:
+        result.append(row)
+        if row[1][key] is not None:
+            used = len(result)
+        elif blank_limit and len(result) - used >= blank_limit:
+            break
+    del result[used:]
+    return result
+
+
+def read_stock_sheets(stock_path, year_months, positions, blank_limit=None, backend=None):
+    """在庫表を開き、{YYYYMM: (シート名, [(行, ID, 現在の単価), ...])} を返す（シートが無い月は含めない）。
+    各シートは ID 列の使用範囲（used_rows）まで読む"""
+    columns = [positions.id_column_in_stock, positions.price_column_in_stock]
+
+    def read(book):
+        sheets = {}
+        for year_month in year_months:
+            sheetname = find_month_sheetname(book.sheetnames, year_month)
+            if sheetname:
+                rows = used_rows(book.columns(sheetname, columns), 0, blank_limit)
+                sheets[year_month] = (sheetname, [(row_num, id, price) for row_num, (id, price) in rows])
+        return sheets
+
+    return _read_book(stock_path, read, backend)
+
+
+def _apply_stock_prices(sheetname, stock_rows, id_price_dict, positions, result, progress, cancel, message):
+    """在庫シートの ID に一致する行の単価セルの変更内容を作成し、(変更 {(行, 列): 値}, 走査行数) を返す。
+
+    現在の単価と同じ値のセルは変更に含めない。変更は result.journal に、
+    データ開始行以降で単価の無い ID は result.unmatched に記録する。
+    """
+    changes = {}
+    max_row = len(stock_rows)
+    price_col = positions.price_column_in_stock
+    journal = result.journal
+    for done, (row_num, id, old_price) in enumerate(stock_rows, start=1):
+        price = id_price_dict.get(id, None)
+        if price:
+            if journal.record(sheetname, row_num, id, price_col, old_price, price):
+                changes[(row_num, price_col)] = price
+        elif id is not None and row_num >= positions.data_start_row_in_stock:
+            result.unmatched.append((sheetname, row_num, id))
+        if done % 50 == 0 or done == max_row:
+            _check_cancel(cancel)
+            _notify(progress, done, max_row, message)
+    return changes, max_row
+
+
+def _backup(path, label, run, origin):
+    """書き込み前のバックアップ（BACKUP_ENABLED の場合）。作成できなければ TransferError（保存しない）"""
+    store = backup_store.from_settings()
+    if store is None:
+        return
+    try:
+        store.backup(path, label, run, origin=origin)
+    except Exception as e:
+        raise TransferError(f"{label}ファイルのバックアップを作成できないため保存しませんでした: {e}") from e
+
+
+def write_cells(path, changes, label, backup_run=None, backup_origin=backup_store.ORIGIN_TRANSFER):
+    """changes {シート名: {(行, 列): 値}} を path に書き込む。
+
+    対象シート XML のセルだけを書き換える（xlsx_patch）。部分書き換えできない
+    ブックの場合は openpyxl で読み込んで保存する。書き込んだセル数を返す（0 件ならファイルに触れない）。
+    書き込む前に backup_store にバックアップする（backup_run: まとめて復元する実行ID。省略時は新しい実行。
+    backup_origin: 実行の種類。自動更新は backup_store.ORIGIN_WATCH）。
+    """
+    changes = {sheet_name: cells for sheet_name, cells in changes.items() if cells}
+    count = sum(len(cells) for cells in changes.values())
+    if not count:
+        return 0
+    _backup(path, label, backup_run, backup_origin)
+    # 書き込み後（失敗時も）に読み込み済みデータを返さないよう先に破棄
+    session_cache.invalidate(path)
+    try:
+        xlsx_patch.patch_workbook_in_place(path, changes)
+        return count
+    except xlsx_patch.PatchUnsupported as e:
+        print(f"部分書き換えできないため通常保存します: {e}")
+    except PermissionError as e:
+        raise FileLocked(_locked_message(label)) from e
+    except Exception as e:
+        raise TransferError(f"予期しないエラーが発生しました: {e}") from e
+
+    workbook = _load_workbook(path)
+    for sheet_name, cells in changes.items():
+        sheet = workbook[sheet_name]
+        for (row, column), value in cells.items():
+            sheet.cell(row=row, column=column, value=value)
+    _save_workbook(workbook, path, label)
+    return count
+
+
+class PendingWrite(NamedTuple):
+    """保存待ちの書き込み 1 ファイル分"""
+    # 書き込みセル数・保存時間を記録する転記結果の種類（"stock" / "sales"）
+    kind: str
+    path: str
+    # {シート名: {(行, 列): 値}}
+    changes: dict
+    # エラー表示用の名前（"在庫" など）と保存中の進捗表示
+    label: str
+    message: str
+    # 読み込み前の (更新時刻 ns, サイズ)。保存前に変わっていれば他で更新されたため保存しない
+    signature: tuple = None
+
+
+class PendingSave:
+    """計算済みで未保存の書き込み。retry() で残りの書き込みだけを行う（読み込み・計算はやり直さない）。
+
+    spool / load でディスクに書き出し、別のプロセス（CLI の retry-save）から再試行することもできる。
+    """
+
+    def __init__(self, result, writes, backup_run=None):
+        self.result = result
+        self.writes = list(writes)
+        # 保存前バックアップの実行ID（再試行しても同じ転記のバックアップとしてまとめる）
+        self.backup_run = backup_run or backup_store.new_run_id()
+        # 保存したファイルの保存直後の署名 {パス: 署名}
+        self.saved = {}
+
+    @property
+    def paths(self):
+        return [write.path for write in self.writes]
+
+    def stage(self, kind):
+        """kind の転記結果（PipelineResult なら該当する段階）"""
+        for stage in getattr(self.result, "stages", [self.result]):
+            if stage.kind == kind:
+                return stage
+        return self.result
+
+    def retry(self, progress=None, cancel=None):
+        """残りの書き込みを行い、転記結果を返す。まだ書けなければ SavePending"""
+        _write_pending(self, progress, cancel)
+        return self.result
+
+    def to_dict(self) -> dict:
+        return {
+            "result": self.result.to_dict(),
+            "backup_run": self.backup_run,
+            "writes": [{
+                "kind": write.kind,
+                "path": write.path,
+                "label": write.label,
+                "message": write.message,
+                "signature": write.signature,
+                "changes": [[sheet, row, column, value] for sheet, cells in write.changes.items()
+                            for (row, column), value in cells.items()],
+            } for write in self.writes],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        writes = []
+        for item in data["writes"]:
+            changes = {}
+            for sheet, row, column, value in item["changes"]:
+                changes.setdefault(sheet, {})[(row, column)] = value
+            signature = tuple(item["signature"]) if item.get("signature") else None
+            writes.append(PendingWrite(item["kind"], item["path"], changes, item["label"], item["message"], signature))
+        return cls(result_from_dict(data["result"]), writes, data.get("backup_run"))
+
+    def spool(self, directory):
+        """directory に JSON で書き出してパスを返す"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"pending-{datetime.datetime.now():%Y%m%d-%H%M%S-%f}.json")
+        self.save(path)
+        return path
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, default=str)
+
+    @classmethod
+    def load(cls, path):
+        """spool で書き出したファイルから復元（形式が違えば ValueError）"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            return cls.from_dict(data)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"保存待ちファイルの形式が違います: {path}") from e
+
+
+def _wait(cancel, seconds):
+    """seconds 秒待つ（cancel が threading.Event ならキャンセル要求で打ち切る）"""
+    if cancel is not None and hasattr(cancel, "wait"):
+        cancel.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def _write_pending(pending, progress=None, cancel=None):
+    """pending の書き込みを順に行い、終わったものから取り除く。
+
+    保存先が開かれていれば SAVE_RETRY_COUNT 回まで SAVE_RETRY_INTERVAL_SEC 秒から間隔を倍にしながら
+    再試行し（待機中のキャンセル要求で打ち切り）、それでも書けなければ SavePending。
+    読み込み後に保存先が他で更新されていれば、計算結果が古いため TransferError（保存しない）。
+    """
+    while pending.writes:
+        write = pending.writes[0]
+        if not any(write.changes.values()):
+            pending.writes.pop(0)
+            continue
+        stage = pending.stage(write.kind)
+        attempt = 0
+        while True:
+            if write.signature is not None and session_cache.file_signature(write.path) != write.signature:
+                pending.writes.pop(0)
+                raise TransferError(f"{write.label}ファイルが読み込み後に変更されています。再度実行してください。")
+            try:
+                with _phase(stage, "save"):
+                    _notify(progress, 0, 0, write.message)
+                    stage.cells_written += write_cells(write.path, write.changes, write.label, pending.backup_run)
+                break
+            except FileLocked as e:
+                if attempt >= Settings.SAVE_RETRY_COUNT or (cancel is not None and cancel.is_set()):
+                    raise SavePending(f"{write.label}ファイルが開かれているため保存できませんでした。\n"
+                                      "計算結果は保持しています。ファイルを閉じてから保存を再試行してください。",
+                                      pending) from e
+                delay = Settings.SAVE_RETRY_INTERVAL_SEC * 2 ** attempt
+                attempt += 1
+                _notify(progress, 0, 0, f"{write.label}ファイルが開かれています。{delay:g}秒後に再試行"
+                                        f"（{attempt}/{Settings.SAVE_RETRY_COUNT}）")
+                _wait(cancel, delay)
+        pending.writes.pop(0)
+        # 同じファイルへの後続の書き込み（在庫表と売上表が同じブックの場合）は保存後の状態を基準にする
+        signature = pending.saved[write.path] = session_cache.file_signature(write.path)
+        pending.writes = [later._replace(signature=signature) if later.path == write.path else later
+                          for later in pending.writes]
+
+
+def _prepare_save(targets, dry_run):
+    """保存先 [(パス, 表示名), ...] に書き込めるかを読み込み前に確認し、{パス: 読み込み前の署名} を返す"""
+    if dry_run:
+        return {}
+    for path, label in targets:
+        check_writable(path, label)
+    return {path: session_cache.file_signature(path) for path, _ in targets}
+
+
+def _save(result, writes, progress, cancel):
+    _write_pending(PendingSave(result, writes), progress, cancel)
+
+
+def _load_stock_inputs(price_table, stock_path, year_months, positions):
+    """単価表（キャッシュに無い月がある場合のみ）と在庫表を並列に読み込み、read_stock_sheets の戻り値を返す"""
+    price_path = price_table.price_path
+    session = session_cache.from_settings()
+    # session_cache に無い月だけ在庫表から読む（シートが無い月は None として保持）
+    stock_sheets = {}
+    missing = []
+    for year_month in year_months:
+        data = _MISSING if session is None else session.get(
+            "stock_sheet", stock_path, _stock_sheet_params(year_month, positions), _MISSING)
+        if data is _MISSING:
+            missing.append(year_month)
+        elif data is not None:
+            stock_sheets[year_month] = data
+
+    tasks = {}
+    if price_table.needs_rows(year_months):
+        tasks["price"] = parallel_load.Task(price_path, read_price_rows,
+                                            (price_path, positions, Settings.READER_BACKEND))
+    if missing:
+        tasks["stock"] = parallel_load.Task(stock_path, read_stock_sheets,
+                                            (stock_path, missing, positions, Settings.USED_RANGE_BLANK_ROWS,
+                                             Settings.READER_BACKEND))
+    signatures = {task.path: session_cache.file_signature(task.path) for task in tasks.values()}
+    loaded = parallel_load.run(tasks) if tasks else {}
+    if "price" in loaded:
+        price_table.set_rows(loaded["price"], signatures[price_path])
+        if session is not None:
+            session.put("price_rows", price_path, _price_rows_params(positions), loaded["price"],
+                        signatures[price_path])
+    if "stock" in loaded:
+        for year_month in missing:
+            data = loaded["stock"].get(year_month)
+            if session is not None:
+                session.put("stock_sheet", stock_path, _stock_sheet_params(year_month, positions), data,
+                            signatures[stock_path])
+            if data is not None:
+                stock_sheets[year_month] = data
+    return stock_sheets
+
+
+def _stock_sheet_params(year_month, positions):
+    return {
+        "year_month": year_month,
+        "id_column_in_stock": positions.id_column_in_stock,
+        "price_column_in_stock": positions.price_column_in_stock,
+        "used_range_blank_rows": Settings.USED_RANGE_BLANK_ROWS,
+    }
+
+
+def transfer_stock(price_path, stock_path, year_month, positions=None, progress=None, cancel=None, cache=None,
+                   dry_run=False):
+    """単価表の対象年月の単価を在庫表の YYYYMM シートへ転記して保存する。
+
+    在庫表は read-only で読み、対象シートの単価セルだけを書き換える（write_cells）。
+    単価表と在庫表は並列に読み込む（parallel_load）。
+    progress: progress(done, total, message) 形式のコールバック（任意）
+    cancel: is_set() を持つオブジェクト。保存開始前までのキャンセルに対応（任意）
+    cache: index_cache.IndexCache。単価表の抽出結果を再利用する（任意）
+    dry_run: True なら保存せず、変更内容（result.journal / result.unmatched）だけを返す
+    """
+    positions = positions or Positions.from_settings()
+    result = TransferResult("stock", year_month, stock_path, dry_run=dry_run)
+    signatures = _prepare_save([(stock_path, "在庫")], dry_run)
+    sheetname, _, changes = _prepare_stock(price_path, stock_path, year_month, positions, result,
+                                           progress, cancel, cache)
+
+    _check_cancel(cancel)
+    if changes and not dry_run:
+        _save(result, [_stock_write(result, {sheetname: changes}, signatures)], progress, cancel)
+    return result
+
+
+def _prepare_stock(price_path, stock_path, year_month, positions, result, progress, cancel, cache):
+    """transfer_stock の読み込み〜転記（保存前まで）。(シート名, 在庫シートの行, 変更) を返す"""
+    price_table = PriceTable(price_path, positions, cache)
+
+    with _phase(result, "load"):
+        _notify(progress, 0, 0, "単価表・在庫表を読み込み中")
+        stock_sheets = _load_stock_inputs(price_table, stock_path, [year_month], positions)
+        _check_cancel(cancel)
+
+    with _phase(result, "index"):
+        id_price_dict = price_table.month_prices(year_month)
+
+    # 在庫表に転記
+    if year_month not in stock_sheets:
+        raise TransferError(f"{year_month}の在庫シートが見つかりません")
+    sheetname, stock_rows = stock_sheets[year_month]
+
+    with _phase(result, "transfer"):
+        changes, result.scanned = _apply_stock_prices(
+            sheetname, stock_rows, id_price_dict, positions, result, progress, cancel, "在庫処理")
+        result.updated = len(changes)
+        result.unchanged = result.journal.unchanged
+    return sheetname, stock_rows, changes
+
+
+def _stock_write(result, changes, signatures):
+    return PendingWrite("stock", result.target_path, changes, "在庫", "在庫表を保存中",
+                        signatures.get(result.target_path))
+
+
+def transfer_stock_range(price_path, stock_path, start, end, positions=None, progress=None, cancel=None, cache=None,
+                         dry_run=False):
+    """start〜end の各月について単価表の単価を在庫表の YYYYMM シートへ転記する。
+
+    単価表・在庫表はそれぞれ 1 回だけ読み込み、保存も最後に 1 回だけ行う。
+    単価表の見出しや在庫シートが無い月はスキップして result.errors に記録する
+    （1 か月も転記できなかった場合は TransferError）。dry_run は transfer_stock と同じ。
+    """
+    positions = positions or Positions.from_settings()
+    year_months = list(iter_year_months(start, end))
+    result = TransferResult("stock", f"{start}-{end}", stock_path, dry_run=dry_run)
+    signatures = _prepare_save([(stock_path, "在庫")], dry_run)
+    price_table = PriceTable(price_path, positions, cache)
+
+    with _phase(result, "load"):
+        _notify(progress, 0, 0, "単価表・在庫表を読み込み中")
+        stock_sheets = _load_stock_inputs(price_table, stock_path, year_months, positions)
+        _check_cancel(cancel)
+
+    changes = {}
+    for year_month in year_months:
+        if year_month not in stock_sheets:
+            result.errors.append(f"{year_month}の在庫シートが見つかりません")
+            continue
+        sheetname, stock_rows = stock_sheets[year_month]
+        with _phase(result, "index"):
+            _notify(progress, 0, 0, f"単価表 {year_month} を抽出中")
+            try:
+                id_price_dict = price_table.month_prices(year_month)
+            except TransferError as e:
+                # 単価表自体が読めない場合は中断、見出しが無い月だけスキップ
+                if not price_table.loaded:
+                    raise
+                result.errors.append(str(e))
+                continue
+        _check_cancel(cancel)
+        with _phase(result, "transfer"):
+            sheet_changes, scanned = _apply_stock_prices(
+                sheetname, stock_rows, id_price_dict, positions, result, progress, cancel,
+                f"在庫処理 {year_month}")
+        changes.setdefault(sheetname, {}).update(sheet_changes)
+        result.per_month[year_month] = len(sheet_changes)
+        result.updated += len(sheet_changes)
+        result.scanned += scanned
+
+    if not result.per_month:
+        raise TransferError(f"{start}〜{end} に転記できる月がありません\n" + "\n".join(result.errors))
+    result.unchanged = result.journal.unchanged
+
+    _check_cancel(cancel)
+    if result.updated and not dry_run:
+        _save(result, [_stock_write(result, changes, signatures)], progress, cancel)
+    return result
+
+
+def extract_stock_prices(pairs):
+    """在庫表の (ID, 単価) ペア列から ID→単価 辞書を作成"""
+    id_price_dict = {}
+    for id, price in pairs:
+        if id and price:
+            id_price_dict[id] = price
+    return id_price_dict
+
+
+def _stock_index_params(year_month, positions):
+    return {
+        "year_month": year_month,
+        "id_column_in_stock": positions.id_column_in_stock,
+        "price_column_in_stock": positions.price_column_in_stock,
+        "data_start_row_in_stock": positions.data_start_row_in_stock,
+        "used_range_blank_rows": Settings.USED_RANGE_BLANK_ROWS,
+    }
+
+
+def read_stock_prices(stock_path, year_month, positions, cache=None):
+    """在庫表の対象年月シートから ID→単価 辞書を取得（キャッシュが有効ならブックを開かない）"""
+    return _cached_index(
+        cache, "stock", stock_path, _stock_index_params(year_month, positions),
+        lambda: _read_stock_prices(stock_path, year_month, positions),
+    )
+
+
+def _read_stock_prices(stock_path, year_month, positions, blank_limit=None, backend=None):
+    """在庫表を開き、対象年月シートの ID 列・単価列だけを読んで ID→単価 辞書を作成"""
+    columns = [positions.id_column_in_stock, positions.price_column_in_stock]
+
+    def read(book):
+        sheetname = find_month_sheetname(book.sheetnames, year_month)
+        if not sheetname:
+            raise TransferError(f"{year_month}の在庫シートが見つかりません")
+        rows = book.columns(sheetname, columns, min_row=positions.data_start_row_in_stock)
+        return extract_stock_prices(values for _, values in used_rows(rows, 0, blank_limit))
+
+    return _read_book(stock_path, read, backend)
+
+
+def split_sales_paths(text):
+    """SALES_PATH_SEPARATOR 区切りの売上表パスをリストにする（空の要素は除く）"""
+    return [path.strip() for path in text.split(SALES_PATH_SEPARATOR) if path.strip()]
+
+
+def select_sales_sheets(sheetnames, active_title, sheet_pattern=""):
+    """処理する売上シート名のリスト。sheet_pattern が空なら作業中のシート、
+    それ以外はシート名がパターン（* ? を使える。大文字・小文字は区別しない）に一致するシート"""
+    if not sheet_pattern:
+        return [active_title]
+    pattern = sheet_pattern.casefold()
+    return [name for name in sheetnames if fnmatch.fnmatchcase(name.casefold(), pattern)]
+
+
+def _sales_sheets_params(positions, sheet_pattern):
+    return {
+        "sheet_pattern": sheet_pattern,
+        "id_column_in_sales": positions.id_column_in_sales,
+        "sales_column_in_sales": positions.sales_column_in_sales,
+        "sales_num_column_in_sales": positions.sales_num_column_in_sales,
+        "profit_column_in_sales": positions.profit_column_in_sales,
+        "profit_rate_column_in_sales": positions.profit_rate_column_in_sales,
+        "customer_column_in_sales": positions.customer_column_in_sales,
+        "used_range_blank_rows": Settings.USED_RANGE_BLANK_ROWS,
+    }
+
+
+def read_sales_sheets(sales_path, positions, sheet_pattern="", blank_limit=None, backend=None):
+    """売上表を開き、[(シート名, [(行, (ID, 売上金額, 売上数量, 利益, 利益率[, 得意先])), ...]), ...] を返す。
+    得意先は得意先列が設定されている（0 でない）場合のみ。各シートは ID 列の使用範囲（used_rows）まで読む"""
+    columns = [
+        positions.id_column_in_sales,
+        positions.sales_column_in_sales,
+        positions.sales_num_column_in_sales,
+        positions.profit_column_in_sales,
+        positions.profit_rate_column_in_sales,
+    ]
+    if positions.customer_column_in_sales:
+        columns.append(positions.customer_column_in_sales)
+
+    def read(book):
+        sheetnames = select_sales_sheets(book.sheetnames, book.active, sheet_pattern)
+        if not sheetnames:
+            raise TransferError(f"{os.path.basename(sales_path)}に「{sheet_pattern}」に一致するシートがありません")
+        return [(sheetname, used_rows(book.columns(sheetname, columns), 0, blank_limit))
+                for sheetname in sheetnames]
+
+    return _read_book(sales_path, read, backend)
+
+
+def read_sales_rows(sales_path, positions):
+    """売上表の作業中のシートを読み、(シート名, [(行, (ID, 売上金額, 売上数量, 利益, 利益率)), ...]) を返す"""
+    return read_sales_sheets(sales_path, positions)[0]
+
+
+def _apply_sales_rows(label, sales_rows, id_price_dict, positions, result, progress, cancel, message):
+    """売上シート 1 枚分の利益・利益率を計算し、(変更 {(行, 列): 値}, 更新行数) を返す。
+
+    変更・単価なし・エラーはシートの表示名 label で result に記録し、
+    result.profit_summary があれば計算した行を同じ走査で商品別・得意先別に集計する。
+    """
+    changes = {}
+    updated = 0
+    journal = result.journal
+    profit_col, profit_rate_col = positions.profit_column_in_sales, positions.profit_rate_column_in_sales
+    max_row = len(sales_rows)
+    _notify(progress, 0, max_row, message)
+    row_nums = [row for row, _ in sales_rows]
+    columns = list(zip(*(values for _, values in sales_rows))) if sales_rows else [()] * 5
+    ids, sales_values, sales_nums, old_profits, old_profit_rates = columns[:5]
+    calc = profit_calc.compute(ids, sales_values, sales_nums, id_price_dict)
+    _check_cancel(cancel)
+    if result.profit_summary is not None:
+        customers = columns[5] if len(columns) > 5 else None
+        result.profit_summary.add_sheet(ids, customers, sales_nums, sales_values, calc)
+    for index, profit, profit_rate in calc.rows():
+        row, id = row_nums[index], ids[index]
+        changed = False
+        if journal.record(label, row, id, profit_col, old_profits[index], profit):
+            changes[(row, profit_col)] = profit
+            changed = True
+        if journal.record(label, row, id, profit_rate_col, old_profit_rates[index], profit_rate):
+            changes[(row, profit_rate_col)] = profit_rate
+            changed = True
+        if changed:
+            updated += 1
+    for index, reason in calc.errors:
+        result.errors.append(f"{label} 行 {row_nums[index]} でデータ変換エラー: {reason}"
+                             f"（売上金額={sales_values[index]!r}, 売上数量={sales_nums[index]!r}）")
+    if calc.errors:
+        print(f"データ変換エラー {len(calc.errors)}行（{label} 行 {row_nums[calc.errors[0][0]]} ほか）")
+    result.unmatched.extend((label, row_nums[index], ids[index]) for index in calc.unmatched)
+    _notify(progress, max_row, max_row, message)
+    result.scanned += max_row
+    return changes, updated
+
+
+def transfer_sales(stock_path, sales_path, year_month, positions=None, progress=None, cancel=None, cache=None,
+                   dry_run=False, sheet_pattern="", stock_prices=None):
+    """在庫表の対象年月シートの単価で売上表の利益・利益率を計算して保存する。
+
+    売上表は read-only で読み、利益・利益率のセルだけを書き換える（他の数式は残る）。
+    在庫表と（1 つ目の）売上表は並列に読み込む（parallel_load）。
+    sales_path: 売上表のパス。複数ファイルはリストで指定し、在庫表の ID→単価 は 1 回だけ作成する
+    sheet_pattern: 処理するシート名のパターン（空なら作業中のシート、"*" なら全シート）
+    progress: progress(done, total, message) 形式のコールバック（任意）
+    cancel: is_set() を持つオブジェクト。保存開始前までのキャンセルに対応（任意）
+    cache: index_cache.IndexCache。在庫表の抽出結果を再利用する（任意）
+    dry_run: True なら保存せず、変更内容（result.journal / result.unmatched）だけを返す
+    stock_prices: 在庫表の ID→単価（transfer_stock_and_sales が渡す）。指定時は在庫表を読まない
+
+    全ファイル・全シートを計算してから保存する。保存中にエラーになった場合、それより前のファイルは保存済み。
+    """
+    positions = positions or Positions.from_settings()
+    sales_paths = [sales_path] if isinstance(sales_path, str) else list(sales_path)
+    result = TransferResult("sales", year_month, SALES_PATH_SEPARATOR.join(sales_paths), dry_run=dry_run)
+    signatures = _prepare_save(_sales_targets(sales_paths), dry_run)
+    pending = _prepare_sales(stock_path, sales_paths, year_month, positions, result, progress, cancel, cache,
+                             sheet_pattern, stock_prices)
+
+    _check_cancel(cancel)
+    if result.updated and not dry_run:
+        _save(result, _sales_writes(pending, signatures), progress, cancel)
+    return result
+
+
+def _prepare_sales(stock_path, sales_paths, year_month, positions, result, progress, cancel, cache,
+                   sheet_pattern, stock_prices):
+    """transfer_sales の読み込み〜計算（保存前まで）。[(売上表のパス, {シート名: 変更}), ...] を返す"""
+    # 複数ファイルならシートの表示名にファイル名を付ける（ジャーナル・エラー表示用）
+    multiple_files = len(sales_paths) > 1
+    if Settings.PROFIT_REPORT_ENABLED:
+        result.profit_summary = ProfitSummary()
+
+    stock_params = _stock_index_params(year_month, positions)
+    with _phase(result, "index"):
+        id_price_dict = stock_prices
+        if id_price_dict is None:
+            id_price_dict = _cache_get(cache, "stock", stock_path, stock_params)
+
+    with _phase(result, "load"):
+        # 在庫表（キャッシュに無い場合のみ）と 1 つ目の売上表を並列に読み込む
+        _notify(progress, 0, 0, "在庫表・売上表を読み込み中" if id_price_dict is None else "売上表を読み込み中")
+        session = session_cache.from_settings()
+        sales_params = _sales_sheets_params(positions, sheet_pattern)
+        sheets = None if session is None else session.get("sales_sheets", sales_paths[0], sales_params)
+        tasks = {}
+        if id_price_dict is None:
+            tasks["stock"] = parallel_load.Task(stock_path, _read_stock_prices,
+                                                (stock_path, year_month, positions, Settings.USED_RANGE_BLANK_ROWS,
+                                                 Settings.READER_BACKEND))
+        if sheets is None:
+            tasks["sales"] = parallel_load.Task(sales_paths[0], read_sales_sheets,
+                                                (sales_paths[0], positions, sheet_pattern,
+                                                 Settings.USED_RANGE_BLANK_ROWS, Settings.READER_BACKEND))
+        signature = session_cache.file_signature(sales_paths[0])
+        stock_signature = session_cache.file_signature(stock_path)
+        loaded = parallel_load.run(tasks) if tasks else {}
+        if id_price_dict is None:
+            id_price_dict = loaded["stock"]
+            _cache_put(cache, "stock", stock_path, stock_params, id_price_dict, stock_signature)
+        if sheets is None:
+            sheets = loaded.pop("sales")
+            if session is not None:
+                session.put("sales_sheets", sales_paths[0], sales_params, sheets, signature)
+        _check_cancel(cancel)
+
+    pending = []
+    for index, path in enumerate(sales_paths):
+        if index:
+            with _phase(result, "load"):
+                _notify(progress, 0, 0, f"売上表を読み込み中 {os.path.basename(path)}")
+                sheets = _session_read("sales_sheets", path, _sales_sheets_params(positions, sheet_pattern),
+                                       lambda: read_sales_sheets(path, positions, sheet_pattern))
+                _check_cancel(cancel)
+        file_changes = {}
+        with _phase(result, "transfer"):
+            for sheetname, sales_rows in sheets:
+                label = f"{os.path.basename(path)}:{sheetname}" if multiple_files else sheetname
+                message = f"売上処理 {label}" if multiple_files or len(sheets) > 1 else "売上処理"
+                changes, updated = _apply_sales_rows(label, sales_rows, id_price_dict, positions,
+                                                     result, progress, cancel, message)
+                file_changes[sheetname] = changes
+                result.per_sheet[label] = updated
+                result.updated += updated
+        # 行データは保持せず、変更だけを保存まで残す
+        sheets = None
+        pending.append((path, file_changes))
+    result.unchanged = result.journal.unchanged
+    return pending
+
+
+def _sales_label(path, multiple_files):
+    return f"売上（{os.path.basename(path)}）" if multiple_files else "売上"
+
+
+def _sales_targets(sales_paths):
+    return [(path, _sales_label(path, len(sales_paths) > 1)) for path in sales_paths]
+
+
+def _sales_writes(pending, signatures):
+    """_prepare_sales の戻り値から売上表ごとの PendingWrite を作成"""
+    multiple_files = len(pending) > 1
+    return [PendingWrite("sales", path, file_changes, _sales_label(path, multiple_files),
+                         f"売上表を保存中 {os.path.basename(path)}" if multiple_files else "売上表を保存中",
+                         signatures.get(path))
+            for path, file_changes in pending]
+
+
+def transferred_stock_prices(stock_rows, changes, positions):
+    """在庫シートの行と転記による変更から、転記後の ID→単価 を作成（_read_stock_prices と同じ規則）"""
+    price_col = positions.price_column_in_stock
+    return extract_stock_prices(
+        (id, changes.get((row_num, price_col), price))
+        for row_num, id, price in stock_rows if row_num >= positions.data_start_row_in_stock)
+
+
+def transfer_stock_and_sales(price_path, stock_path, sales_path, year_month, positions=None, progress=None,
+                             cancel=None, cache=None, dry_run=False, sheet_pattern=""):
+    """在庫表への転記と売上表の利益計算を続けて行う。
+
+    在庫表への転記で得た転記後の ID→単価 をそのまま売上表の計算に使い、在庫表を読み直さない
+    （保存したばかりのセルにキャッシュ値が無く data_only で読めない問題も起きない）。
+    両方の計算が終わってから 在庫表 → 売上表 の順に保存する（保存開始前までキャンセル可）。
+    dry_run なら保存せず、転記後の単価で計算した売上表の変更内容も含めて返す。
+    """
+    positions = positions or Positions.from_settings()
+    sales_paths = [sales_path] if isinstance(sales_path, str) else list(sales_path)
+    stock_result = TransferResult("stock", year_month, stock_path, dry_run=dry_run)
+    signatures = _prepare_save([(stock_path, "在庫")] + _sales_targets(sales_paths), dry_run)
+    sheetname, stock_rows, stock_changes = _prepare_stock(
+        price_path, stock_path, year_month, positions, stock_result, progress, cancel, cache)
+    with _phase(stock_result, "index"):
+        stock_prices = transferred_stock_prices(stock_rows, stock_changes, positions)
+    stock_rows = None
+
+    sales_result = TransferResult("sales", year_month, SALES_PATH_SEPARATOR.join(sales_paths), dry_run=dry_run)
+    pending = _prepare_sales(stock_path, sales_paths, year_month, positions, sales_result, progress, cancel,
+                             cache, sheet_pattern, stock_prices)
+
+    _check_cancel(cancel)
+    result = PipelineResult(stock_result, sales_result)
+    if not dry_run:
+        stock_write = _stock_write(stock_result, {sheetname: stock_changes}, signatures)
+        save = PendingSave(result, [stock_write] + (_sales_writes(pending, signatures) if sales_result.updated else []))
+        stock_params = _stock_index_params(year_month, positions)
+        try:
+            _write_pending(save, progress, cancel)
+        except SavePending:
+            # 売上表だけが保存待ちなら在庫表は保存済みのためキャッシュする（TransferError では保存していない場合がある）
+            if all(write.path != stock_path for write in save.writes):
+                _cache_put(cache, "stock", stock_path, stock_params, stock_prices,
+                           save.saved.get(stock_path, signatures.get(stock_path)))
+            raise
+        # 保存後の在庫表の ID→単価 をキャッシュ（単独の売上転記で再利用）。保存できた場合だけ。
+        # 署名は保存直後のもの（変更が無く保存しなかった場合は読み込み前のもの）
+        _cache_put(cache, "stock", stock_path, stock_params, stock_prices,
+                   save.saved.get(stock_path, signatures.get(stock_path)))
+    return result
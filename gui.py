@@ -0,0 +1,997 @@
+import os
+import datetime
+import functools
+import customtkinter as ctk
+from tkinter import filedialog, messagebox, ttk
+
+import backup_store
+import daemon_client
+import engine
+import index_cache
+import journal
+import run_log
+import startup
+import watch
+import worker
+from settings import Settings
+
+class SettingsWindow(ctk.CTkToplevel):
+    def __init__(self, app):
+        super().__init__()
+        self.app = app  # 親アプリ参照
+        self.title("設定")
+        # 初期最小サイズ (内容に応じて後で拡張)
+        self.minsize(420, 260)
+        self.resizable(True, True)
+        self._dirty = False
+        self._flash_after_ids = []
+
+        try:
+            self.iconbitmap(Settings.ICON_FILE)
+        except Exception:
+            pass
+        # スクロール可能領域（全体コンテンツ）
+        self.scroll = ctk.CTkScrollableFrame(self, label_text="設定", fg_color=("#E0E0E0", "#1a1a1a"))
+        self.scroll.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # ファイル設定セクション
+        file_section = ctk.CTkFrame(self.scroll, fg_color=("#D0D0D0", "#0f0f0f"))
+        file_section.pack(fill="x", pady=(0,10))
+        ctk.CTkLabel(file_section, text="ファイル設定", font=("Arial", 14, "bold")).grid(row=0, column=0, columnspan=6, sticky="w", pady=(4,4))
+
+        # 共通: パス Entry + ボタン (参照/開く/クリア)
+        self.file_vars = {
+            "price": ctk.StringVar(value=Settings.PRICE_FILE_PATH),
+            "stock": ctk.StringVar(value=Settings.STOCK_FILE_PATH),
+            "sales": ctk.StringVar(value=Settings.SALES_FILE_PATH),
+        }
+        file_labels = {"price": "単価表", "stock": "在庫表", "sales": "売上表"}
+        for r, key in enumerate(["price", "stock", "sales"], start=1):
+            ctk.CTkLabel(file_section, text=file_labels[key], width=70, anchor="w").grid(row=r, column=0, padx=4, pady=2, sticky="w")
+            entry = ctk.CTkEntry(file_section, textvariable=self.file_vars[key], width=230)
+            entry.grid(row=r, column=1, padx=4, pady=2, sticky="we", columnspan=2)
+            browse_btn = ctk.CTkButton(file_section, text="参照", width=50, command=lambda k=key: self.select_file(k))
+            browse_btn.grid(row=r, column=3, padx=2, pady=2)
+            open_btn = ctk.CTkButton(file_section, text="開く", width=50, command=lambda k=key: self.open_in_explorer(k))
+            open_btn.grid(row=r, column=4, padx=2, pady=2)
+            clear_btn = ctk.CTkButton(file_section, text="×", width=30, command=lambda k=key: self.clear_path(k))
+            clear_btn.grid(row=r, column=5, padx=2, pady=2)
+        # 売上表のシート選択（空: 作業中のシート、*: 全シート、名前のパターン）
+        self.sheet_pattern_var = ctk.StringVar(value=Settings.SALES_SHEET_PATTERN)
+        ctk.CTkLabel(file_section, text="売上シート", width=70, anchor="w").grid(row=4, column=0, padx=4, pady=2, sticky="w")
+        ctk.CTkEntry(file_section, textvariable=self.sheet_pattern_var, width=230, placeholder_text="空: 作業中のシート / *: 全シート").grid(row=4, column=1, padx=4, pady=2, sticky="we", columnspan=2)
+        for c in range(0,6):
+            file_section.grid_columnconfigure(c, weight= (1 if c in (1,2) else 0))
+
+        # 行・列設定編集フレーム
+        self.position_frame = ctk.CTkFrame(self.scroll, fg_color=("#D0D0D0", "#0f0f0f"))
+        self.position_frame.pack(pady=5, padx=0, fill="x")
+        ctk.CTkLabel(self.position_frame, text="行・列設定", font=("Arial", 14, "bold")).grid(row=0, column=0, columnspan=4, pady=(4,4), sticky="w")
+
+        # 編集対象キーと日本語ラベル
+        self.position_keys = [
+            ("ID_ROW_IN_PRICE", "単価表: ID 行"),
+            ("PRICE_ROW_IN_PRICE", "単価表: 単価 行"),
+            ("ID_COLUMN_IN_STOCK", "在庫表: ID 列"),
+            ("PRICE_COLUMN_IN_STOCK", "在庫表: 単価 列"),
+            ("DATA_START_ROW_IN_STOCK", "在庫表: データ開始 行"),
+            ("ID_COLUMN_IN_SALES", "売上表: ID 列"),
+            ("PROFIT_COLUMN_IN_SALES", "売上表: 利益 列"),
+            ("PROFIT_RATE_COLUMN_IN_SALES", "売上表: 利益率 列"),
+            ("SALES_COLUMN_IN_SALES", "売上表: 売上金額 列"),
+            ("SALES_NUM_COLUMN_IN_SALES", "売上表: 売上数量 列"),
+            ("CUSTOMER_COLUMN_IN_SALES", "売上表: 得意先 列（0: 集計しない）"),
+        ]
+        # 数値入力 validate
+        def _only_int(P):
+            return P.isdigit() or P == ""
+        vcmd = (self.register(_only_int), "%P")
+        self.position_entries = {}
+        for idx, (key, label_text) in enumerate(self.position_keys, start=1):
+            ctk.CTkLabel(self.position_frame, text=label_text, anchor="w").grid(row=idx, column=0, padx=4, pady=1, sticky="w")
+            var = ctk.StringVar(value=str(getattr(Settings, key)))
+            entry = ctk.CTkEntry(self.position_frame, textvariable=var, width=70, validate="key", validatecommand=vcmd)
+            entry.grid(row=idx, column=1, padx=4, pady=1, sticky="w")
+            self.position_entries[key] = (entry, var)
+        self.position_frame.grid_columnconfigure(0, weight=1)
+
+        # 計測設定（実行ログには常に記録。以下は処理が遅くなるため必要時のみ）
+        self.diagnostics_frame = ctk.CTkFrame(self.scroll, fg_color=("#D0D0D0", "#0f0f0f"))
+        self.diagnostics_frame.pack(pady=5, padx=0, fill="x")
+        ctk.CTkLabel(self.diagnostics_frame, text="計測設定", font=("Arial", 14, "bold")).pack(anchor="w", padx=4, pady=(4,4))
+        self.diagnostics_vars = {
+            "TRACE_MEMORY": ctk.BooleanVar(value=Settings.TRACE_MEMORY),
+            "PROFILE_ENABLED": ctk.BooleanVar(value=Settings.PROFILE_ENABLED),
+        }
+        diagnostics_labels = {
+            "TRACE_MEMORY": "ピークメモリを計測する（処理が遅くなります）",
+            "PROFILE_ENABLED": "プロファイル結果を logs フォルダに保存する",
+        }
+        for key, var in self.diagnostics_vars.items():
+            ctk.CTkCheckBox(self.diagnostics_frame, text=diagnostics_labels[key], variable=var).pack(anchor="w", padx=4, pady=2)
+
+        # 現在の設定表示
+        self.info_frame = ctk.CTkFrame(master=self.scroll, fg_color=("#D0D0D0", "#0f0f0f"))
+        self.info_frame.pack(pady=8, padx=0, fill="x")
+
+        ctk.CTkLabel(self.info_frame, text="現在の設定", font=("Arial", 14, "bold")).pack(pady=5)
+
+        self.price_label = ctk.CTkLabel(self.info_frame, text=f"単価表: {os.path.basename(Settings.PRICE_FILE_PATH)}")
+        self.price_label.pack(pady=1)
+        self.stock_label = ctk.CTkLabel(self.info_frame, text=f"在庫表: {os.path.basename(Settings.STOCK_FILE_PATH)}")
+        self.stock_label.pack(pady=1)
+        self.sales_label = ctk.CTkLabel(self.info_frame, text=f"売上表: {self._sales_names(Settings.SALES_FILE_PATH)}")
+        self.sales_label.pack(pady=1)
+
+        # 保存ボタン
+        self.save_button = ctk.CTkButton(
+            master=self.scroll,
+            text="設定を保存",
+            command=self.save_settings
+        )
+        self.save_button.pack(pady=10)
+
+        self.reset_button = ctk.CTkButton(
+            master=self.scroll,
+            text="設定をリセット",
+            command=self.reset_settings
+        )
+        self.reset_button.pack(pady=10)
+
+        # --- 最前面＆フォーカス処理 ---
+        self.after(0, self._bring_to_front)
+        # 起動後に内容サイズへフィット
+        self.after(80, self.auto_fit_size)
+
+        # 変更検知
+        for key, (entry, var) in self.position_entries.items():
+            var.trace_add("write", lambda *_args, k=key: self.mark_dirty(k))
+        for k, var in self.file_vars.items():
+            var.trace_add("write", lambda *_a, kk=k: self.mark_dirty(kk))
+        for k, var in self.diagnostics_vars.items():
+            var.trace_add("write", lambda *_a, kk=k: self.mark_dirty(kk))
+        self.sheet_pattern_var.trace_add("write", lambda *_a: self.mark_dirty("SALES_SHEET_PATTERN"))
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _bring_to_front(self):
+        try:
+            self.attributes("-topmost", True)
+            self.lift()
+            self.focus_force()
+            # 数百 ms 後に topmost を解除
+            self.after(300, lambda: self.attributes("-topmost", False))
+        except Exception:
+            pass
+
+    def select_file(self, file_type):
+        filetypes = [("Excelファイル", "*.xlsx"), ("すべてのファイル", "*.*")]
+        if file_type == "sales":
+            # 売上表は複数選択可（; 区切りで保持）
+            file_path = engine.SALES_PATH_SEPARATOR.join(filedialog.askopenfilenames(filetypes=filetypes))
+        else:
+            file_path = filedialog.askopenfilename(filetypes=filetypes)
+        if file_path:
+            self.file_vars[file_type].set(file_path)
+            self.update_file_labels()
+            self.auto_fit_size(only_expand=False)
+
+    def open_in_explorer(self, key):
+        path = self.file_vars[key].get().strip()
+        if key == "sales":
+            path = (engine.split_sales_paths(path) or [""])[0]
+        if not path:
+            return
+        try:
+            if os.path.exists(path):
+                os.startfile(os.path.dirname(path) if os.path.isfile(path) else path)
+        except Exception as e:
+            messagebox.showerror("エラー", f"エクスプローラを開けません: {e}")
+
+    def clear_path(self, key):
+        self.file_vars[key].set("")
+        self.update_file_labels()
+
+    def save_settings(self):
+        # まず行・列の入力値を検証し Settings へ反映
+        try:
+            for key, (_entry, var) in self.position_entries.items():
+                raw = var.get().strip()
+                if raw == "":
+                    raise ValueError(f"{key} が空です")
+                value = int(raw)
+                # 得意先列は 0（得意先別に集計しない）も可
+                if value < 0 or (value == 0 and key != "CUSTOMER_COLUMN_IN_SALES"):
+                    raise ValueError(f"{key} は正の整数である必要があります")
+                setattr(Settings, key, value)
+        except ValueError as ve:
+            messagebox.showerror("入力エラー", str(ve))
+            return
+
+        # ファイルパス適用
+        Settings.PRICE_FILE_PATH = self.file_vars["price"].get().strip() or Settings.PRICE_FILE_PATH
+        Settings.STOCK_FILE_PATH = self.file_vars["stock"].get().strip() or Settings.STOCK_FILE_PATH
+        Settings.SALES_FILE_PATH = self.file_vars["sales"].get().strip() or Settings.SALES_FILE_PATH
+        Settings.SALES_SHEET_PATTERN = self.sheet_pattern_var.get().strip()
+        self.update_file_labels()
+        for key, var in self.diagnostics_vars.items():
+            setattr(Settings, key, bool(var.get()))
+
+        if Settings.save_settings():
+            messagebox.showinfo("設定保存", "設定を保存しました")
+            if self.app:
+                try:
+                    self.app.refresh_settings_ui()
+                except Exception:
+                    pass
+            # UI サイズ再調整
+            self.auto_fit_size(only_expand=True)
+            self._dirty = False
+            self.flash_saved()
+    
+    def reset_settings(self):
+        """設定をデフォルトへ戻し UI を更新"""
+        Settings.reset_to_defaults()
+        Settings.save_settings()
+        messagebox.showinfo("設定リセット", "設定をリセットしました")
+        # 数値エントリ更新
+        for key, (_, var) in self.position_entries.items():
+            var.set(str(getattr(Settings, key)))
+        # ファイルパス表示更新
+        self.file_vars["price"].set(Settings.PRICE_FILE_PATH)
+        self.file_vars["stock"].set(Settings.STOCK_FILE_PATH)
+        self.file_vars["sales"].set(Settings.SALES_FILE_PATH)
+        self.sheet_pattern_var.set(Settings.SALES_SHEET_PATTERN)
+        self.update_file_labels()
+        for key, var in self.diagnostics_vars.items():
+            var.set(getattr(Settings, key))
+        # サイズ調整
+        self.auto_fit_size(only_expand=True)
+        self._dirty = False
+
+    def auto_fit_size(self, extra_w: int = 4, extra_h: int = 10, only_expand: bool = False):
+        """現在内容の要求サイズに合わせてウィンドウを調整。
+        only_expand=True の場合は縮小せず拡張だけ行う。"""
+        try:
+            self.update_idletasks()
+            req_w = self.winfo_reqwidth() + extra_w
+            req_h = self.winfo_reqheight() + extra_h
+            # 上限設定（画面 80%）
+            sw = self.winfo_screenwidth()
+            sh = self.winfo_screenheight()
+            max_w = int(sw * 0.8)
+            max_h = int(sh * 0.8)
+            cur_w = self.winfo_width()
+            cur_h = self.winfo_height()
+            if cur_w <= 1 or cur_h <= 1:  # 初期取得失敗時フォールバック
+                cur_w, cur_h = 500, 400
+            if only_expand:
+                new_w = max(req_w, cur_w)
+                new_h = max(req_h, cur_h)
+            else:
+                new_w, new_h = req_w, req_h
+            new_w = min(new_w, max_w)
+            new_h = min(new_h, max_h)
+            x = self.winfo_x()
+            y = self.winfo_y()
+            self.geometry(f"{new_w}x{new_h}+{x}+{y}")
+        except Exception as e:
+            print(f"SettingsWindow auto_fit_size エラー: {e}")
+
+    # 付加機能: 状態/ハイライト
+    def update_file_labels(self):
+        self.price_label.configure(text=f"単価表: {os.path.basename(self.file_vars['price'].get()) or '-'}")
+        self.stock_label.configure(text=f"在庫表: {os.path.basename(self.file_vars['stock'].get()) or '-'}")
+        self.sales_label.configure(text=f"売上表: {self._sales_names(self.file_vars['sales'].get()) or '-'}")
+
+    @staticmethod
+    def _sales_names(text):
+        """; 区切りの売上表パスをファイル名の一覧にする"""
+        return ", ".join(os.path.basename(path) for path in engine.split_sales_paths(text))
+
+    def mark_dirty(self, key):
+        self._dirty = True
+        # 変更された数値エントリ背景軽く強調
+        if key in dict(self.position_keys):
+            entry, var = self.position_entries[key]
+            default = str(Settings.get_default_value(key))
+            if var.get() and var.get() != default:
+                entry.configure(fg_color=("#444444", "#444444"))
+            else:
+                entry.configure(fg_color=("#333333", "#333333"))
+
+    def flash_saved(self):
+        for entry, _ in self.position_entries.values():
+            orig = entry.cget("fg_color")
+            entry.configure(fg_color=("#155b2f", "#155b2f"))
+            self.after(350, lambda e=entry, o=orig: e.configure(fg_color=o))
+
+    def on_close(self):
+        if self._dirty:
+            if not messagebox.askyesno("確認", "未保存の変更があります。閉じてもよいですか？"):
+                return
+        self.destroy()
+
+class PreviewWindow(ctk.CTkToplevel):
+    """プレビュー（書き込みなし）結果の一覧。PAGE_SIZE 行ずつ表示し、CSV / JSONL に書き出せる"""
+    PAGE_SIZE = 200
+    COLUMNS = [
+        ("status", "区分", 70),
+        ("sheet", "シート", 110),
+        ("row", "行", 50),
+        ("id", "ID", 100),
+        ("column", "列", 40),
+        ("old", "変更前", 110),
+        ("new", "変更後", 110),
+    ]
+    FILTERS = ["すべて", journal.STATUS_CHANGED, journal.STATUS_UNMATCHED]
+
+    def __init__(self, app, result):
+        super().__init__()
+        self.app = app
+        self.result = result
+        self.all_rows = list(journal.preview_rows(result.journal, result.unmatched))
+        self.rows = self.all_rows
+        self.page = 0
+        self.title(f"プレビュー {result.year_month}（ファイルは変更されていません）")
+        self.minsize(560, 360)
+
+        # 件数サマリ
+        summary = (f"更新予定 {result.updated}件（{len(result.journal)}セル） / 単価なし {len(result.unmatched)}行"
+                   f" / 同値 {result.unchanged}セル / {result.scanned}行走査 / {result.total_time:.1f}s")
+        ctk.CTkLabel(self, text=summary, anchor="w").pack(fill="x", padx=8, pady=(6, 2))
+
+        # 一覧
+        table_frame = ctk.CTkFrame(self)
+        table_frame.pack(fill="both", expand=True, padx=8, pady=4)
+        self.tree = ttk.Treeview(table_frame, columns=[key for key, _, _ in self.COLUMNS], show="headings", height=18)
+        for key, text, width in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor="e" if key in ("row", "old", "new") else "w")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # ページ送り・絞り込み・書き出し
+        nav = ctk.CTkFrame(self, fg_color="transparent")
+        nav.pack(fill="x", padx=8, pady=(2, 8))
+        self.filter_var = ctk.StringVar(value=self.FILTERS[0])
+        ctk.CTkOptionMenu(nav, variable=self.filter_var, values=self.FILTERS, width=100,
+                          command=lambda _value: self.apply_filter()).pack(side="left", padx=2)
+        self.prev_button = ctk.CTkButton(nav, text="前へ", width=60, command=lambda: self.show_page(self.page - 1))
+        self.prev_button.pack(side="left", padx=2)
+        self.page_label = ctk.CTkLabel(nav, text="", width=120)
+        self.page_label.pack(side="left", padx=2)
+        self.next_button = ctk.CTkButton(nav, text="次へ", width=60, command=lambda: self.show_page(self.page + 1))
+        self.next_button.pack(side="left", padx=2)
+        ctk.CTkButton(nav, text="書き出し", width=80, command=self.export).pack(side="right", padx=2)
+
+        self.show_page(0)
+        self.after(0, self.lift)
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self.rows) // self.PAGE_SIZE))
+
+    def apply_filter(self):
+        status = self.filter_var.get()
+        if status == self.FILTERS[0]:
+            self.rows = self.all_rows
+        else:
+            self.rows = [row for row in self.all_rows if row["status"] == status]
+        self.show_page(0)
+
+    def show_page(self, page):
+        """page 番目（0 始まり）の PAGE_SIZE 行だけを表に入れる"""
+        self.page = min(max(page, 0), self.page_count - 1)
+        self.tree.delete(*self.tree.get_children())
+        start = self.page * self.PAGE_SIZE
+        for row in self.rows[start:start + self.PAGE_SIZE]:
+            self.tree.insert("", "end", values=[self._display(row[key]) for key, _, _ in self.COLUMNS])
+        self.page_label.configure(text=f"{self.page + 1} / {self.page_count}（{len(self.rows)}件）")
+        self.prev_button.configure(state="normal" if self.page > 0 else "disabled")
+        self.next_button.configure(state="normal" if self.page + 1 < self.page_count else "disabled")
+
+    @staticmethod
+    def _display(value):
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return f"{value:,.4g}" if abs(value) < 1 else f"{value:,.2f}"
+        return str(value)
+
+    def export(self):
+        path = filedialog.asksaveasfilename(
+            parent=self, title="プレビュー結果の書き出し", defaultextension=".csv",
+            initialfile=f"preview-{self.result.kind}-{self.result.year_month}.csv",
+            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+        )
+        if not path:
+            return
+        try:
+            journal.export_preview(path, self.result.journal, self.result.unmatched)
+        except OSError as e:
+            messagebox.showerror("エラー", f"書き出しに失敗しました: {e}", parent=self)
+            return
+        messagebox.showinfo("書き出し", f"書き出しました\n{path}", parent=self)
+
+
+class BackupWindow(ctk.CTkToplevel):
+    """保存前バックアップの一覧。選んだ転記の直前の状態にファイルを戻す"""
+    COLUMNS = [
+        ("time", "日時", 140),
+        ("files", "ファイル", 280),
+        ("stored", "新規保存", 80),
+    ]
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        # バックアップが無効でも既存のバックアップは復元できるようにする
+        self.store = backup_store.from_settings() or backup_store.BackupStore(Settings.backup_dir())
+        self.title("バックアップから復元")
+        self.minsize(520, 300)
+
+        ctk.CTkLabel(self, text="選んだ転記の直前の状態に戻します（現在の状態は「復元前」としてバックアップします）",
+                     anchor="w").pack(fill="x", padx=8, pady=(6, 2))
+        table_frame = ctk.CTkFrame(self)
+        table_frame.pack(fill="both", expand=True, padx=8, pady=4)
+        self.tree = ttk.Treeview(table_frame, columns=[key for key, _, _ in self.COLUMNS], show="headings",
+                                 height=12, selectmode="browse")
+        for key, text, width in self.COLUMNS:
+            self.tree.heading(key, text=text)
+            self.tree.column(key, width=width, anchor="e" if key == "stored" else "w")
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", lambda _event: self.restore())
+
+        nav = ctk.CTkFrame(self, fg_color="transparent")
+        nav.pack(fill="x", padx=8, pady=(2, 8))
+        ctk.CTkButton(nav, text="再読み込み", width=90, command=self.refresh).pack(side="left", padx=2)
+        ctk.CTkButton(nav, text="復元", width=90, command=self.restore).pack(side="right", padx=2)
+
+        self.refresh()
+        self.after(0, self.lift)
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for run in self.store.runs():
+            created = run.created
+            files = ", ".join(f"{manifest['label']}（{os.path.basename(manifest['source'])}）"
+                              for manifest in run.manifests)
+            if run.origin == backup_store.ORIGIN_WATCH:
+                files += "（自動更新）"
+            self.tree.insert("", "end", iid=run.run, values=[
+                f"{created:%Y-%m-%d %H:%M:%S}" if created else run.run, files, f"{run.stored_bytes / 1024:,.0f}KB"])
+
+    def restore(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showinfo("復元", "復元するバックアップを選んでください", parent=self)
+            return
+        if self.app.is_busy():
+            messagebox.showerror("エラー", "転記中・自動更新中は復元できません", parent=self)
+            return
+        run = self.store.get_run(selection[0])
+        if not messagebox.askyesno("確認", f"次のファイルを {run.describe()} の転記前の状態に戻しますか？\n"
+                                         + "\n".join(run.sources), parent=self):
+            return
+        try:
+            paths = self.store.restore(run.run)
+        except PermissionError:
+            messagebox.showerror("エラー", "ファイルが開かれているため復元できません。\n"
+                                         "ファイルを閉じてから再度実行してください。", parent=self)
+            return
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("エラー", f"復元できませんでした: {e}", parent=self)
+            return
+        self.app.status_var.set(f"バックアップから復元しました: {run.describe()}")
+        messagebox.showinfo("復元", "復元しました\n" + "\n".join(paths), parent=self)
+        self.refresh()
+
+
+class App(ctk.CTk):
+    # ワーカースレッドのキューを確認する間隔 (ms)
+    POLL_INTERVAL_MS = 50
+    # 自動更新のキューを確認する間隔 (ms)
+    WATCH_POLL_INTERVAL_MS = 500
+
+    def __init__(self):
+        super().__init__()
+        # リサイズ許可
+        self.resizable(True, True)
+
+        # テーマ & 基本属性
+        ctk.set_appearance_mode(Settings.THEME)
+        ctk.set_default_color_theme(Settings.COLOR_THEME)
+        self.title(Settings.APP_NAME)
+        self.minsize(Settings.WINDOW_WIDTH, Settings.WINDOW_HEIGHT)
+
+        try:
+            self.iconbitmap(Settings.ICON_FILE)
+        except Exception:
+            pass
+
+        # 上部: 設定ボタン
+        self.file_frame = ctk.CTkFrame(self, fg_color=("#E0E0E0", "#1a1a1a"))
+        self.file_frame.pack(padx=8, pady=2, fill="x")
+        self.settings_button = ctk.CTkButton(self.file_frame, text="設定", width=70, command=self.open_settings)
+        self.settings_button.pack(side="left", expand=True, anchor="e", padx=(4, 2), pady=2)
+        # 保存前バックアップの一覧・復元
+        self.backup_button = ctk.CTkButton(self.file_frame, text="バックアップ", width=90, command=self.open_backups)
+        self.backup_button.pack(side="left", expand=True, anchor="w", padx=(2, 4), pady=2)
+
+        # メインフレーム
+        self.frame = ctk.CTkFrame(self, fg_color=("#E0E0E0", "#1a1a1a"))
+        self.frame.pack(pady=6, padx=10, fill="both", expand=True)
+
+        # 年月選択
+        now = datetime.datetime.now()
+        self.year_var = ctk.StringVar(value=f"{now.year}年")
+        self.month_var = ctk.StringVar(value=f"{now.month}月")
+        self.year_month_menu_frame = ctk.CTkFrame(self.frame, fg_color=("#D0D0D0", "#0f0f0f"))
+        self.year_month_menu_frame.pack(pady=2, fill="x")
+        current_year = now.year
+        year_options = [f"{i}年" for i in range(current_year-1, current_year+2)]
+        self.year_menu = ctk.CTkOptionMenu(self.year_month_menu_frame, variable=self.year_var, values=year_options, width=90)
+        self.year_menu.grid(row=0, column=0, padx=(4,4), pady=2)
+        self.year_menu.set(f"{current_year}年")
+        month_options = [f"{i}月" for i in range(1, 13)]
+        self.month_menu = ctk.CTkOptionMenu(self.year_month_menu_frame, variable=self.month_var, values=month_options, width=68)
+        self.month_menu.grid(row=0, column=1, padx=(4,4), pady=2)
+        self.month_menu.set(f"{now.month}月")
+        self.year_month_menu_frame.grid_columnconfigure(0, weight=1)
+        self.year_month_menu_frame.grid_columnconfigure(1, weight=1)
+
+        # 期間指定（在庫表への転記を複数月まとめて実行）
+        self.range_var = ctk.BooleanVar(value=False)
+        self.range_check = ctk.CTkCheckBox(self.year_month_menu_frame, text="期間指定", variable=self.range_var, command=self.toggle_range_mode)
+        self.range_check.grid(row=1, column=0, columnspan=2, padx=4, pady=2, sticky="w")
+        self.end_year_var = ctk.StringVar(value=f"{now.year}年")
+        self.end_month_var = ctk.StringVar(value=f"{now.month}月")
+        self.end_year_menu = ctk.CTkOptionMenu(self.year_month_menu_frame, variable=self.end_year_var, values=year_options, width=90)
+        self.end_month_menu = ctk.CTkOptionMenu(self.year_month_menu_frame, variable=self.end_month_var, values=month_options, width=68)
+
+        # プレビュー（書き込まずに変更内容だけを表示）
+        self.preview_var = ctk.BooleanVar(value=False)
+        self.preview_check = ctk.CTkCheckBox(self.year_month_menu_frame, text="プレビューのみ（保存しない）", variable=self.preview_var)
+        self.preview_check.grid(row=3, column=0, columnspan=2, padx=4, pady=2, sticky="w")
+
+        # 自動更新（単価表・在庫表の変更を監視し、変わった ID の行だけを転記）
+        self.watch_var = ctk.BooleanVar(value=False)
+        self.watch_check = ctk.CTkCheckBox(self.year_month_menu_frame, text="自動更新（単価表の変更を監視）", variable=self.watch_var, command=self.toggle_watch)
+        self.watch_check.grid(row=4, column=0, columnspan=2, padx=4, pady=2, sticky="w")
+
+        # 操作ボタン
+        self.button_1 = ctk.CTkButton(self.frame, text="在庫単価を在庫表に転記", command=self.update_stock_list, width=200)
+        self.button_1.pack(pady=(16,8))
+        self.button_2 = ctk.CTkButton(self.frame, text="在庫単価を売上表に転記", command=self.update_sales_list, width=200)
+        self.button_2.pack(pady=(8,4))
+        self.button_3 = ctk.CTkButton(self.frame, text="在庫表→売上表をまとめて転記", command=self.update_stock_and_sales, width=200)
+        self.button_3.pack(pady=(4,4))
+        self.cancel_button = ctk.CTkButton(self.frame, text="キャンセル", command=self.cancel_task, width=200, state="disabled")
+        self.cancel_button.pack(pady=(4,4))
+        # 保存先が開かれていて保存できなかった場合に、計算をやり直さず保存だけを再実行する
+        self.retry_save_button = ctk.CTkButton(self.frame, text="保存を再試行", command=self.retry_save, width=200, state="disabled")
+        self.retry_save_button.pack(pady=(4,12))
+
+        # 進行状況バー & ステータス
+        self.progress = ctk.CTkProgressBar(self.frame)
+        self.progress.pack(pady=(1, 3), fill="x")
+        self.progress.set(0)
+        self.status_var = ctk.StringVar(value="準備完了")
+        self.status_label = ctk.CTkLabel(self, textvariable=self.status_var, anchor="w")
+        self.status_label.pack(fill="x", side="bottom")
+
+        # バックグラウンド処理
+        self._worker = None
+        self._on_task_done = None
+        # 保存できなかった計算結果 (engine.PendingSave, on_done)
+        self._pending_save = None
+        self._retry_job = None
+        self._watch = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # 初期フィット（幅・高さをできるだけ詰める）
+        self.after(100, lambda: self.auto_fit_size(extra_w=2, extra_h=2, only_expand=False))
+        # ウィンドウ表示後に起動時間を記録し、事前準備を開始
+        self.after(0, self._on_shown)
+
+    def _on_shown(self):
+        startup.mark("window")
+        if not Settings.PREWARM_ENABLED:
+            startup.log_startup()
+            return
+        startup.start_prewarm(
+            Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH, self.get_selected_year_month_code(),
+            engine.Positions.from_settings(), cache=index_cache.from_settings(), on_done=startup.log_startup,
+        )
+
+    def open_settings(self):
+        """設定ウィンドウを開く"""
+        # 既に開いている場合は再利用して前面へ
+        if hasattr(self, "settings_window") and self.settings_window.winfo_exists():
+            try:
+                self.settings_window._bring_to_front()
+            except Exception:
+                pass
+            return
+        # 新規作成
+        self.settings_window = SettingsWindow(self)
+        try:
+            # 親との関連付け（Windows でタスクバー分離を防ぐ）
+            self.settings_window.transient(self)
+            # モーダル風（他操作をブロックしたい場合） ※不要ならコメントアウト
+            # self.settings_window.grab_set()
+        except Exception:
+            pass
+
+    def open_backups(self):
+        """バックアップの一覧（復元）ウィンドウを開く"""
+        if hasattr(self, "backup_window") and self.backup_window.winfo_exists():
+            self.backup_window.refresh()
+            self.backup_window.lift()
+            return
+        self.backup_window = BackupWindow(self)
+        try:
+            self.backup_window.transient(self)
+        except Exception:
+            pass
+
+    def is_busy(self) -> bool:
+        """転記・自動更新中か（その間はファイルを復元しない）"""
+        return bool((self._worker and self._worker.is_alive()) or self._watch)
+
+    def refresh_settings_ui(self):
+        """Settings の変更内容をメインウィンドウへ反映"""
+        try:
+            # タイトル・サイズ
+            self.title(Settings.APP_NAME)
+            # 最小サイズを更新（ユーザーの手動リサイズを尊重するため geometry 直接設定は避ける）
+            self.minsize(Settings.WINDOW_WIDTH, Settings.WINDOW_HEIGHT)
+            # テーマ適用（appearance / color）
+            ctk.set_appearance_mode(Settings.THEME)
+            ctk.set_default_color_theme(Settings.COLOR_THEME)
+            # アイコン
+            try:
+                self.iconbitmap(Settings.ICON_FILE)
+            except Exception:
+                pass
+            # コンテンツに合わせ再フィット（現在サイズが小さすぎる場合のみ拡張）
+            self.auto_fit_size(only_expand=True)
+        except Exception as e:
+            print(f"UI反映エラー: {e}")
+
+    def auto_fit_size(self, extra_w: int = 6, extra_h: int = 4, only_expand: bool = False):
+        """現在の要求サイズに合わせてウィンドウを調整。
+
+        extra_w / extra_h: 余白を加算
+        only_expand: True の場合、現在サイズより小さくはしない（ユーザーの手動拡大を維持）
+        """
+        try:
+            self.update_idletasks()
+            req_w = self.winfo_reqwidth() + extra_w
+            req_h = self.winfo_reqheight() + extra_h
+            sw = self.winfo_screenwidth(); sh = self.winfo_screenheight()
+            max_w = int(sw * 0.85); max_h = int(sh * 0.85)
+            cur_w = self.winfo_width()
+            cur_h = self.winfo_height()
+            # 起動直後は width/height が 1 のことがあるのでフォールバック
+            if cur_w <= 1 or cur_h <= 1:
+                cur_w, cur_h = Settings.WINDOW_WIDTH, Settings.WINDOW_HEIGHT
+            if only_expand:
+                new_w = max(req_w, cur_w)
+                new_h = max(req_h, cur_h)
+            else:
+                new_w, new_h = req_w, req_h
+            new_w = min(new_w, max_w); new_h = min(new_h, max_h)
+            # 位置は維持
+            x = self.winfo_x()
+            y = self.winfo_y()
+            self.geometry(f"{new_w}x{new_h}+{x}+{y}")
+        except Exception as e:
+            print(f"auto_fit_size エラー: {e}")
+
+    def toggle_range_mode(self):
+        """期間指定の ON/OFF で終了年月の表示と売上ボタンの有効/無効を切り替え"""
+        if self.range_var.get():
+            self.end_year_menu.grid(row=2, column=0, padx=(4,4), pady=2)
+            self.end_month_menu.grid(row=2, column=1, padx=(4,4), pady=2)
+            self.button_2.configure(state="disabled")
+            self.button_3.configure(state="disabled")
+        else:
+            self.end_year_menu.grid_remove()
+            self.end_month_menu.grid_remove()
+            self.button_2.configure(state="normal")
+            self.button_3.configure(state="normal")
+        self.auto_fit_size(only_expand=True)
+
+    def update_stock_list(self):
+        if self.range_var.get():
+            return self.update_stock_list_range()
+        # Settings から直接ファイルパスを取得（ワーカー起動前に確定させる）
+        job = daemon_client.job("transfer_stock", functools.partial(
+            engine.transfer_stock,
+            Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH,
+            self.get_selected_year_month_code(), engine.Positions.from_settings(),
+            cache=index_cache.from_settings(), dry_run=self.preview_var.get(),
+        ))
+
+        def on_done(result):
+            if result.dry_run:
+                return self.show_preview(result)
+            messagebox.showinfo("成功", f"{result.updated}件の価格を更新しました")
+            self.status_var.set(f"在庫更新完了 {result.updated}件 | {result.metrics()}")
+
+        self._run_task("在庫単価更新中...", job, on_done)
+
+    def update_stock_list_range(self):
+        start = self.get_selected_year_month_code()
+        end = engine.to_year_month(int(self.end_year_var.get()[:-1]), int(self.end_month_var.get()[:-1]))
+        if start > end:
+            messagebox.showerror("入力エラー", "終了年月は開始年月以降を選択してください")
+            return
+        job = daemon_client.job("transfer_stock_range", functools.partial(
+            engine.transfer_stock_range,
+            Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH, start, end,
+            engine.Positions.from_settings(), cache=index_cache.from_settings(),
+            dry_run=self.preview_var.get(),
+        ))
+
+        def on_done(result):
+            if result.dry_run:
+                return self.show_preview(result)
+            lines = [f"{year_month}: {count}件" for year_month, count in result.per_month.items()]
+            lines += result.errors
+            messagebox.showinfo("成功", f"{result.updated}件の価格を更新しました\n\n" + "\n".join(lines))
+            self.status_var.set(f"在庫更新完了 {len(result.per_month)}か月 {result.updated}件 | {result.metrics()}")
+
+        self._run_task("在庫単価更新中（期間指定）...", job, on_done)
+
+    def update_sales_list(self):
+        job = daemon_client.job("transfer_sales", functools.partial(
+            engine.transfer_sales,
+            Settings.STOCK_FILE_PATH, engine.split_sales_paths(Settings.SALES_FILE_PATH),
+            self.get_selected_year_month_code(), engine.Positions.from_settings(),
+            cache=index_cache.from_settings(), dry_run=self.preview_var.get(),
+            sheet_pattern=Settings.SALES_SHEET_PATTERN,
+        ))
+
+        def on_done(result):
+            if result.dry_run:
+                return self.show_preview(result)
+            message = f"{result.updated}件の売上データを更新しました"
+            if len(result.per_sheet) > 1:
+                message += "\n\n" + "\n".join(f"{label}: {count}件" for label, count in result.per_sheet.items())
+            if result.errors:
+                message += f"\n\n数値に変換できない行 {len(result.errors)}件（利益は未更新）:\n" + "\n".join(result.errors[:10])
+                if len(result.errors) > 10:
+                    message += "\n…"
+            messagebox.showinfo("成功", message)
+            self.status_var.set(f"売上更新完了 {result.updated}件 | {result.metrics()}")
+
+        self._run_task("売上更新中...", job, on_done)
+
+    def update_stock_and_sales(self):
+        """在庫表への転記と売上表の利益計算を続けて実行（転記後の単価を売上表の計算にそのまま使う）"""
+        job = daemon_client.job("transfer_all", functools.partial(
+            engine.transfer_stock_and_sales,
+            Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH, engine.split_sales_paths(Settings.SALES_FILE_PATH),
+            self.get_selected_year_month_code(), engine.Positions.from_settings(),
+            cache=index_cache.from_settings(), dry_run=self.preview_var.get(),
+            sheet_pattern=Settings.SALES_SHEET_PATTERN,
+        ))
+
+        def on_done(result):
+            if result.dry_run:
+                return self.show_preview(result)
+            message = f"在庫表: {result.stock.updated}件の価格を更新しました\n売上表: {result.sales.updated}件の売上データを更新しました"
+            if len(result.sales.per_sheet) > 1:
+                message += "\n\n" + "\n".join(f"{label}: {count}件" for label, count in result.sales.per_sheet.items())
+            if result.errors:
+                message += f"\n\n数値に変換できない行 {len(result.errors)}件（利益は未更新）:\n" + "\n".join(result.errors[:10])
+                if len(result.errors) > 10:
+                    message += "\n…"
+            messagebox.showinfo("成功", message)
+            self.status_var.set(f"在庫・売上更新完了 {result.stock.updated}件・{result.sales.updated}件 | {result.metrics()}")
+
+        self._run_task("在庫単価・売上更新中...", job, on_done)
+
+    def show_preview(self, result):
+        """プレビュー結果を一覧ウィンドウで表示"""
+        self.status_var.set(f"プレビュー完了 更新予定 {result.updated}件 | {result.metrics()}")
+        self.preview_window = PreviewWindow(self, result)
+
+    # 自動更新
+    def toggle_watch(self):
+        if self.watch_var.get():
+            self.start_watch()
+        else:
+            self.stop_watch()
+
+    def start_watch(self):
+        if self._worker and self._worker.is_alive():
+            self.watch_var.set(False)
+            return
+        # 自動更新は 1 つ目の売上表の作業中のシートが対象
+        sales_path = (engine.split_sales_paths(Settings.SALES_FILE_PATH) or [""])[0]
+        if not sales_path:
+            self.watch_var.set(False)
+            messagebox.showerror("入力エラー", "売上表のパスが設定されていません")
+            return
+        year_month = self.get_selected_year_month_code()
+        transfer = watch.IncrementalTransfer(
+            Settings.PRICE_FILE_PATH, Settings.STOCK_FILE_PATH, sales_path,
+            year_month, engine.Positions.from_settings(), cache=index_cache.from_settings(),
+        )
+        self._watch = watch.WatchSession(transfer, Settings.WATCH_INTERVAL_SEC, Settings.WATCH_DEBOUNCE_SEC)
+        self._set_watch_controls("disabled")
+        self.status_var.set(f"{year_month} の監視を準備中...")
+        self._watch.start()
+        self.after(self.WATCH_POLL_INTERVAL_MS, self._poll_watch)
+
+    def stop_watch(self):
+        if self._watch:
+            self._watch.stop()
+            self._watch = None
+        self._set_watch_controls("normal")
+        self.watch_var.set(False)
+        self.status_var.set("自動更新を停止しました")
+
+    def _set_watch_controls(self, state):
+        """監視中は転記ボタン・年月・オプションを操作できないようにする"""
+        for widget in (self.button_1, self.year_menu, self.month_menu, self.range_check, self.preview_check):
+            widget.configure(state=state)
+        for button in (self.button_2, self.button_3):
+            button.configure(state="disabled" if state == "normal" and self.range_var.get() else state)
+
+    def _poll_watch(self):
+        session = self._watch
+        if session is None:
+            return
+        for kind, payload in session.poll():
+            if kind == "ready":
+                self.status_var.set(f"{session.transfer.year_month} を監視中")
+            elif kind == "applied":
+                now = datetime.datetime.now().strftime("%H:%M:%S")
+                parts = [f"{'在庫' if result.kind == 'stock' else '売上'} {result.updated}件" for result in payload]
+                self.status_var.set(f"{now} 自動更新 {' / '.join(parts)} | {payload[-1].metrics()}")
+            elif kind == "error":
+                # 書き込めない場合は次の周期に再試行される
+                self.status_var.set(f"自動更新エラー: {payload}")
+            elif kind == "stopped":
+                if self._watch is session:
+                    self._watch = None
+                    self._set_watch_controls("normal")
+                    self.watch_var.set(False)
+                return
+        self.after(self.WATCH_POLL_INTERVAL_MS, self._poll_watch)
+
+    # バックグラウンド処理
+    def _run_task(self, status_msg: str, job, on_done):
+        """job をワーカースレッドで実行し、完了時に on_done(result) をメインスレッドで呼ぶ"""
+        if self._worker and self._worker.is_alive():
+            return
+        if job is not self._retry_job:
+            # 新しい転記を始めたら保存できなかった前回の結果は破棄
+            self._set_pending_save(None)
+        self._start_long_task(status_msg)
+        self._on_task_done = on_done
+        self._worker = worker.TransferWorker(job)
+        self._worker.start()
+        self.after(self.POLL_INTERVAL_MS, self._poll_worker)
+
+    def _poll_worker(self):
+        for kind, *payload in self._worker.poll():
+            if kind == "progress":
+                self._report_progress(*payload)
+                continue
+            # 保存できなかった結果は SavePending の場合だけ保持し直す
+            self._set_pending_save(None)
+            self._end_long_task()
+            if kind == "done":
+                self._on_task_done(payload[0])
+            elif kind == "cancelled":
+                self.status_var.set("キャンセルしました（ファイルは変更されていません）")
+            elif isinstance(payload[0], engine.SavePending):
+                self._set_pending_save((payload[0].pending, self._on_task_done))
+                self.status_var.set("保存待ち（ファイルを閉じてから「保存を再試行」を押してください）")
+                if messagebox.askretrycancel("保存できません", str(payload[0])):
+                    self.retry_save()
+            elif isinstance(payload[0], engine.TransferError):
+                messagebox.showerror("エラー", str(payload[0]))
+            else:
+                messagebox.showerror("エラー", f"予期しないエラーが発生しました: {payload[0]}")
+            return
+        self.after(self.POLL_INTERVAL_MS, self._poll_worker)
+
+    def _set_pending_save(self, pending_save):
+        self._pending_save = pending_save
+        self._retry_job = None
+        try:
+            self.retry_save_button.configure(state="normal" if pending_save else "disabled")
+        except Exception:
+            pass
+
+    def retry_save(self):
+        """保存できなかった計算結果の保存だけを再実行（読み込み・計算はやり直さない）"""
+        if self._pending_save is None:
+            return
+        pending, on_done = self._pending_save
+        self._retry_job = run_log.instrumented(
+            "save_retry", lambda progress, cancel: pending.retry(progress=progress, cancel=cancel))
+        self._run_task("保存を再試行中...", self._retry_job, on_done)
+
+    def _report_progress(self, done, total, message, eta=None):
+        """ワーカーからの進捗を反映（total=0 は件数の無いフェーズ）"""
+        try:
+            if total:
+                if self.progress.cget("mode") != "determinate":
+                    self.progress.stop()
+                    self.progress.configure(mode="determinate")
+                self.progress.set(done/total)
+                self.status_var.set(f"{message} {done}/{total} {worker.format_eta(eta)}".rstrip())
+            else:
+                if self.progress.cget("mode") != "indeterminate":
+                    self.progress.configure(mode="indeterminate")
+                    self.progress.start()
+                self.status_var.set(f"{message}...")
+        except Exception:
+            pass
+
+    def cancel_task(self):
+        if self._worker and self._worker.is_alive():
+            self._worker.cancel()
+            self.cancel_button.configure(state="disabled")
+            self.status_var.set("キャンセル中...")
+
+    def on_close(self):
+        if self._worker and self._worker.is_alive():
+            if not messagebox.askyesno("確認", "処理中です。中断して終了しますか？\n（保存中の場合は保存完了を待ってから終了します）"):
+                return
+            self._worker.cancel()
+        if self._watch:
+            self._watch.stop()
+        self.destroy()
+
+    # 長時間処理補助
+    def _start_long_task(self, status_msg: str):
+        try:
+            self.watch_check.configure(state="disabled")
+            self.button_1.configure(state="disabled")
+            self.button_2.configure(state="disabled")
+            self.button_3.configure(state="disabled")
+            self.cancel_button.configure(state="normal")
+            self.retry_save_button.configure(state="disabled")
+            self.progress.set(0)
+            self.status_var.set(status_msg)
+            self.configure(cursor="watch")
+        except Exception:
+            pass
+
+    def _end_long_task(self):
+        try:
+            self.watch_check.configure(state="normal")
+            self.button_1.configure(state="normal")
+            self.button_2.configure(state="disabled" if self.range_var.get() else "normal")
+            self.button_3.configure(state="disabled" if self.range_var.get() else "normal")
+            self.cancel_button.configure(state="disabled")
+            self.retry_save_button.configure(state="normal" if self._pending_save else "disabled")
+            self.configure(cursor="")
+            self.progress.stop()
+            self.progress.configure(mode="determinate")
+            self.progress.set(0)
+        except Exception:
+            pass
+
+    def get_selected_year_month(self):
+        selected_year = self.year_var.get()
+        selected_month = self.month_var.get()
+        return selected_year, selected_month
+
+    def get_selected_year_month_code(self):
+        """選択中の年月を YYYYMM 文字列で返す（例: 2025年9月 → 202509）"""
+        selected_year, selected_month = self.get_selected_year_month()
+        return engine.to_year_month(int(selected_year[:-1]), int(selected_month[:-1]))
@@ -0,0 +1,171 @@
+"""抽出済みインデックス（ID→単価 等）のディスクキャッシュ
+
+settings.json と同じフォルダの cache/ に JSON で保存する。
+エントリは「種類・元ファイルの絶対パス・Settings の行列位置などのパラメータ」で識別し、
+元ファイルのサイズ・更新時刻・内容ハッシュ(SHA-256)で鮮度を判定する。
+
+- サイズと更新時刻が一致すればハッシュ計算なしでヒット
+- 更新時刻だけ変わった場合（コピー・上書き保存で内容同一）はハッシュを照合して再利用
+- 内容が変わっていればエントリを削除してミス
+- 合計サイズが上限を超えたら最終利用が古いものから削除
+- 保存時は呼び出し側が読み込み前に取った署名（session_cache.file_signature）と照合し、
+  読み込み中に元ファイルが更新されていれば保存しない。内容ハッシュはファイルの同じ版について 1 回だけ計算する
+"""
+import hashlib
+import json
+import os
+import threading
+
+from session_cache import file_signature
+from settings import Settings
+
+CACHE_VERSION = 1
+ENTRY_SUFFIX = ".json"
+
+
+def content_hash(path, chunk_size=1024 * 1024):
+    """ファイル内容の SHA-256（16進文字列）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IndexCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # 計算済みの内容ハッシュ {絶対パス: (署名, SHA-256)}
+        self._hashes = {}
+
+    def _content_hash(self, path, signature):
+        """signature の版の path の内容ハッシュ（同じ版なら計算済みの値を使う）"""
+        key = os.path.abspath(path)
+        known = self._hashes.get(key)
+        if known is not None and known[0] == signature:
+            return known[1]
+        digest = content_hash(path)
+        self._hashes[key] = (signature, digest)
+        return digest
+
+    def _entry_path(self, kind, path, params):
+        key = json.dumps([kind, os.path.abspath(path), params], ensure_ascii=False, sort_keys=True)
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{kind}-{name}{ENTRY_SUFFIX}")
+
+    def get(self, kind, path, params):
+        """キャッシュ済みデータを返す。無い・古い場合は None"""
+        entry_path = self._entry_path(kind, path, params)
+        try:
+            with open(entry_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        source = entry.get("source", {})
+        if entry.get("version") != CACHE_VERSION or source.get("size") != stat.st_size:
+            self._discard(entry_path)
+            return None
+        if source.get("mtime_ns") != stat.st_mtime_ns:
+            # 更新時刻のみ異なる場合は内容ハッシュで判定
+            try:
+                if self._content_hash(path, (stat.st_mtime_ns, stat.st_size)) != source.get("sha256"):
+                    self._discard(entry_path)
+                    return None
+            except OSError:
+                return None
+            source["mtime_ns"] = stat.st_mtime_ns
+            self._write(entry_path, entry)
+        else:
+            self._touch(entry_path)
+        return entry.get("data")
+
+    def put(self, kind, path, params, data, signature=None):
+        """data（JSON 化できる値）を保存。保存できない場合は何もしない。
+
+        signature: data を作るために読み込む前の署名（session_cache.file_signature）。
+        現在の署名と異なる場合は読み込み中に更新されたため保存しない（省略時は現在の署名）
+        """
+        current = file_signature(path)
+        if current is None or (signature is not None and signature != current):
+            return
+        try:
+            digest = self._content_hash(path, current)
+            # ハッシュ計算中に更新された場合も保存しない
+            if file_signature(path) != current:
+                return
+            entry = {
+                "version": CACHE_VERSION,
+                "kind": kind,
+                "source": {
+                    "path": os.path.abspath(path),
+                    "size": current[1],
+                    "mtime_ns": current[0],
+                    "sha256": digest,
+                },
+                "params": params,
+                "data": data,
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(self._entry_path(kind, path, params), entry)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"キャッシュ保存エラー: {e}")
+            return
+        self.evict()
+
+    def clear(self):
+        for name in self._entry_names():
+            self._discard(os.path.join(self.directory, name))
+
+    def evict(self):
+        """合計サイズが max_bytes 以下になるまで最終利用の古いエントリから削除"""
+        entries = []
+        for name in self._entry_names():
+            entry_path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._discard(entry_path)
+            total -= size
+
+    def _entry_names(self):
+        try:
+            return [n for n in os.listdir(self.directory) if n.endswith(ENTRY_SUFFIX)]
+        except OSError:
+            return []
+
+    @staticmethod
+    def _write(entry_path, entry):
+        # 事前準備（startup.prewarm）と転記が同じエントリを同時に書く場合があるためスレッドごとに分ける
+        tmp_path = f"{entry_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, entry_path)
+
+    @staticmethod
+    def _touch(entry_path):
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _discard(entry_path):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+
+def from_settings():
+    """Settings に従ったキャッシュを返す（無効設定時は None）"""
+    if not Settings.INDEX_CACHE_ENABLED:
+        return None
+    return IndexCache(Settings.cache_dir(), int(Settings.INDEX_CACHE_MAX_MB * 1024 * 1024))
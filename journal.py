@@ -0,0 +1,100 @@
+"""変更ジャーナル（転記で書き換えたセルの記録）
+
+転記中はメモリ上に (シート, 行, ID, 列, 変更前, 変更後) を溜め、保存後にまとめて
+CSV または JSONL へ書き出す。変更前と同じ値は記録せず、書き込み対象にもしない。
+プレビュー（dry_run）の結果は export_preview で単価なしの行と合わせて書き出す。
+"""
+import csv
+import json
+import os
+
+from xlsx_patch import column_letter
+
+FIELDS = ("sheet", "row", "id", "column", "old", "new")
+FORMATS = ("csv", "jsonl")
+PREVIEW_FIELDS = ("status",) + FIELDS
+STATUS_CHANGED = "変更"
+STATUS_UNMATCHED = "単価なし"
+
+
+def same_value(old, new) -> bool:
+    """セルの変更前と変更後が同じ値か（1 と 1.0 は同値、True と 1 は別扱い）"""
+    if isinstance(old, bool) or isinstance(new, bool):
+        return type(old) is type(new) and old == new
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return float(old) == float(new)
+    return old == new
+
+
+class ChangeJournal:
+    def __init__(self):
+        self.entries = []
+        # 同値のため書き込みを省いたセル数
+        self.unchanged = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, sheet, row, id, column, old, new) -> bool:
+        """変更を記録して True を返す。変更前と同じ値なら記録せず False"""
+        if same_value(old, new):
+            self.unchanged += 1
+            return False
+        self.entries.append((sheet, row, id, column, old, new))
+        return True
+
+    def rows(self):
+        """書き出し用の dict（列は A, B, … の表記）"""
+        for sheet, row, id, column, old, new in self.entries:
+            yield dict(zip(FIELDS, (sheet, row, id, column_letter(column), old, new)))
+
+    def write_csv(self, path):
+        _write_csv(path, FIELDS, self.rows())
+
+    def write_jsonl(self, path):
+        _write_jsonl(path, self.rows())
+
+    def save(self, directory, name, format="csv"):
+        """directory/name.<format> に書き出してパスを返す（記録が無ければ何もせず None）"""
+        if not self.entries:
+            return None
+        if format not in FORMATS:
+            raise ValueError(f"変更ジャーナルの形式が不正です: {format}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.{format}")
+        if format == "csv":
+            self.write_csv(path)
+        else:
+            self.write_jsonl(path)
+        return path
+
+
+def _write_csv(path, fieldnames, rows):
+    # Excel で文字化けしないよう BOM 付き UTF-8
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in rows:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+
+def preview_rows(journal, unmatched):
+    """プレビュー表示・書き出し用の dict（変更 → 単価なし の順）"""
+    for entry in journal.rows():
+        yield {"status": STATUS_CHANGED, **entry}
+    for sheet, row, id in unmatched:
+        yield {"status": STATUS_UNMATCHED, "sheet": sheet, "row": row, "id": id, "column": "", "old": "", "new": ""}
+
+
+def export_preview(path, journal, unmatched):
+    """プレビュー結果を path に書き出す（拡張子 .jsonl なら JSONL、それ以外は CSV）"""
+    rows = preview_rows(journal, unmatched)
+    if path.lower().endswith(".jsonl"):
+        _write_jsonl(path, rows)
+    else:
+        _write_csv(path, PREVIEW_FIELDS, rows)
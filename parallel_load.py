@@ -0,0 +1,114 @@
+"""入力ブックの並列読み込み
+
+互いに独立したブック（単価表と在庫表、在庫表と売上表）の解析を別プロセスで同時に行い、
+抽出済みのデータ（ID・単価の列、行データなど）だけを受け取る。ブックオブジェクトは
+プロセス間で受け渡さない。
+
+- 最も大きいファイルは呼び出し元のプロセスで読み、残りをプロセスプールへ渡す
+  （戻り値の受け渡し量を抑える）
+- プールは初回利用時に spawn で作成し、終了まで再利用する（起動コストは 1 回だけ）
+- どれかのファイルが PARALLEL_LOAD_MIN_KB 未満なら、起動・受け渡しの方が高くつくため順に読む
+- PyInstaller でビルドした exe では main.py の multiprocessing.freeze_support() が必要
+"""
+import atexit
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+from typing import NamedTuple
+
+from settings import Settings
+
+
+class Task(NamedTuple):
+    """読み込み 1 件。func(*args) は pickle できる値を返すモジュール直下の関数であること"""
+    path: str
+    func: object
+    args: tuple
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _max_workers():
+    return max(1, min(3, (os.cpu_count() or 1) - 1))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=_max_workers(), mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(shutdown)
+        return _pool
+
+
+def shutdown():
+    """プロセスプールを終了（未作成なら何もしない）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def should_parallelize(tasks) -> bool:
+    if len(tasks) < 2 or not Settings.PARALLEL_LOAD_ENABLED or (os.cpu_count() or 1) < 2:
+        return False
+    min_bytes = Settings.PARALLEL_LOAD_MIN_KB * 1024
+    return all(_file_size(task.path) >= min_bytes for task in tasks.values())
+
+
+def run(tasks):
+    """tasks {名前: Task} をすべて実行し {名前: 戻り値} を返す。
+
+    例外は tasks の順で最初に失敗したものを送出する（並列でも順に読んだ場合と同じ）。
+    """
+    if not should_parallelize(tasks):
+        return {name: task.func(*task.args) for name, task in tasks.items()}
+
+    local_name = max(tasks, key=lambda name: _file_size(tasks[name].path))
+    try:
+        pool = _get_pool()
+        futures = {name: pool.submit(task.func, *task.args)
+                   for name, task in tasks.items() if name != local_name}
+    except (OSError, RuntimeError) as e:
+        print(f"並列読み込みを開始できないため順に読み込みます: {e}")
+        return {name: task.func(*task.args) for name, task in tasks.items()}
+
+    outcomes = {}
+    task = tasks[local_name]
+    try:
+        outcomes[local_name] = (True, task.func(*task.args))
+    except Exception as e:
+        outcomes[local_name] = (False, e)
+    for name, future in futures.items():
+        try:
+            outcomes[name] = (True, future.result())
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # 子プロセスが落ちた場合はプールを作り直せるようにして、その分だけ自前で読む
+            print(f"並列読み込みに失敗したため順に読み込みます: {e}")
+            shutdown()
+            try:
+                outcomes[name] = (True, tasks[name].func(*tasks[name].args))
+            except Exception as retry_error:
+                outcomes[name] = (False, retry_error)
+        except Exception as e:
+            outcomes[name] = (False, e)
+
+    results = {}
+    for name in tasks:
+        ok, value = outcomes[name]
+        if not ok:
+            raise value
+        results[name] = value
+    return results
@@ -0,0 +1,104 @@
+"""単価表（一般総平均シート）の構造インデックス
+
+1 行目の年月見出しを 1 回の走査で解析し、YYYYMM → 列範囲 を引けるようにする。
+見出しは完全一致（YYYYMM の数値・文字列、「2025年9月」、日付型）で判定し、
+部分一致による誤検出（例: 備考中の数字）を避ける。
+"""
+import datetime
+import re
+from dataclasses import dataclass
+
+_YYYYMM_RE = re.compile(r"(?<!\d)(\d{4})(\d{2})(?!\d)")
+_KANJI_YM_RE = re.compile(r"(?<!\d)(\d{4})\s*年\s*(\d{1,2})\s*月")
+
+
+def header_year_month(value):
+    """見出しセルの値を YYYYMM 文字列に正規化（年月でなければ None）"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return f"{value.year}{value.month:02}"
+    if isinstance(value, float):
+        if not value.is_integer():
+            return None
+        value = int(value)
+    text = str(value).strip()
+    matches = _YYYYMM_RE.findall(text) or _KANJI_YM_RE.findall(text)
+    if len(matches) != 1:
+        return None
+    year, month = int(matches[0][0]), int(matches[0][1])
+    if not 1900 <= year <= 2999 or not 1 <= month <= 12:
+        return None
+    return f"{year}{month:02}"
+
+
+@dataclass(frozen=True)
+class MonthSpan:
+    """1 か月分の列範囲（start 以上 end 未満、1 始まり）と、空列を除いたデータ列"""
+    year_month: str
+    start: int
+    end: int
+    columns: tuple
+
+    def to_list(self):
+        return [self.year_month, self.start, self.end, list(self.columns)]
+
+    @classmethod
+    def from_list(cls, data):
+        year_month, start, end, columns = data
+        return cls(year_month, start, end, tuple(columns))
+
+
+class MonthLayout:
+    """YYYYMM → MonthSpan の対応表"""
+
+    def __init__(self, spans):
+        self._spans = {span.year_month: span for span in spans}
+
+    @classmethod
+    def build(cls, rows):
+        """行データ（rows[行-1][列-1]）から作成。
+
+        月の範囲は見出し列から次の見出し列の手前まで。最後の月は見出し列以降で
+        最初に現れる「走査した全行が空の列」（区切り列）の手前まで。
+        """
+        max_column = max((len(values) for values in rows), default=0)
+        header = rows[0] if rows else ()
+        starts = []
+        blank = [True] * (max_column + 2)
+        for column in range(1, max_column + 1):
+            for values in rows:
+                if column <= len(values) and values[column - 1] is not None:
+                    blank[column] = False
+                    break
+            year_month = header_year_month(header[column - 1]) if column <= len(header) else None
+            if year_month:
+                starts.append((column, year_month))
+
+        spans = []
+        seen = set()
+        for index, (start, year_month) in enumerate(starts):
+            if index + 1 < len(starts):
+                end = starts[index + 1][0]
+            else:
+                end = next((c for c in range(start + 1, max_column + 2) if blank[c]), max_column + 1)
+            # 同じ年月の見出しが複数ある場合は先頭を採用
+            if year_month in seen:
+                continue
+            seen.add(year_month)
+            columns = tuple(c for c in range(start, end) if not blank[c])
+            spans.append(MonthSpan(year_month, start, end, columns))
+        return cls(spans)
+
+    def span(self, year_month):
+        return self._spans.get(year_month)
+
+    def months(self):
+        return list(self._spans)
+
+    def to_list(self):
+        return [span.to_list() for span in self._spans.values()]
+
+    @classmethod
+    def from_list(cls, data):
+        return cls(MonthSpan.from_list(item) for item in data)
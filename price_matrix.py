@@ -0,0 +1,167 @@
+"""単価表（一般総平均シート）の全月分の単価を列指向で保持する表
+
+単価表の行データを 1 回走査して、全月分の ID→単価 を次の形で保持する。
+
+- ID 表: 出現順に採番した ID のリスト（同じ ID は 1 つにまとめる）
+- 月軸: 見出しの順の YYYYMM のリスト
+- 単価: 月ごとに ID 数分が連続する array('d')（月の切り出しは連続領域、ID の履歴は一定間隔の切り出し）
+- 種別: 単価と同じ並びの bytearray（0: 単価なし、1: float、2: int、3: その他の値）
+
+(ID, 月) の参照は辞書 2 回と配列の添字で済む。to_bytes / from_bytes で小さなバイナリに変換できる。
+数値以外の単価（文字列など）は元の値のまま別に保持し、単価表から読んだ値と同じ型で返す。
+"""
+import array
+import json
+import struct
+import sys
+
+MAGIC = b"PRMX"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+
+MISSING = 0
+FLOAT = 1
+INT = 2
+OTHER = 3
+# float で正確に表せる整数の範囲（これを超える int は元の値のまま保持）
+_MAX_EXACT_INT = 2 ** 53
+
+
+def _value_at(rows, row, column):
+    """rows（値タプルのリスト）から 1 始まりの行・列で値を取得（範囲外は None）"""
+    if row > len(rows):
+        return None
+    values = rows[row - 1]
+    return values[column - 1] if column <= len(values) else None
+
+
+class PriceMatrix:
+    def __init__(self, ids, months, kinds, values, others):
+        self.ids = ids
+        self.months = months
+        self._kinds = kinds
+        self._values = values
+        # {通し番号: 元の値}（種別が OTHER のもの）
+        self._others = others
+        self._id_index = {id: index for index, id in enumerate(ids)}
+        self._month_index = {year_month: index for index, year_month in enumerate(months)}
+
+    @classmethod
+    def build(cls, rows, spans, id_row, price_row):
+        """単価表の行データ（rows[行-1][列-1]）と月の列範囲（price_index.MonthSpan）から作成。
+
+        各月の列で ID と単価がどちらも空・0 でないものを取り込む（同じ月に同じ ID が複数あれば右の列を採用）。
+        """
+        ids = []
+        id_index = {}
+        months = []
+        entries = []
+        for span in spans:
+            month = len(months)
+            months.append(span.year_month)
+            for column in span.columns:
+                id_value = _value_at(rows, id_row, column)
+                price_value = _value_at(rows, price_row, column)
+                if id_value and price_value and price_value != 0:
+                    index = id_index.get(id_value)
+                    if index is None:
+                        index = id_index[id_value] = len(ids)
+                        ids.append(id_value)
+                    entries.append((month, index, price_value))
+
+        size = len(ids) * len(months)
+        kinds = bytearray(size)
+        values = array.array("d", bytes(8 * size))
+        others = {}
+        for month, index, price in entries:
+            position = month * len(ids) + index
+            value_type = type(price)
+            if value_type is float:
+                kinds[position] = FLOAT
+                values[position] = price
+            elif value_type is int and abs(price) < _MAX_EXACT_INT:
+                kinds[position] = INT
+                values[position] = price
+            else:
+                kinds[position] = OTHER
+                values[position] = 0.0
+                others[position] = price
+            if kinds[position] != OTHER:
+                others.pop(position, None)
+        return cls(ids, months, kinds, values, others)
+
+    def _value(self, position):
+        kind = self._kinds[position]
+        if kind == FLOAT:
+            return self._values[position]
+        if kind == INT:
+            return int(self._values[position])
+        if kind == OTHER:
+            return self._others[position]
+        return None
+
+    def has_month(self, year_month) -> bool:
+        return year_month in self._month_index
+
+    def get(self, id, year_month, default=None):
+        """(ID, 年月) の単価（無ければ default）"""
+        index = self._id_index.get(id)
+        month = self._month_index.get(year_month)
+        if index is None or month is None:
+            return default
+        value = self._value(month * len(self.ids) + index)
+        return default if value is None else value
+
+    def month_prices(self, year_month):
+        """対象年月の ID→単価 辞書（年月が無ければ KeyError）"""
+        offset = self._month_index[year_month] * len(self.ids)
+        kinds = self._kinds[offset:offset + len(self.ids)]
+        if OTHER not in kinds and INT not in kinds:
+            values = self._values[offset:offset + len(self.ids)]
+            return {id: value for id, kind, value in zip(self.ids, kinds, values) if kind}
+        return {id: self._value(offset + index) for index, id in enumerate(self.ids) if kinds[index]}
+
+    def history(self, id):
+        """ID の {YYYYMM: 単価}（月軸の順、単価の無い月は含めない）"""
+        index = self._id_index.get(id)
+        if index is None:
+            return {}
+        step = len(self.ids)
+        kinds = self._kinds[index::step]
+        return {year_month: self._value(month * step + index)
+                for month, year_month in enumerate(self.months) if kinds[month]}
+
+    def to_bytes(self) -> bytes:
+        """バイナリに変換（ID・数値以外の単価が JSON で表せない場合は TypeError）"""
+        header = json.dumps({
+            "ids": self.ids,
+            "months": self.months,
+            "others": [[position, value] for position, value in self._others.items()],
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        values = array.array("d", self._values)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return b"".join([_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)), header, bytes(self._kinds),
+                         values.tobytes()])
+
+    @classmethod
+    def from_bytes(cls, data):
+        """to_bytes の結果から復元（形式が違えば ValueError）"""
+        if len(data) < _HEADER.size:
+            raise ValueError("単価表の行列データが短すぎます")
+        magic, version, header_size = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("単価表の行列データの形式が違います")
+        offset = _HEADER.size
+        header = json.loads(data[offset:offset + header_size].decode("utf-8"))
+        offset += header_size
+        size = len(header["ids"]) * len(header["months"])
+        if len(data) != offset + size * 9:
+            raise ValueError("単価表の行列データの長さが違います")
+        kinds = bytearray(data[offset:offset + size])
+        values = array.array("d")
+        values.frombytes(data[offset + size:])
+        if sys.byteorder != "little":
+            values.byteswap()
+        others = {position: value for position, value in header["others"]}
+        return cls(header["ids"], header["months"], kinds, values, others)
@@ -0,0 +1,155 @@
+"""売上表の利益・利益率の一括計算
+
+ID・売上金額・売上数量の列をまとめて受け取り、利益 = 売上金額 - 売上数量 × 単価、
+利益率 = 利益 ÷ 売上金額 を計算する。NumPy があれば列を配列にして一括計算し、
+無ければ同じ結果を返す Python 実装を使う（NumPy は任意依存。import に時間がかかるため
+初回の計算時に読み込む）。
+
+行ごとの判定は従来の転記ループと同じ:
+- 単価が無い（0・空を含む）ID の行は計算しない（売上金額が数値なら unmatched）
+- 売上金額・売上数量のどちらかが空の行は計算しない
+- 数値に変換できない行は errors（利益・利益率は書き込まない）
+- 売上金額・売上数量のどちらかが 0 の行は計算しない
+"""
+import itertools
+import math
+from dataclasses import dataclass, field
+
+# available() の初回呼び出しで NumPy を読み込む（無ければ None のまま）
+np = None
+_numpy_checked = False
+
+CONVERSION_ERROR = "数値に変換できません"
+
+
+@dataclass
+class ProfitColumns:
+    """計算結果。位置はいずれも入力列の 0 始まりのインデックス"""
+    # 計算した行の位置と、その利益・利益率（同じ長さの列）
+    positions: list = field(default_factory=list)
+    profits: list = field(default_factory=list)
+    rates: list = field(default_factory=list)
+    # 数値に変換できなかった行 [(位置, 理由), ...]
+    errors: list = field(default_factory=list)
+    # 単価が見つからなかった行（売上金額が数値の行のみ） [位置, ...]
+    unmatched: list = field(default_factory=list)
+
+    def rows(self):
+        """(位置, 利益, 利益率) を順に返す"""
+        return zip(self.positions, self.profits, self.rates)
+
+
+def available() -> bool:
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _numpy_checked = True
+    return np is not None
+
+
+def compute(ids, sales_values, quantities, id_price_dict, use_numpy=None) -> ProfitColumns:
+    """ids / sales_values / quantities（同じ長さの列）から利益・利益率を計算
+
+    use_numpy: None なら NumPy があれば使う
+    """
+    if use_numpy is None:
+        use_numpy = available()
+    if use_numpy and available():
+        return _compute_numpy(ids, sales_values, quantities, id_price_dict)
+    return _compute_python(ids, sales_values, quantities, id_price_dict)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compute_python(ids, sales_values, quantities, id_price_dict):
+    result = ProfitColumns()
+    for index, (id, sales_value, sales_num_value) in enumerate(zip(ids, sales_values, quantities)):
+        price = id_price_dict.get(id, None)
+        if not price:
+            if id is not None and _is_number(sales_value):
+                result.unmatched.append(index)
+            continue
+        if sales_value is None or sales_num_value is None:
+            continue
+        try:
+            sales = float(sales_value)
+            sales_num = float(sales_num_value)
+            if sales and sales_num and not math.isnan(sales) and not math.isnan(sales_num):
+                profit = sales - sales_num * float(price)
+                result.positions.append(index)
+                result.profits.append(profit)
+                result.rates.append(profit / sales)
+        except (ValueError, TypeError):
+            result.errors.append((index, CONVERSION_ERROR))
+    return result
+
+
+def _to_float_array(values):
+    """値の列を float 配列に変換し (配列, 計算に使えない位置, 変換できない位置) を返す
+
+    空（None）・"nan" などは NaN になり「計算に使えない」、変換できない値は NaN かつ「変換できない」。
+    """
+    try:
+        # 数値・数値文字列・None だけなら一括変換（None は NaN）
+        array = np.array(values, dtype=float)
+        return array, np.isnan(array), np.zeros(len(array), dtype=bool)
+    except (ValueError, TypeError):
+        pass
+    array = np.full(len(values), np.nan)
+    bad = np.zeros(len(values), dtype=bool)
+    for index, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            array[index] = float(value)
+        except (ValueError, TypeError):
+            bad[index] = True
+    return array, np.isnan(array), bad
+
+
+def _compute_numpy(ids, sales_values, quantities, id_price_dict):
+    result = ProfitColumns()
+    count = len(ids)
+    if not count:
+        return result
+    # ID → 単価表の位置（無い ID は末尾の番兵 = 単価なし）
+    keys = list(id_price_dict)
+    key_index = {key: index for index, key in enumerate(keys)}
+    inverse = np.fromiter(map(key_index.get, ids, itertools.repeat(len(keys))), dtype=np.intp, count=count)
+    key_prices = [id_price_dict[key] for key in keys] + [None]
+    has_price = np.array([bool(price) for price in key_prices], dtype=bool)[inverse]
+    price, _, price_bad = _to_float_array([price if price else None for price in key_prices])
+    price, price_bad = price[inverse], price_bad[inverse]
+
+    sales, sales_unusable, sales_bad = _to_float_array(list(sales_values))
+    quantity, quantity_unusable, quantity_bad = _to_float_array(list(quantities))
+
+    # 単価なし: ID があり、売上金額が数値（bool 以外）の行
+    result.unmatched = [index for index in np.flatnonzero(~has_price).tolist()
+                        if ids[index] is not None and _is_number(sales_values[index])]
+
+    # 変換できない値があればエラー（単価は売上金額・売上数量が使える行でだけ見る）
+    usable = ~sales_unusable & ~quantity_unusable & (sales != 0) & (quantity != 0)
+    error = has_price & (sales_bad | quantity_bad | (price_bad & usable))
+    if error.any():
+        # 売上金額・売上数量のどちらかが空の行は対象外（エラーにしない）
+        error &= np.fromiter((sales_value is not None and sales_num_value is not None
+                              for sales_value, sales_num_value in zip(sales_values, quantities)),
+                             dtype=bool, count=count)
+    valid = has_price & ~error & usable
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profit = sales - quantity * price
+        rate = profit / sales
+    positions = np.flatnonzero(valid)
+    result.positions = positions.tolist()
+    result.profits = profit[positions].tolist()
+    result.rates = rate[positions].tolist()
+    result.errors = [(index, CONVERSION_ERROR) for index in np.flatnonzero(error).tolist()]
+    return result
@@ -0,0 +1,97 @@
+"""売上表の商品別・得意先別の利益集計
+
+売上表の転記（engine._apply_sales_rows）で利益を計算した行を、同じ走査の中で
+ID（ID_COLUMN_IN_SALES）別・得意先ブロック別に積み上げる。保持するのはキーごとの合計だけで、
+メモリは行数ではなくキーの種類数に比例する。保存後に run_log.instrumented が CSV に書き出す。
+
+- 得意先: CUSTOMER_COLUMN_IN_SALES 列の値。空の行は直前の得意先のブロックに含める（列が 0 なら集計しない）
+- 原価 = 売上金額 - 利益（= 売上数量 × 単価）
+- 利益率は売上金額で加重した値（利益合計 ÷ 売上金額合計）
+"""
+import csv
+import os
+
+FIELDS = ("kind", "key", "rows", "quantity", "sales", "cost", "profit", "margin")
+PRODUCT = "商品"
+CUSTOMER = "得意先"
+KINDS = (PRODUCT, CUSTOMER)
+
+
+class ProfitSummary:
+    def __init__(self):
+        # {区分: {キー: [行数, 売上数量, 売上金額, 利益]}}（キーは出現順）
+        self.totals = {kind: {} for kind in KINDS}
+
+    def __len__(self):
+        return sum(len(totals) for totals in self.totals.values())
+
+    def add(self, kind, key, quantity, sales, profit):
+        total = self.totals[kind].get(key)
+        if total is None:
+            total = self.totals[kind][key] = [0, 0.0, 0.0, 0.0]
+        total[0] += 1
+        total[1] += quantity
+        total[2] += sales
+        total[3] += profit
+
+    def add_sheet(self, ids, customers, quantities, sales_values, calc):
+        """売上シート 1 枚分の計算結果（profit_calc.ProfitColumns）を積み上げる。
+
+        customers: 得意先列（ids と同じ長さ。集計しないなら None）。得意先はシートごとに数え直す
+        """
+        scan = 0
+        customer = None
+        for index, profit in zip(calc.positions, calc.profits):
+            if customers is not None:
+                # 計算した行は位置の昇順なので、得意先は前の行から引き継いで 1 回の走査で求まる
+                while scan <= index:
+                    if customers[scan] is not None and customers[scan] != "":
+                        customer = customers[scan]
+                    scan += 1
+            quantity, sales = float(quantities[index]), float(sales_values[index])
+            self.add(PRODUCT, ids[index], quantity, sales, profit)
+            if customers is not None:
+                self.add(CUSTOMER, customer, quantity, sales, profit)
+
+    def rows(self):
+        """CSV の行（FIELDS をキーにした dict）を区分・出現順に返す"""
+        for kind in KINDS:
+            for key, (count, quantity, sales, profit) in self.totals[kind].items():
+                yield {
+                    "kind": kind,
+                    "key": "" if key is None else key,
+                    "rows": count,
+                    "quantity": quantity,
+                    "sales": sales,
+                    "cost": sales - profit,
+                    "profit": profit,
+                    "margin": profit / sales if sales else None,
+                }
+
+    def write_csv(self, path):
+        # Excel で文字化けしないよう BOM 付き UTF-8
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def save(self, directory, name):
+        """directory/name.csv に書き出してパスを返す（集計が無ければ何もせず None）"""
+        if not len(self):
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.csv")
+        self.write_csv(path)
+        return path
+
+    def to_dict(self) -> dict:
+        """JSON 化できる dict（常駐転記サービスの応答用）"""
+        return {kind: [[key, *total] for key, total in totals.items()] for kind, totals in self.totals.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        for kind in KINDS:
+            for key, *total in data.get(kind, []):
+                summary.totals[kind][key] = list(total)
+        return summary
@@ -0,0 +1,200 @@
+"""転記の計測と実行ログ
+
+1 回の転記ごとに、フェーズ別所要時間・走査行数・書き込みセル数・ピークメモリを
+logs/run_log.jsonl へ 1 行の JSON として追記する（失敗・キャンセルも記録）。
+ファイルが RUN_LOG_MAX_KB を超えたら run_log.1.jsonl, run_log.2.jsonl … へ
+ローテーションし、RUN_LOG_BACKUPS 世代を超えた古いものは削除する。
+
+- TRACE_MEMORY: tracemalloc でピークメモリを計測（処理が数倍遅くなる）
+- PROFILE_ENABLED: cProfile の結果を logs/profile-<処理>-<日時>.pstats に保存
+- CHANGE_JOURNAL_ENABLED: 書き換えたセルの記録を logs/changes/<処理>-<年月>-<日時>.csv に保存
+- PROFIT_REPORT_ENABLED: 売上表の商品別・得意先別の利益集計を logs/reports/<処理>-<年月>-<日時>.csv に保存
+"""
+import cProfile
+import datetime
+import json
+import os
+import time
+import tracemalloc
+
+import engine
+from settings import Settings
+
+RUN_LOG_FILE_NAME = "run_log.jsonl"
+CHANGES_DIR_NAME = "changes"
+REPORTS_DIR_NAME = "reports"
+
+
+def log_path():
+    return os.path.join(Settings.log_dir(), RUN_LOG_FILE_NAME)
+
+
+def _backup_path(path, index):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{index}{ext}"
+
+
+def _rotate(path, max_bytes, backups):
+    """path が max_bytes 以上なら .1, .2 … へずらす（backups 世代を超えた分は削除）"""
+    try:
+        if os.path.getsize(path) < max_bytes:
+            return
+    except OSError:
+        return
+    if backups <= 0:
+        os.remove(path)
+        return
+    for index in range(backups - 1, 0, -1):
+        source = _backup_path(path, index)
+        if os.path.exists(source):
+            os.replace(source, _backup_path(path, index + 1))
+    os.replace(path, _backup_path(path, 1))
+
+
+def append_record(record, path=None):
+    """record（JSON 化できる dict）を実行ログに 1 行追記。書けない場合は表示のみ"""
+    path = path or log_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _rotate(path, int(Settings.RUN_LOG_MAX_KB * 1024), int(Settings.RUN_LOG_BACKUPS))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        print(f"実行ログの書き込みエラー: {e}")
+
+
+def _result_fields(result):
+    return {
+        "kind": result.kind,
+        "year_month": result.year_month,
+        "target": result.target_path,
+        "updated": result.updated,
+        "scanned": result.scanned,
+        "cells_written": result.cells_written,
+        "unchanged": result.unchanged,
+        "errors": len(result.errors),
+        "timings": {name: round(sec, 4) for name, sec in result.timings.items()},
+        "per_month": result.per_month,
+        "dry_run": result.dry_run,
+        "unmatched": len(result.unmatched),
+    }
+
+
+def _profile_path(operation, started):
+    return os.path.join(Settings.log_dir(), f"profile-{operation}-{started:%Y%m%d-%H%M%S}.pstats")
+
+
+def _save_journal(result, operation, started):
+    """変更ジャーナルを書き出してパスを返す（変更が無い・書けない場合は None）"""
+    name = f"{operation}-{result.year_month}-{started:%Y%m%d-%H%M%S}"
+    try:
+        return result.journal.save(os.path.join(Settings.log_dir(), CHANGES_DIR_NAME), name,
+                                   Settings.CHANGE_JOURNAL_FORMAT)
+    except (OSError, ValueError) as e:
+        print(f"変更ジャーナルの保存エラー: {e}")
+        return None
+
+
+def _save_profit_report(result, operation, started):
+    """利益集計を書き出してパスを返す（集計が無い・書けない場合は None）"""
+    name = f"{operation}-{result.year_month}-{started:%Y%m%d-%H%M%S}"
+    try:
+        return result.profit_summary.save(os.path.join(Settings.log_dir(), REPORTS_DIR_NAME), name)
+    except OSError as e:
+        print(f"利益集計の保存エラー: {e}")
+        return None
+
+
+def _add_result(record, result, operation, started):
+    """転記結果の項目と変更ジャーナル・利益集計のパスを record に追加。
+    連続転記（engine.PipelineResult）は段階ごとに record["stages"] へ追加する"""
+    stages = getattr(result, "stages", None)
+    if stages is not None:
+        record["stages"] = []
+        for stage in stages:
+            stage_record = {}
+            _add_result(stage_record, stage, f"{operation}-{stage.kind}", started)
+            record["stages"].append(stage_record)
+        return
+    record.update(_result_fields(result))
+    if Settings.CHANGE_JOURNAL_ENABLED and result.cells_written:
+        record["journal"] = _save_journal(result, operation, started)
+    # プレビューでは書き出さない（CLI は --profit-report で書き出せる）
+    if result.profit_summary is not None and not result.dry_run:
+        record["profit_report"] = _save_profit_report(result, operation, started)
+
+
+def instrumented(operation, job):
+    """job(progress=..., cancel=...) を計測付きで実行する callable を返す。
+
+    戻り値・例外は job と同じ。計測値は TransferResult に反映し、実行ログへ追記する。
+    operation: ログ上の処理名（"transfer_stock" など）
+    """
+    def run(progress=None, cancel=None):
+        started = datetime.datetime.now()
+        record = {"timestamp": started.isoformat(timespec="seconds"), "operation": operation}
+        # 既に計測中（ベンチマーク等）なら開始・終了は呼び出し側に任せる
+        trace_memory = Settings.TRACE_MEMORY
+        own_trace = trace_memory and not tracemalloc.is_tracing()
+        if own_trace:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if Settings.PROFILE_ENABLED else None
+        start = time.perf_counter()
+        result = None
+        try:
+            if profiler:
+                profiler.enable()
+            try:
+                result = job(progress=progress, cancel=cancel)
+            finally:
+                if profiler:
+                    profiler.disable()
+            record["status"] = "ok"
+            return result
+        except engine.TransferCancelled:
+            record["status"] = "cancelled"
+            raise
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            record["wall"] = round(time.perf_counter() - start, 4)
+            if trace_memory:
+                peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+                record["peak_mb"] = peak_mb
+                if result is not None:
+                    result.peak_memory_mb = peak_mb
+                if own_trace:
+                    tracemalloc.stop()
+            if result is not None:
+                _add_result(record, result, operation, started)
+            if profiler:
+                record["profile"] = _dump_profile(profiler, _profile_path(operation, started))
+            if Settings.RUN_LOG_ENABLED:
+                append_record(record)
+
+    return run
+
+
+def log_result(operation, result):
+    """instrumented を通さずに得た転記結果（自動更新の差分転記など）を実行ログへ追記"""
+    started = datetime.datetime.now()
+    record = {"timestamp": started.isoformat(timespec="seconds"), "operation": operation, "status": "ok",
+              "wall": round(result.total_time, 4)}
+    _add_result(record, result, operation, started)
+    if Settings.RUN_LOG_ENABLED:
+        append_record(record)
+
+
+def _dump_profile(profiler, path):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"プロファイル結果の保存エラー: {e}")
+        return None
+    print(f"プロファイル結果を保存しました: {path}")
+    return path
@@ -0,0 +1,146 @@
+"""読み込み済みデータのメモリ内キャッシュ（アプリ起動中のみ）
+
+単価表の行データ・在庫表の月別シート・売上表のシートなど、ブックから抽出したデータを
+「種類・元ファイルの絶対パス・パラメータ」で保持し、同じセッション内の次の転記
+（別の月、プレビュー後の本実行、在庫→売上の連続実行など）でブックを開かずに再利用する。
+ブックオブジェクト自体は保持しない（read-only ブックはファイルを開いたままになるため）。
+
+- 元ファイルの更新時刻・サイズが変わっていればミス（エントリは削除）
+- 自分で保存したファイルのエントリは write 直後に invalidate で削除
+- 推定サイズの合計が SESSION_CACHE_MAX_MB を超えたら最後に使ったのが古いものから削除
+- 上限より大きいデータは保持しない
+- 保持したデータは複数の転記で共有するため、呼び出し側で書き換えないこと
+"""
+import itertools
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from settings import Settings
+
+# サイズ推定で中身を見る要素数（残りは同じ大きさとみなす）
+SIZE_SAMPLE = 32
+
+
+def estimate_size(value) -> int:
+    """value のおおよそのメモリ使用量[バイト]（リスト・タプル・辞書は先頭の要素から推定）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        items = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        per_item = [estimate_size(key) + estimate_size(item) for key, item in items]
+    elif isinstance(value, (list, tuple)):
+        per_item = [estimate_size(item) for item in itertools.islice(value, SIZE_SAMPLE)]
+    else:
+        return size
+    if per_item:
+        size += sum(per_item) * len(value) // len(per_item)
+    return size
+
+
+def file_signature(path):
+    """(更新時刻 ns, サイズ)。ファイルが無い場合は None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class SessionCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # {(種類, 絶対パス, パラメータ): (署名, 推定サイズ, データ)}（末尾ほど最近使ったもの）
+        self._entries = OrderedDict()
+        self._total = 0
+
+    @staticmethod
+    def _key(kind, path, params):
+        return kind, os.path.abspath(path), tuple(sorted(params.items()))
+
+    def get(self, kind, path, params, default=None):
+        """保持しているデータを返す。無い・元ファイルが変わっている場合は default"""
+        key = self._key(kind, path, params)
+        signature = file_signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or signature is None or entry[0] != signature:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, kind, path, params, data, signature=None):
+        """data を保持する。signature（読み込み前の署名）が現在と異なる場合は読み込み中に更新されたため保持しない"""
+        current = file_signature(path)
+        if current is None or (signature is not None and signature != current):
+            return
+        signature = current
+        size = estimate_size(data)
+        if size > self.max_bytes:
+            return
+        key = self._key(kind, path, params)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (signature, size, data)
+            self._total += size
+            self._evict()
+
+    def invalidate(self, path):
+        """path のエントリをすべて削除（自分で保存した直後に呼ぶ）"""
+        path = os.path.abspath(path)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == path]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total -= size
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def from_settings():
+    """設定に従ったセッション全体で共有のキャッシュ（無効なら None）。上限は呼び出し時の設定値を反映"""
+    global _cache
+    if not Settings.SESSION_CACHE_ENABLED:
+        return None
+    max_bytes = int(Settings.SESSION_CACHE_MAX_MB * 1024 * 1024)
+    with _cache_lock:
+        if _cache is None:
+            _cache = SessionCache(max_bytes)
+        elif _cache.max_bytes != max_bytes:
+            _cache.max_bytes = max_bytes
+            with _cache._lock:
+                _cache._evict()
+        return _cache
+
+
+def invalidate(path):
+    """共有キャッシュから path のエントリを削除（キャッシュ未作成なら何もしない）"""
+    if _cache is not None:
+        _cache.invalidate(path)
@@ -0,0 +1,290 @@
+import os
+import json
+
+class Settings:
+    # 永続化ファイル名のみ固定（その他は _DEFAULT_VALUES で一元管理）
+    SETTINGS_FILE = "settings.json"
+    # インデックスキャッシュのフォルダ名（settings.json と同じ場所に作成）
+    CACHE_DIR_NAME = "cache"
+    # 実行ログ・プロファイル結果のフォルダ名（settings.json と同じ場所に作成）
+    LOG_DIR_NAME = "logs"
+    # 保存前バックアップのフォルダ名（settings.json と同じ場所に作成）
+    BACKUP_DIR_NAME = "backups"
+    
+    # 以下の値（APP_NAME 含む UI/ファイル/行列番号 など）は _DEFAULT_VALUES のみで保持し
+    # reset_to_defaults() によりクラス変数へ一括適用する。二重定義を避けるため
+    # クラスレベルで個別代入しない。
+    _DEFAULT_VALUES = {
+        "PRICE_FILE_PATH": "フロンガス単価表2025.xlsx",
+        "STOCK_FILE_PATH": "2025在庫.xlsx",
+        # 複数の売上表は ; 区切りで指定
+        "SALES_FILE_PATH": "R706 得意先別売上分析表.xlsx",
+        # 売上表で処理するシート名のパターン（空: 作業中のシート、*: 全シート、* ? を使える）
+        "SALES_SHEET_PATTERN": "",
+        "ID_ROW_IN_PRICE": 3,
+        "PRICE_ROW_IN_PRICE": 25,
+        "ID_COLUMN_IN_STOCK": 3,
+        "PRICE_COLUMN_IN_STOCK": 10,
+        "DATA_START_ROW_IN_STOCK": 7,
+        "ID_COLUMN_IN_SALES": 4,
+        "PROFIT_COLUMN_IN_SALES": 9,
+        "PROFIT_RATE_COLUMN_IN_SALES": 10,
+        "SALES_COLUMN_IN_SALES": 6,
+        "SALES_NUM_COLUMN_IN_SALES": 8,
+        # 得意先列（得意先別の利益集計用。空の行は直前の得意先に含める。0 なら得意先別に集計しない）
+        "CUSTOMER_COLUMN_IN_SALES": 1,
+        "APP_NAME": "在庫単価転記アプリ",
+        # 横幅を少し狭める（以前:400）
+        "WINDOW_WIDTH": 340,
+        # 高さもコンパクトに（以前:300）
+        "WINDOW_HEIGHT": 240,
+        "THEME": "light",
+        "COLOR_THEME": "dark-blue",
+        "ICON_FILE": "icon.ico",
+        # 単価表・在庫表から抽出した ID→単価 のディスクキャッシュ
+        "INDEX_CACHE_ENABLED": True,
+        "INDEX_CACHE_MAX_MB": 32,
+        # 独立した入力ブックを別プロセスで同時に読み込む（どれかが MIN_KB 未満なら順に読む）
+        "PARALLEL_LOAD_ENABLED": True,
+        "PARALLEL_LOAD_MIN_KB": 512,
+        # 読み込み済みの単価表・在庫表・売上表のデータをメモリに保持して次の転記で再利用（推定サイズの上限 MB）
+        "SESSION_CACHE_ENABLED": True,
+        "SESSION_CACHE_MAX_MB": 256,
+        # ID 列が空の行がこの行数続いたらシートの残りを読まない（書式だけの行で max_row が大きいシート対策。0 なら最後まで読む）
+        "USED_RANGE_BLANK_ROWS": 500,
+        # 入力ブックの読み込み方式（fast: XML を直接読む高速版。読めないブックは openpyxl で読み直す / openpyxl）
+        "READER_BACKEND": "fast",
+        # 起動直後に openpyxl の import・単価表の事前解析を別スレッドで行う
+        "PREWARM_ENABLED": True,
+        # 実行ログ（logs/run_log.jsonl）。上限サイズを超えたら世代ローテーション
+        "RUN_LOG_ENABLED": True,
+        "RUN_LOG_MAX_KB": 512,
+        "RUN_LOG_BACKUPS": 3,
+        # tracemalloc によるピークメモリ計測（処理が数倍遅くなるため既定は無効）
+        "TRACE_MEMORY": False,
+        # cProfile の結果を logs/ に .pstats で保存
+        "PROFILE_ENABLED": False,
+        # 書き換えたセルの記録（logs/changes/ に csv または jsonl で保存）
+        "CHANGE_JOURNAL_ENABLED": True,
+        "CHANGE_JOURNAL_FORMAT": "csv",
+        # 自動更新（ウォッチモード）: 監視間隔と、更新後に処理を始めるまでの安定待ち時間[秒]
+        "WATCH_INTERVAL_SEC": 2,
+        "WATCH_DEBOUNCE_SEC": 3,
+        # 常駐転記サービス（python main.py serve）: 待ち受けポート（127.0.0.1 のみ）、要求に必要なトークン（空なら不要）、
+        # GUI の転記をサービスが起動していればサービスに依頼するか
+        "DAEMON_PORT": 8765,
+        "DAEMON_TOKEN": "",
+        "DAEMON_CLIENT_ENABLED": True,
+        # 保存先が開かれている場合の自動再試行の回数（0: 再試行せず計算結果を保持して確認）と最初の待ち時間[秒]（毎回倍にする）
+        "SAVE_RETRY_COUNT": 0,
+        "SAVE_RETRY_INTERVAL_SEC": 2,
+        # 売上の転記で商品別・得意先別の利益を集計し、保存後に logs/reports/ へ CSV で書き出す
+        "PROFIT_REPORT_ENABLED": True,
+        # 在庫表・売上表の保存前に backups/ へバックアップ（変わったシートだけを保存）。
+        # 残す転記の回数・日数・合計 MB（超えたら古い転記から削除。0 は無制限）
+        "BACKUP_ENABLED": True,
+        "BACKUP_KEEP_RUNS": 50,
+        "BACKUP_MAX_DAYS": 90,
+        "BACKUP_MAX_MB": 1024,
+    }
+    
+    @classmethod
+    def load_settings(cls):
+        """settings.json から設定を読み込みし、存在しない場合や欠損キーはデフォルト適用"""
+        # まず全てデフォルトで初期化
+        cls.reset_to_defaults()
+        try:
+            if not os.path.exists(cls.SETTINGS_FILE):
+                return
+            with open(cls.SETTINGS_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # ファイルパス設定
+            files = data.get("files", {})
+            if files:
+                cls.PRICE_FILE_PATH = files.get("price_file_path", cls.PRICE_FILE_PATH)
+                cls.STOCK_FILE_PATH = files.get("stock_file_path", cls.STOCK_FILE_PATH)
+                cls.SALES_FILE_PATH = files.get("sales_file_path", cls.SALES_FILE_PATH)
+                cls.SALES_SHEET_PATTERN = files.get("sales_sheet_pattern", cls.SALES_SHEET_PATTERN)
+            # 行・列設定
+            positions = data.get("positions", {})
+            if positions:
+                cls.ID_ROW_IN_PRICE = positions.get("id_row_in_price", cls.ID_ROW_IN_PRICE)
+                cls.PRICE_ROW_IN_PRICE = positions.get("price_row_in_price", cls.PRICE_ROW_IN_PRICE)
+                cls.ID_COLUMN_IN_STOCK = positions.get("id_column_in_stock", cls.ID_COLUMN_IN_STOCK)
+                cls.PRICE_COLUMN_IN_STOCK = positions.get("price_column_in_stock", cls.PRICE_COLUMN_IN_STOCK)
+                cls.DATA_START_ROW_IN_STOCK = positions.get("data_start_row_in_stock", cls.DATA_START_ROW_IN_STOCK)
+                cls.ID_COLUMN_IN_SALES = positions.get("id_column_in_sales", cls.ID_COLUMN_IN_SALES)
+                cls.PROFIT_COLUMN_IN_SALES = positions.get("profit_column_in_sales", cls.PROFIT_COLUMN_IN_SALES)
+                cls.PROFIT_RATE_COLUMN_IN_SALES = positions.get("profit_rate_column_in_sales", cls.PROFIT_RATE_COLUMN_IN_SALES)
+                cls.SALES_COLUMN_IN_SALES = positions.get("sales_column_in_sales", cls.SALES_COLUMN_IN_SALES)
+                cls.SALES_NUM_COLUMN_IN_SALES = positions.get("sales_num_column_in_sales", cls.SALES_NUM_COLUMN_IN_SALES)
+                cls.CUSTOMER_COLUMN_IN_SALES = positions.get("customer_column_in_sales", cls.CUSTOMER_COLUMN_IN_SALES)
+            # 高速化関連設定
+            performance = data.get("performance", {})
+            if performance:
+                cls.INDEX_CACHE_ENABLED = performance.get("index_cache_enabled", cls.INDEX_CACHE_ENABLED)
+                cls.INDEX_CACHE_MAX_MB = performance.get("index_cache_max_mb", cls.INDEX_CACHE_MAX_MB)
+                cls.PARALLEL_LOAD_ENABLED = performance.get("parallel_load_enabled", cls.PARALLEL_LOAD_ENABLED)
+                cls.PARALLEL_LOAD_MIN_KB = performance.get("parallel_load_min_kb", cls.PARALLEL_LOAD_MIN_KB)
+                cls.PREWARM_ENABLED = performance.get("prewarm_enabled", cls.PREWARM_ENABLED)
+                cls.SESSION_CACHE_ENABLED = performance.get("session_cache_enabled", cls.SESSION_CACHE_ENABLED)
+                cls.SESSION_CACHE_MAX_MB = performance.get("session_cache_max_mb", cls.SESSION_CACHE_MAX_MB)
+                cls.USED_RANGE_BLANK_ROWS = performance.get("used_range_blank_rows", cls.USED_RANGE_BLANK_ROWS)
+                cls.READER_BACKEND = performance.get("reader_backend", cls.READER_BACKEND)
+            # 計測・実行ログ設定
+            diagnostics = data.get("diagnostics", {})
+            if diagnostics:
+                cls.RUN_LOG_ENABLED = diagnostics.get("run_log_enabled", cls.RUN_LOG_ENABLED)
+                cls.RUN_LOG_MAX_KB = diagnostics.get("run_log_max_kb", cls.RUN_LOG_MAX_KB)
+                cls.RUN_LOG_BACKUPS = diagnostics.get("run_log_backups", cls.RUN_LOG_BACKUPS)
+                cls.TRACE_MEMORY = diagnostics.get("trace_memory", cls.TRACE_MEMORY)
+                cls.PROFILE_ENABLED = diagnostics.get("profile_enabled", cls.PROFILE_ENABLED)
+                cls.CHANGE_JOURNAL_ENABLED = diagnostics.get("change_journal_enabled", cls.CHANGE_JOURNAL_ENABLED)
+                cls.CHANGE_JOURNAL_FORMAT = diagnostics.get("change_journal_format", cls.CHANGE_JOURNAL_FORMAT)
+            # 自動更新設定
+            watch = data.get("watch", {})
+            if watch:
+                cls.WATCH_INTERVAL_SEC = watch.get("watch_interval_sec", cls.WATCH_INTERVAL_SEC)
+                cls.WATCH_DEBOUNCE_SEC = watch.get("watch_debounce_sec", cls.WATCH_DEBOUNCE_SEC)
+            # 常駐転記サービス設定
+            daemon = data.get("daemon", {})
+            if daemon:
+                cls.DAEMON_PORT = daemon.get("daemon_port", cls.DAEMON_PORT)
+                cls.DAEMON_TOKEN = daemon.get("daemon_token", cls.DAEMON_TOKEN)
+                cls.DAEMON_CLIENT_ENABLED = daemon.get("daemon_client_enabled", cls.DAEMON_CLIENT_ENABLED)
+            save = data.get("save", {})
+            if save:
+                cls.SAVE_RETRY_COUNT = save.get("save_retry_count", cls.SAVE_RETRY_COUNT)
+                cls.SAVE_RETRY_INTERVAL_SEC = save.get("save_retry_interval_sec", cls.SAVE_RETRY_INTERVAL_SEC)
+            # 利益集計設定
+            report = data.get("report", {})
+            if report:
+                cls.PROFIT_REPORT_ENABLED = report.get("profit_report_enabled", cls.PROFIT_REPORT_ENABLED)
+            # 保存前バックアップ設定
+            backup = data.get("backup", {})
+            if backup:
+                cls.BACKUP_ENABLED = backup.get("backup_enabled", cls.BACKUP_ENABLED)
+                cls.BACKUP_KEEP_RUNS = backup.get("backup_keep_runs", cls.BACKUP_KEEP_RUNS)
+                cls.BACKUP_MAX_DAYS = backup.get("backup_max_days", cls.BACKUP_MAX_DAYS)
+                cls.BACKUP_MAX_MB = backup.get("backup_max_mb", cls.BACKUP_MAX_MB)
+            print("設定を読み込みました")
+        except Exception as e:
+            print(f"設定の読み込みエラー: {e}")
+    
+    @classmethod
+    def save_settings(cls):
+        """現在の設定をsettings.jsonに保存"""
+        try:
+            settings_data = {
+                "files": {
+                    "price_file_path": cls.PRICE_FILE_PATH,
+                    "stock_file_path": cls.STOCK_FILE_PATH,
+                    "sales_file_path": cls.SALES_FILE_PATH,
+                    "sales_sheet_pattern": cls.SALES_SHEET_PATTERN
+                },
+                "positions": {
+                    "id_row_in_price": cls.ID_ROW_IN_PRICE,
+                    "price_row_in_price": cls.PRICE_ROW_IN_PRICE,
+                    "id_column_in_stock": cls.ID_COLUMN_IN_STOCK,
+                    "price_column_in_stock": cls.PRICE_COLUMN_IN_STOCK,
+                    "data_start_row_in_stock": cls.DATA_START_ROW_IN_STOCK,
+                    "id_column_in_sales": cls.ID_COLUMN_IN_SALES,
+                    "profit_column_in_sales": cls.PROFIT_COLUMN_IN_SALES,
+                    "profit_rate_column_in_sales": cls.PROFIT_RATE_COLUMN_IN_SALES,
+                    "sales_column_in_sales": cls.SALES_COLUMN_IN_SALES,
+                    "sales_num_column_in_sales": cls.SALES_NUM_COLUMN_IN_SALES,
+                    "customer_column_in_sales": cls.CUSTOMER_COLUMN_IN_SALES
+                },
+                "performance": {
+                    "index_cache_enabled": cls.INDEX_CACHE_ENABLED,
+                    "index_cache_max_mb": cls.INDEX_CACHE_MAX_MB,
+                    "parallel_load_enabled": cls.PARALLEL_LOAD_ENABLED,
+                    "parallel_load_min_kb": cls.PARALLEL_LOAD_MIN_KB,
+                    "prewarm_enabled": cls.PREWARM_ENABLED,
+                    "session_cache_enabled": cls.SESSION_CACHE_ENABLED,
+                    "session_cache_max_mb": cls.SESSION_CACHE_MAX_MB,
+                    "used_range_blank_rows": cls.USED_RANGE_BLANK_ROWS,
+                    "reader_backend": cls.READER_BACKEND
+                },
+                "diagnostics": {
+                    "run_log_enabled": cls.RUN_LOG_ENABLED,
+                    "run_log_max_kb": cls.RUN_LOG_MAX_KB,
+                    "run_log_backups": cls.RUN_LOG_BACKUPS,
+                    "trace_memory": cls.TRACE_MEMORY,
+                    "profile_enabled": cls.PROFILE_ENABLED,
+                    "change_journal_enabled": cls.CHANGE_JOURNAL_ENABLED,
+                    "change_journal_format": cls.CHANGE_JOURNAL_FORMAT
+                },
+                "watch": {
+                    "watch_interval_sec": cls.WATCH_INTERVAL_SEC,
+                    "watch_debounce_sec": cls.WATCH_DEBOUNCE_SEC
+                },
+                "daemon": {
+                    "daemon_port": cls.DAEMON_PORT,
+                    "daemon_token": cls.DAEMON_TOKEN,
+                    "daemon_client_enabled": cls.DAEMON_CLIENT_ENABLED
+                },
+                "save": {
+                    "save_retry_count": cls.SAVE_RETRY_COUNT,
+                    "save_retry_interval_sec": cls.SAVE_RETRY_INTERVAL_SEC
+                },
+                "report": {
+                    "profit_report_enabled": cls.PROFIT_REPORT_ENABLED
+                },
+                "backup": {
+                    "backup_enabled": cls.BACKUP_ENABLED,
+                    "backup_keep_runs": cls.BACKUP_KEEP_RUNS,
+                    "backup_max_days": cls.BACKUP_MAX_DAYS,
+                    "backup_max_mb": cls.BACKUP_MAX_MB
+                }
+            }
+            
+            with open(cls.SETTINGS_FILE, "w", encoding="utf-8") as f:
+                json.dump(settings_data, f, ensure_ascii=False, indent=2)
+            
+            print("設定を保存しました")
+            return True
+        except Exception as e:
+            print(f"設定の保存エラー: {e}")
+            return False
+        
+    @classmethod
+    def reset_to_defaults(cls):
+        """設定をデフォルト値にリセット（_DEFAULT_VALUES を唯一のソースとする）"""
+        try:
+            for key, value in cls._DEFAULT_VALUES.items():
+                setattr(cls, key, value)
+            return True
+        except Exception as e:
+            print(f"設定リセットエラー: {e}")
+            return False
+    
+    @classmethod
+    def cache_dir(cls):
+        """インデックスキャッシュの保存先（settings.json と同じフォルダ）"""
+        return os.path.join(os.path.dirname(os.path.abspath(cls.SETTINGS_FILE)), cls.CACHE_DIR_NAME)
+
+    @classmethod
+    def log_dir(cls):
+        """実行ログ・プロファイル結果の保存先（settings.json と同じフォルダ）"""
+        return os.path.join(os.path.dirname(os.path.abspath(cls.SETTINGS_FILE)), cls.LOG_DIR_NAME)
+
+    @classmethod
+    def backup_dir(cls):
+        """保存前バックアップの保存先（settings.json と同じフォルダ）"""
+        return os.path.join(os.path.dirname(os.path.abspath(cls.SETTINGS_FILE)), cls.BACKUP_DIR_NAME)
+
+    @classmethod
+    def get_default_value(cls, key):
+        """指定されたキーのデフォルト値を取得"""
+        return cls._DEFAULT_VALUES.get(key, None)
+    
+    @classmethod
+    def is_default_value(cls, key):
+        """現在の値がデフォルト値かどうかを確認"""
+        current_value = getattr(cls, key, None)
+        default_value = cls.get_default_value(key)
+        return current_value == default_value
+
+# 初期化: デフォルト → 上書き読み込み
+Settings.load_settings()
@@ -0,0 +1,103 @@
+"""起動時間の計測と起動直後の事前準備（プリウォーム）
+
+main.py の先頭で import し、ウィンドウ表示までの時間を計測する。ウィンドウ表示後に
+別スレッドで以下を行い、最初の転記を速くする（GUI の起動は待たせない）。
+
+- openpyxl・NumPy の import（engine / profit_calc は初回使用時まで読み込まない。READER_BACKEND が fast なら
+  読み込みに openpyxl を使わないため import しない）
+- 単価表・在庫表のファイル情報取得と読み込み（OS のファイルキャッシュに載せる）
+- 単価表の見出し解析と選択中の年月の ID→単価 抽出（インデックスキャッシュが有効な場合）
+
+計測結果（プロセス内の経過秒数）は実行ログに operation="startup" として記録する。
+インタプリタ自体の起動（PyInstaller の展開を含む）は計測に含まれないため、
+それも含めた比較は python -m bench.startup で行う。
+"""
+import os
+import sys
+import threading
+import time
+
+# この import 時点を起点とする（main.py で最初に import すること）
+_started = time.perf_counter()
+_marks = {}
+_lock = threading.Lock()
+
+
+def mark(name):
+    """起点からの経過秒数を name で記録して返す（同じ名前は最初の 1 回だけ）"""
+    elapsed = round(time.perf_counter() - _started, 4)
+    with _lock:
+        return _marks.setdefault(name, elapsed)
+
+
+def marks():
+    with _lock:
+        return dict(_marks)
+
+
+def _read_through(path, chunk_size=1024 * 1024):
+    """ファイルを読み捨てて OS のファイルキャッシュに載せる"""
+    with open(path, "rb") as f:
+        while f.read(chunk_size):
+            pass
+
+
+def prewarm(price_path, stock_path, year_month, positions, cache=None):
+    """起動直後の事前準備（ワーカースレッドから呼ぶ）。失敗しても転記には影響しないため表示のみ"""
+    import engine
+    import profit_calc
+    from settings import Settings
+
+    if Settings.READER_BACKEND != "fast":
+        import openpyxl  # noqa: F401  （ブックを開く前に import だけ済ませる）
+    profit_calc.available()
+    mark("imports")
+
+    for path in (price_path, stock_path):
+        try:
+            if os.path.isfile(path):
+                _read_through(path)
+        except OSError as e:
+            print(f"事前読み込みをスキップしました: {e}")
+    mark("files")
+
+    if cache is not None and os.path.isfile(price_path):
+        try:
+            engine.PriceTable(price_path, positions, cache).month_prices(year_month)
+        except engine.TransferError as e:
+            print(f"単価表の事前解析をスキップしました: {e}")
+    mark("prewarm")
+
+
+def start_prewarm(price_path, stock_path, year_month, positions, cache=None, on_done=None):
+    """prewarm をデーモンスレッドで開始してスレッドを返す。on_done はワーカースレッドから呼ばれる"""
+    def run():
+        try:
+            prewarm(price_path, stock_path, year_month, positions, cache)
+        except Exception as e:
+            print(f"事前準備エラー: {e}")
+        finally:
+            if on_done:
+                on_done()
+
+    thread = threading.Thread(target=run, name="Prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def log_startup():
+    """計測結果を実行ログへ追記"""
+    import datetime
+    import run_log
+    from settings import Settings
+
+    if not Settings.RUN_LOG_ENABLED:
+        return
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "operation": "startup",
+        "status": "ok",
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "marks": marks(),
+    }
+    run_log.append_record(record)
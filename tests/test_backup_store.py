@@ -0,0 +1,74 @@
+import zipfile
+
+import backup_store
+
+
+def _write_book(path, text):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.xml", text)
+        zf.writestr("b.xml", "unchanged")
+
+
+def _read_member(path):
+    with zipfile.ZipFile(path) as zf:
+        return zf.read("a.xml").decode("utf-8")
+
+
+def test_restore_oldest_run_at_keep_runs_limit(tmp_path):
+    book = tmp_path / "stock.xlsx"
+    store = backup_store.BackupStore(str(tmp_path / "backups"), keep_runs=2)
+    for version in ("v1", "v2", "v3"):
+        _write_book(book, version)
+        store.backup(str(book), "在庫")
+    runs = store.runs()
+    assert len(runs) == 2
+    oldest = runs[-1]
+    assert _read_member(book) == "v3"
+
+    assert store.restore(oldest.run) == [str(book)]
+
+    assert _read_member(book) == "v2"
+    remaining = [item.run for item in store.runs()]
+    assert oldest.run in remaining
+    assert len(remaining) == 2
+
+
+def test_watch_runs_do_not_evict_transfer_runs(tmp_path):
+    book = tmp_path / "stock.xlsx"
+    store = backup_store.BackupStore(str(tmp_path / "backups"), keep_runs=2)
+    for version in ("t1", "t2"):
+        _write_book(book, version)
+        store.backup(str(book), "在庫")
+    for index in range(5):
+        _write_book(book, f"w{index}")
+        store.backup(str(book), "在庫", origin=backup_store.ORIGIN_WATCH)
+    origins = [item.origin for item in store.runs()]
+    assert origins.count(backup_store.ORIGIN_TRANSFER) == 2
+    assert origins.count(backup_store.ORIGIN_WATCH) == 2
+
+
+def test_same_run_keeps_state_before_the_run(tmp_path):
+    book = tmp_path / "sales.xlsx"
+    store = backup_store.BackupStore(str(tmp_path / "backups"))
+    run = backup_store.new_run_id()
+    _write_book(book, "before")
+    store.backup(str(book), "売上", run)
+    # 同じ実行の中で 2 回目の書き込み
+    _write_book(book, "first write")
+    store.backup(str(book), "売上", run)
+    _write_book(book, "second write")
+
+    store.restore(run)
+
+    assert _read_member(book) == "before"
+
+
+def test_backup_is_quiet_unless_verbose(tmp_path, capsys):
+    book = tmp_path / "stock.xlsx"
+    _write_book(book, "v1")
+    store = backup_store.BackupStore(str(tmp_path / "backups"))
+    store.backup(str(book), "在庫")
+    assert capsys.readouterr().out == ""
+    _write_book(book, "v2")
+    store.backup(str(book), "在庫", verbose=True)
+    assert "バックアップを作成しました" in capsys.readouterr().out
@@ -0,0 +1,111 @@
+import functools
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+import daemon
+import daemon_client
+import engine
+from settings import Settings
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Settings, "DAEMON_TOKEN", "secret", raising=False)
+    server = daemon.ThreadingHTTPServer(("127.0.0.1", 0), daemon._Handler)
+    server.service = daemon.TransferService()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _request(port, method, path, headers, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode("utf-8"))
+    finally:
+        connection.close()
+
+
+def test_status_with_token(server):
+    status, data = _request(server, "GET", "/status", {"X-Token": "secret"})
+    assert status == 200
+    assert "error" not in data
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Token": "wrong"}, {"X-Token": "secret1"}])
+def test_rejects_wrong_token(server, headers):
+    assert _request(server, "GET", "/status", headers)[0] == 401
+
+
+def test_rejects_browser_origin(server):
+    headers = {"X-Token": "secret", "Origin": "http://example.com"}
+    assert _request(server, "GET", "/status", headers)[0] == 403
+
+
+@pytest.mark.parametrize("content_type", [None, "text/plain", "application/x-www-form-urlencoded"])
+def test_rejects_post_without_json_content_type(server, content_type):
+    headers = {"X-Token": "secret"}
+    if content_type:
+        headers["Content-Type"] = content_type
+    status, _ = _request(server, "POST", "/jobs/1/cancel", headers, body=b"{}")
+    assert status == 415
+
+
+def test_accepts_post_with_json_content_type(server):
+    headers = {"X-Token": "secret", "Content-Type": "application/json; charset=utf-8"}
+    status, _ = _request(server, "POST", "/jobs/1/cancel", headers, body=b"{}")
+    # 要求 ID が無いだけで、形式のチェックは通る
+    assert status == 404
+
+
+@pytest.mark.parametrize("host", ["attacker.example:{port}", "127.0.0.1:1", "evil.localhost:{port}"])
+def test_rejects_rebound_host(server, host):
+    headers = {"X-Token": "secret", "Host": host.format(port=server)}
+    assert _request(server, "GET", "/status", headers)[0] == 403
+
+
+def test_accepts_localhost_host(server):
+    headers = {"X-Token": "secret", "Host": f"localhost:{server}"}
+    assert _request(server, "GET", "/status", headers)[0] == 200
+
+
+@pytest.mark.parametrize("positions", [
+    [1, 2],
+    {"unknown_column": 1},
+    {"id_column_in_stock": "2"},
+    {"id_column_in_stock": 0},
+    {"id_column_in_stock": 1.5},
+    {"id_column_in_stock": True},
+    {"customer_column_in_sales": -1},
+])
+def test_build_call_rejects_invalid_positions(positions):
+    with pytest.raises(ValueError):
+        daemon.build_call("stock", {"year_month": "202509", "positions": positions})
+
+
+def test_build_call_accepts_position_overrides():
+    overrides = {"id_column_in_stock": 3, "customer_column_in_sales": 0}
+    _, _, args = daemon.build_call("stock", {"year_month": "202509", "positions": overrides})
+    assert args["positions"].id_column_in_stock == 3
+    assert args["positions"].customer_column_in_sales == 0
+
+
+def test_request_sends_absolute_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    call = functools.partial(engine.transfer_stock_and_sales, "price.xlsx", "stock.xlsx",
+                             ["sales1.xlsx", os.path.join("sub", "sales2.xlsx")], "202509")
+    request = daemon_client.request_from_call(call)
+    assert request["price_path"] == str(tmp_path / "price.xlsx")
+    assert request["stock_path"] == str(tmp_path / "stock.xlsx")
+    assert request["sales_path"] == [str(tmp_path / "sales1.xlsx"), str(tmp_path / "sub" / "sales2.xlsx")]
+
+    call = functools.partial(engine.transfer_sales, "stock.xlsx", "sales.xlsx", "202509")
+    assert daemon_client.request_from_call(call)["sales_path"] == str(tmp_path / "sales.xlsx")
@@ -0,0 +1,47 @@
+import os
+
+import index_cache
+from session_cache import file_signature
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _cache(tmp_path):
+    return index_cache.IndexCache(str(tmp_path / "cache"), 1024 * 1024)
+
+
+def test_put_skips_data_read_from_an_older_version(tmp_path):
+    book = str(tmp_path / "stock.xlsx")
+    _write(book, b"before")
+    cache = _cache(tmp_path)
+    signature = file_signature(book)
+    # 読み込み後・保存前に他で更新された
+    _write(book, b"after!!")
+    cache.put("stock", book, {}, [["R1", 100]], signature)
+    assert cache.get("stock", book, {}) is None
+
+    cache.put("stock", book, {}, [["R1", 120]], file_signature(book))
+    assert cache.get("stock", book, {}) == [["R1", 120]]
+
+
+def test_content_hash_is_computed_once_per_version(tmp_path, monkeypatch):
+    book = str(tmp_path / "price.xlsx")
+    _write(book, b"v1")
+    calls = []
+    original = index_cache.content_hash
+    monkeypatch.setattr(index_cache, "content_hash", lambda path: calls.append(path) or original(path))
+    cache = _cache(tmp_path)
+    signature = file_signature(book)
+    for kind in ("layout", "price_matrix", "stock"):
+        cache.put(kind, book, {}, kind, signature)
+    assert len(calls) == 1
+
+    # 更新時刻だけ変わった場合はハッシュを照合して再利用する
+    stat = os.stat(book)
+    os.utime(book, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.get("layout", book, {}) == "layout"
+    assert cache.get("stock", book, {}) == "stock"
+    assert len(calls) == 2
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+import journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_rows_use_column_letters():
+    changes = journal.ChangeJournal()
+    changes.record("202509", 2, "R1", 10, 100, 120)
+    changes.record("202509", 3, "R2", 28, 1, 1.0)
+    changes.record("202509", 4, "R3", 703, None, 5)
+    assert [(row["row"], row["column"]) for row in changes.rows()] == [(2, "J"), (4, "AAA")]
+
+
+def test_rows_do_not_import_openpyxl():
+    code = ("import sys, journal\n"
+            "changes = journal.ChangeJournal()\n"
+            "changes.record('202509', 2, 'R1', 10, 100, 120)\n"
+            "list(changes.rows())\n"
+            "print('openpyxl' in sys.modules)\n")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,64 @@
+import itertools
+import math
+
+import pytest
+
+import profit_calc
+
+pytest.importorskip("numpy")
+
+PRICES = {
+    "R1": 100,
+    "R2": 12.5,
+    "R3": "80",       # 数値文字列の単価
+    "R4": "不明",     # 変換できない単価
+    "R5": 0,          # 単価 0 は単価なし扱い
+    "R6": None,
+    "R7": float("nan"),
+    1001: 50,         # 数値の ID
+}
+IDS = ["R1", "R2", "R3", "R4", "R5", "R6", "R7", 1001, "R9", None]
+VALUES = [None, 0, 0.0, 1000, 250.5, -300, "1200", " 600 ", "abc", "", "nan", float("nan"), True, False,
+          float("inf")]
+
+
+def _cases():
+    """ID・売上金額・売上数量の全組み合わせ（在庫表に無い ID・空の ID を含む）"""
+    rows = list(itertools.product(IDS, VALUES, VALUES))
+    return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+
+def _normalize(values):
+    # NaN 同士を等しく比較できるようにする
+    return [("nan",) if isinstance(value, float) and math.isnan(value) else value for value in values]
+
+
+def _snapshot(result):
+    return ([(index, *_normalize([profit, rate])) for index, profit, rate in result.rows()],
+            result.errors, result.unmatched)
+
+
+def test_numpy_and_python_give_identical_results():
+    ids, sales_values, quantities = _cases()
+    python = profit_calc.compute(ids, sales_values, quantities, PRICES, use_numpy=False)
+    numpy = profit_calc.compute(ids, sales_values, quantities, PRICES, use_numpy=True)
+    assert list(python.rows())
+    assert python.errors and python.unmatched
+    assert _snapshot(numpy) == _snapshot(python)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_row_rules(use_numpy):
+    ids = ["R1", "R1", "R1", "R1", "R9", "R1", "R1"]
+    sales_values = [1000, "1000", 1000, 0, 500, None, "abc"]
+    quantities = [2, "2", 0, 2, 1, 3, 1]
+    result = profit_calc.compute(ids, sales_values, quantities, PRICES, use_numpy=use_numpy)
+    assert list(result.rows()) == [(0, 800.0, 0.8), (1, 800.0, 0.8)]
+    assert result.errors == [(6, profit_calc.CONVERSION_ERROR)]
+    assert result.unmatched == [4]
+
+
+def test_empty_columns():
+    for use_numpy in (False, True):
+        result = profit_calc.compute([], [], [], PRICES, use_numpy=use_numpy)
+        assert (list(result.rows()), result.errors, result.unmatched) == ([], [], [])
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import watch
+
+
+def _append(path, data=b"x"):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+class _FakeTransfer:
+    """単価表の変更で在庫表に書き込み、同じ周期の間に売上表が他で更新される状況を再現する"""
+
+    def __init__(self, tmp_path, fail=False):
+        self.price_path, self.stock_path, self.sales_path = (str(tmp_path / name) for name in ("p", "st", "sa"))
+        for path in (self.price_path, self.stock_path, self.sales_path):
+            _append(path)
+        self.backup_run = None
+        self.written = {}
+        self.fail = fail
+        self.calls = []
+        self.sales_seen = threading.Event()
+
+    def prime(self):
+        pass
+
+    def on_price_changed(self):
+        self.calls.append("price")
+        if self.calls.count("price") > 1:
+            # 失敗した周期の再試行
+            return []
+        _append(self.stock_path)
+        self.written[self.stock_path] = watch.file_signature(self.stock_path)
+        # 書き込み後に利用者が売上表を保存
+        _append(self.sales_path, b"user edit")
+        if self.fail:
+            raise OSError("売上表に書き込めません")
+        return []
+
+    def on_stock_changed(self):
+        self.calls.append("stock")
+        return []
+
+    def on_sales_changed(self):
+        self.calls.append("sales")
+        self.sales_seen.set()
+        return []
+
+
+def _run(transfer):
+    session = watch.WatchSession(transfer, interval=0.02, debounce=0)
+    session.start()
+    try:
+        assert session.queue.get(timeout=5) == ("ready", None)
+        # 監視の基準を記録するまで待つ
+        time.sleep(0.2)
+        _append(transfer.price_path, b"new price")
+        return transfer.sales_seen.wait(5)
+    finally:
+        session.stop()
+        session._thread.join(5)
+
+
+def test_edit_during_cycle_is_processed_and_own_write_is_not(tmp_path):
+    transfer = _FakeTransfer(tmp_path)
+    assert _run(transfer)
+    assert "stock" not in transfer.calls
+
+
+def test_edit_during_failed_cycle_is_processed(tmp_path):
+    transfer = _FakeTransfer(tmp_path, fail=True)
+    assert _run(transfer)
+    assert "stock" not in transfer.calls
+
+
+def test_reset_with_signature_keeps_later_changes(tmp_path):
+    path = str(tmp_path / "stock.xlsx")
+    _append(path)
+    watcher = watch.PollingWatcher([path], debounce=0)
+    _append(path)
+    written = watch.file_signature(path)
+    _append(path, b"user edit")
+    watcher.reset(path, written)
+    watcher.poll()
+    assert watcher.poll() == [path]
@@ -0,0 +1,150 @@
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import openpyxl
+import pytest
+
+import xlsx_patch
+
+SHEET = "202509"
+CALC_CHAIN_XML = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                  f'<calcChain xmlns="{xlsx_patch.NS_MAIN}"><c r="C2" i="1"/></calcChain>')
+CALC_CHAIN_REL = ('<Relationship Id="rIdCalc" Target="calcChain.xml" '
+                  'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/calcChain"/>')
+CALC_CHAIN_TYPE = ('<Override PartName="/xl/calcChain.xml" '
+                   'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.calcChain+xml"/>')
+
+
+def _rewrite(path, edits, extra=None):
+    """zip のメンバーを edits（パート名 → 文字列変換関数）で書き換え、extra を追加する"""
+    with zipfile.ZipFile(path) as zf:
+        members = [(info, zf.read(info.filename)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for info, data in members:
+            if info.filename in edits:
+                data = edits[info.filename](data.decode("utf-8")).encode("utf-8")
+            zf.writestr(info, data)
+        for name, data in (extra or {}).items():
+            zf.writestr(name, data)
+
+
+def _sheet_part(path):
+    with zipfile.ZipFile(path) as zf:
+        return xlsx_patch.sheet_part_names(zf)[SHEET]
+
+
+def _sheet_xml(path):
+    with zipfile.ZipFile(path) as zf:
+        return zf.read(xlsx_patch.sheet_part_names(zf)[SHEET]).decode("utf-8")
+
+
+def _cells(path):
+    """[(行, [列, ...]), ...] を XML の出現順で返す"""
+    root = ElementTree.fromstring(_sheet_xml(path))
+    rows = []
+    for row in root.iter(f"{{{xlsx_patch.NS_MAIN}}}row"):
+        columns = [xlsx_patch._parse_ref(cell.get("r"))[1] for cell in row.iter(f"{{{xlsx_patch.NS_MAIN}}}c")]
+        rows.append((int(row.get("r")), columns))
+    return rows
+
+
+@pytest.fixture
+def book(tmp_path):
+    """2 行目と 4 行目だけにデータがあり、C2 に数式と calcChain.xml を持つブック"""
+    path = str(tmp_path / "stock.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = SHEET
+    sheet.append(["ID", "単価", "合計"])
+    sheet["A2"], sheet["B2"], sheet["C2"] = "R1", 100, "=B2*2"
+    sheet["A4"], sheet["B4"] = "R3", 300
+    workbook.save(path)
+    _rewrite(path, {
+        "xl/_rels/workbook.xml.rels": lambda xml: xml.replace("</Relationships>", CALC_CHAIN_REL + "</Relationships>"),
+        "[Content_Types].xml": lambda xml: xml.replace("</Types>", CALC_CHAIN_TYPE + "</Types>"),
+    }, {"xl/calcChain.xml": CALC_CHAIN_XML})
+    return path
+
+
+def test_overwrites_existing_cells(book):
+    count = xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 2): 150, (4, 1): "R4", (4, 2): None}})
+    assert count == 3
+    sheet = openpyxl.load_workbook(book)[SHEET]
+    assert [sheet["B2"].value, sheet["A4"].value, sheet["B4"].value] == [150, "R4", None]
+    # 書き換えていないセルはそのまま
+    assert [sheet["A1"].value, sheet["A2"].value, sheet["C2"].value] == ["ID", "R1", "=B2*2"]
+
+
+def test_inserts_new_cells_and_rows_in_order(book):
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: {
+        (3, 2): 200.5, (3, 1): "R2", (2, 5): 1, (2, 4): 2, (4, 3): 3, (1, 4): "備考", (6, 1): "R5",
+    }})
+    assert _cells(book) == [(1, [1, 2, 3, 4]), (2, [1, 2, 3, 4, 5]), (3, [1, 2]), (4, [1, 2, 3]), (6, [1])]
+    sheet = openpyxl.load_workbook(book)[SHEET]
+    assert [cell.value for cell in sheet[3]][:2] == ["R2", 200.5]
+    assert [sheet["D2"].value, sheet["E2"].value, sheet["C4"].value, sheet["D1"].value, sheet["A6"].value] == \
+        [2, 1, 3, "備考", "R5"]
+
+
+def test_overwriting_formula_drops_formula_and_calc_chain(book):
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 3): 200}})
+    sheet = openpyxl.load_workbook(book)[SHEET]
+    assert sheet["C2"].value == 200
+    assert "<f>" not in _sheet_xml(book)
+    with zipfile.ZipFile(book) as zf:
+        assert xlsx_patch.CALC_CHAIN_PART not in zf.namelist()
+        assert "calcChain" not in zf.read(xlsx_patch.WORKBOOK_RELS_PART).decode("utf-8")
+        assert "calcChain" not in zf.read(xlsx_patch.CONTENT_TYPES_PART).decode("utf-8")
+        assert 'fullCalcOnLoad="1"' in zf.read(xlsx_patch.WORKBOOK_PART).decode("utf-8")
+
+
+def test_keeps_calc_chain_when_no_formula_is_overwritten(book):
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 2): 150}})
+    with zipfile.ZipFile(book) as zf:
+        assert zf.read(xlsx_patch.CALC_CHAIN_PART).decode("utf-8") == CALC_CHAIN_XML
+    assert openpyxl.load_workbook(book)[SHEET]["C2"].value == "=B2*2"
+
+
+def test_rejects_shared_formula(book):
+    part = _sheet_part(book)
+    _rewrite(book, {part: lambda xml: re.sub(r"<f>B2\*2</f>", '<f t="shared" ref="C2:C4" si="0">B2*2</f>', xml)})
+    assert 't="shared"' in _sheet_xml(book)
+    with open(book, "rb") as f:
+        before = f.read()
+    with pytest.raises(xlsx_patch.PatchUnsupported):
+        xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 3): 200}})
+    # 元のブックは変わらず、一時ファイルも残らない
+    with open(book, "rb") as f:
+        assert f.read() == before
+    assert not os.path.exists(xlsx_patch.temp_path(book))
+
+
+def test_updates_dimension(book):
+    assert re.search(r'<dimension ref="A1:C4"', _sheet_xml(book))
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 2): 150}})
+    assert re.search(r'<dimension ref="A1:C4"', _sheet_xml(book))
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: {(7, 5): 1}})
+    assert re.search(r'<dimension ref="A1:E7"', _sheet_xml(book))
+    assert openpyxl.load_workbook(book)[SHEET].dimensions == "A1:E7"
+
+
+def test_encodes_strings_inline_and_numbers_as_values(book):
+    values = {(5, 1): "00123", (5, 2): 42, (5, 3): 1.25, (5, 4): True, (5, 5): 'a<b & "c"', (5, 6): "1e3"}
+    xlsx_patch.patch_workbook_in_place(book, {SHEET: values})
+    xml = _sheet_xml(book)
+    assert '<c r="A5" t="inlineStr"><is><t xml:space="preserve">00123</t></is></c>' in xml
+    assert '<c r="B5"><v>42</v></c>' in xml
+    assert '<c r="C5"><v>1.25</v></c>' in xml
+    assert '<c r="D5" t="b"><v>1</v></c>' in xml
+    assert '<t xml:space="preserve">a&lt;b &amp; "c"</t>' in xml
+    sheet = openpyxl.load_workbook(book)[SHEET]
+    assert [cell.value for cell in sheet[5]] == ["00123", 42, 1.25, True, 'a<b & "c"', "1e3"]
+    assert [cell.data_type for cell in sheet[5]] == ["s", "n", "n", "b", "s", "s"]
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), object()])
+def test_rejects_values_that_cannot_be_written(book, value):
+    with pytest.raises(xlsx_patch.PatchUnsupported):
+        xlsx_patch.patch_workbook_in_place(book, {SHEET: {(2, 2): value}})
@@ -0,0 +1,42 @@
+import re
+import zipfile
+
+import pytest
+
+import xlsx_reader
+
+ROWS = 502
+
+
+@pytest.fixture
+def stale_dimension_book(tmp_path):
+    """全 ROWS 行のシートで、dimension が <dimension ref="A1"/> だけのブック"""
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "売上分析表"
+    for row in range(1, ROWS + 1):
+        sheet.cell(row=row, column=1, value=f"ID{row}")
+        sheet.cell(row=row, column=3, value=row)
+    source = tmp_path / "source.xlsx"
+    workbook.save(source)
+    path = tmp_path / "stale.xlsx"
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename.startswith("xl/worksheets/"):
+                data, count = re.subn(rb'<dimension ref="[^"]*"\s*/>', b'<dimension ref="A1"/>', data)
+                assert count == 1
+            dst.writestr(info, data)
+    return str(path)
+
+
+@pytest.mark.parametrize("reader_class", [xlsx_reader.OpenpyxlReader, xlsx_reader.FastReader])
+def test_stale_dimension_reads_all_rows(stale_dimension_book, reader_class):
+    with reader_class(stale_dimension_book) as book:
+        columns = list(book.columns("売上分析表", [1, 3]))
+        rows = list(book.rows("売上分析表"))
+    assert len(columns) == ROWS
+    assert columns[-1] == (ROWS, (f"ID{ROWS}", ROWS))
+    assert len(rows) == ROWS
+    assert rows[-1] == (f"ID{ROWS}", None, ROWS)
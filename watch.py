@@ -0,0 +1,315 @@
+"""単価表・在庫表の監視と差分転記（ウォッチモード）
+
+単価表・在庫表（と書き込み先の売上表）を更新時刻・サイズのポーリングで監視し、
+変更があれば前回の ID→単価 と比較して、単価が変わった ID の行だけを
+在庫表 → 売上表 の順に書き換える。
+
+- OS 固有のファイル通知 API は使わない（os.stat のみ）
+- 更新時刻・サイズが debounce 秒変わらなくなってから処理する（保存途中のファイルを読まない）
+- 自分で書き込んだ後の更新時刻・サイズは基準として記録し、変更として扱わない
+- 書き込みに失敗した場合（Excel で開いている等）は差分を保持して次の周期に再試行する
+- 開始時点のファイル内容を基準にする（開始前の未転記分は通常の転記で反映すること）
+- 1 周期の書き込み（在庫表・売上表）は保存前バックアップの 1 つの実行にまとめる
+"""
+import os
+import queue
+import threading
+import time
+
+import backup_store
+import engine
+import profit_calc
+import run_log
+from journal import same_value
+
+
+def file_signature(path):
+    """(更新時刻 ns, サイズ)。ファイルが無い場合は None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PollingWatcher:
+    """ファイルの更新時刻・サイズを比較し、変化後 debounce 秒安定したものを変更として返す"""
+
+    def __init__(self, paths, debounce: float = 3.0, clock=time.monotonic):
+        self.debounce = debounce
+        self._clock = clock
+        self._baseline = {path: file_signature(path) for path in paths}
+        # 変化を検知したが安定待ちのもの {パス: (署名, 検知時刻)}
+        self._pending = {}
+
+    def reset(self, path, signature=None):
+        """signature（省略時は現在の状態）を基準にする（自分で書き込んだ後に書き込み直後の署名で呼ぶ）"""
+        self._baseline[path] = file_signature(path) if signature is None else signature
+        self._pending.pop(path, None)
+
+    def poll(self):
+        """安定した変更のあったパスのリストを返す（ファイルが消えている間は返さない）"""
+        now = self._clock()
+        changed = []
+        for path, baseline in self._baseline.items():
+            signature = file_signature(path)
+            if signature is None or signature == baseline:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.debounce:
+                self._baseline[path] = signature
+                del self._pending[path]
+                changed.append(path)
+        return changed
+
+
+class IncrementalTransfer:
+    """対象年月の単価表 ID→単価、在庫シートの行、売上表の行を保持し、差分だけを転記する"""
+
+    def __init__(self, price_path, stock_path, sales_path, year_month, positions=None, cache=None):
+        self.price_path = price_path
+        self.stock_path = stock_path
+        self.sales_path = sales_path
+        self.year_month = year_month
+        self.positions = positions or engine.Positions.from_settings()
+        self.cache = cache
+        self.price_index = {}
+        # 在庫シート: {行: [ID, 単価]} と ID→行番号
+        self.stock_sheet = None
+        self.stock_rows = {}
+        self.stock_rows_by_id = {}
+        # 売上表: [(行, [ID, 売上金額, 売上数量, 利益, 利益率]), ...] と ID→位置
+        self.sales_sheet = None
+        self.sales_rows = []
+        self.sales_rows_by_id = {}
+        # 売上表への書き込みに失敗し、再計算が残っている ID
+        self.pending_sales_ids = set()
+        # 読み込み・書き込み時点の署名（他で書き換えられていないかの確認用）
+        self._signatures = {}
+        # 保存前バックアップの実行ID（WatchSession が周期ごとに設定。None なら書き込みごとに新しい実行）
+        self.backup_run = None
+        # 自分で書き込んだファイルと書き込み直後の署名 {パス: 署名}（WatchSession が基準の更新に使う）
+        self.written = {}
+
+    # --- 状態の読み込み ---
+    def prime(self):
+        """3 ファイルを読み込んで基準にする"""
+        self.price_index = engine.PriceTable(self.price_path, self.positions, self.cache).month_prices(self.year_month)
+        self.reload_stock()
+        self.reload_sales()
+
+    def reload_stock(self):
+        sheets = engine.read_stock_sheets(self.stock_path, [self.year_month], self.positions)
+        if self.year_month not in sheets:
+            raise engine.TransferError(f"{self.year_month}の在庫シートが見つかりません")
+        self.stock_sheet, rows = sheets[self.year_month]
+        self.stock_rows = {row: [id, price] for row, id, price in rows}
+        self.stock_rows_by_id = {}
+        for row, id, _ in rows:
+            if id is not None and row >= self.positions.data_start_row_in_stock:
+                self.stock_rows_by_id.setdefault(id, []).append(row)
+        self._signatures[self.stock_path] = file_signature(self.stock_path)
+
+    def reload_sales(self):
+        self.sales_sheet, rows = engine.read_sales_rows(self.sales_path, self.positions)
+        self.sales_rows = [(row, list(values)) for row, values in rows]
+        self.sales_rows_by_id = {}
+        for index, (_, values) in enumerate(self.sales_rows):
+            if values[0] is not None:
+                self.sales_rows_by_id.setdefault(values[0], []).append(index)
+        self._signatures[self.sales_path] = file_signature(self.sales_path)
+
+    def stock_index(self, ids=None):
+        """在庫シートの ID→単価（engine.read_stock_prices と同じく後の行が優先）。ids で対象を絞れる"""
+        id_price_dict = {}
+        for row, (id, price) in self.stock_rows.items():
+            if row >= self.positions.data_start_row_in_stock and id and price and (ids is None or id in ids):
+                id_price_dict[id] = price
+        return id_price_dict
+
+    def _ensure_current(self, path, reload):
+        """前回の読み込み・書き込み後に他で更新されていれば読み直す"""
+        if file_signature(path) != self._signatures.get(path):
+            reload()
+
+    # --- 差分転記 ---
+    def on_price_changed(self):
+        """単価表の変更を反映。書き込んだ結果の TransferResult のリストを返す"""
+        new_index = engine.PriceTable(self.price_path, self.positions, self.cache).month_prices(self.year_month)
+        changed = {id: price for id, price in new_index.items()
+                   if not same_value(self.price_index.get(id), price)}
+        results = []
+        if changed:
+            results += self._apply_stock(changed)
+        # 書き込みに成功してから基準を更新（失敗時は次回同じ差分を再適用）
+        self.price_index = new_index
+        return results
+
+    def on_stock_changed(self):
+        """在庫表が他で更新された場合、単価が変わった ID の売上行を再計算"""
+        before = self.stock_index()
+        self.reload_stock()
+        after = self.stock_index()
+        changed_ids = {id for id in set(before) | set(after) if not same_value(before.get(id), after.get(id))}
+        return self._apply_sales(changed_ids)
+
+    def on_sales_changed(self):
+        """売上表が他で更新された場合は行を読み直すだけ（行位置がずれている可能性がある）"""
+        self.reload_sales()
+        return []
+
+    def _apply_stock(self, changed_prices):
+        self._ensure_current(self.stock_path, self.reload_stock)
+        result = engine.TransferResult("stock", self.year_month, self.stock_path)
+        price_col = self.positions.price_column_in_stock
+        before = self.stock_index(changed_prices)
+        changes = {}
+        for id, price in changed_prices.items():
+            for row in self.stock_rows_by_id.get(id, ()):
+                result.scanned += 1
+                if result.journal.record(self.stock_sheet, row, id, price_col, self.stock_rows[row][1], price):
+                    changes[(row, price_col)] = price
+        result.updated = len(changes)
+        result.unchanged = result.journal.unchanged
+        if not changes:
+            return self._apply_sales(set())
+        with engine._phase(result, "save"):
+            result.cells_written = engine.write_cells(self.stock_path, {self.stock_sheet: changes}, "在庫",
+                                                      self.backup_run, backup_store.ORIGIN_WATCH)
+        for (row, _), price in changes.items():
+            self.stock_rows[row][1] = price
+        self._signatures[self.stock_path] = self.written[self.stock_path] = file_signature(self.stock_path)
+
+        after = self.stock_index(changed_prices)
+        changed_ids = {id for id in changed_prices if not same_value(before.get(id), after.get(id))}
+        return [result] + self._apply_sales(changed_ids)
+
+    def _apply_sales(self, changed_ids):
+        # 前回書き込めなかった ID も合わせて再計算（成功するまで保持）
+        changed_ids = self.pending_sales_ids = self.pending_sales_ids | set(changed_ids)
+        if not changed_ids:
+            return []
+        self._ensure_current(self.sales_path, self.reload_sales)
+        indexes = sorted(index for id in changed_ids for index in self.sales_rows_by_id.get(id, ()))
+        if not indexes:
+            self.pending_sales_ids = set()
+            return []
+        result = engine.TransferResult("sales", self.year_month, self.sales_path)
+        result.scanned = len(indexes)
+        subset = [self.sales_rows[index] for index in indexes]
+        calc = profit_calc.compute(
+            [values[0] for _, values in subset], [values[1] for _, values in subset],
+            [values[2] for _, values in subset], self.stock_index(changed_ids))
+        profit_col, profit_rate_col = self.positions.profit_column_in_sales, self.positions.profit_rate_column_in_sales
+        changes = {}
+        for position, profit, profit_rate in calc.rows():
+            row, values = subset[position]
+            changed = False
+            if result.journal.record(self.sales_sheet, row, values[0], profit_col, values[3], profit):
+                changes[(row, profit_col)] = profit
+                changed = True
+            if result.journal.record(self.sales_sheet, row, values[0], profit_rate_col, values[4], profit_rate):
+                changes[(row, profit_rate_col)] = profit_rate
+                changed = True
+            if changed:
+                result.updated += 1
+        for position, reason in calc.errors:
+            row, values = subset[position]
+            result.errors.append(f"行 {row} でデータ変換エラー: {reason}"
+                                 f"（売上金額={values[1]!r}, 売上数量={values[2]!r}）")
+        result.unchanged = result.journal.unchanged
+        if not changes:
+            self.pending_sales_ids = set()
+            return []
+        with engine._phase(result, "save"):
+            result.cells_written = engine.write_cells(self.sales_path, {self.sales_sheet: changes}, "売上",
+                                                      self.backup_run, backup_store.ORIGIN_WATCH)
+        for position, profit, profit_rate in calc.rows():
+            values = subset[position][1]
+            values[3], values[4] = profit, profit_rate
+        self._signatures[self.sales_path] = self.written[self.sales_path] = file_signature(self.sales_path)
+        self.pending_sales_ids = set()
+        return [result]
+
+
+class WatchSession:
+    """IncrementalTransfer を別スレッドで周期実行する（UI 非依存）。
+
+    キューには以下のタプルが入る:
+        ("ready", None)          開始時の読み込み完了
+        ("applied", [TransferResult, ...])
+        ("error", Exception)     読み込み・書き込みの失敗（監視は継続し、次の周期に再試行）
+        ("stopped", None)
+    """
+
+    def __init__(self, transfer: IncrementalTransfer, interval: float = 2.0, debounce: float = 3.0):
+        self.transfer = transfer
+        self.interval = interval
+        self.debounce = debounce
+        self.queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="WatchSession", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self):
+        transfer = self.transfer
+        try:
+            transfer.prime()
+        except Exception as e:
+            self.queue.put(("error", e))
+            self.queue.put(("stopped", None))
+            return
+        self.queue.put(("ready", None))
+        handlers = {
+            transfer.price_path: transfer.on_price_changed,
+            transfer.stock_path: transfer.on_stock_changed,
+            transfer.sales_path: transfer.on_sales_changed,
+        }
+        watcher = PollingWatcher(handlers, self.debounce)
+        retry = []
+        while not self._stop.wait(self.interval):
+            # 売上表 → 在庫表 → 単価表 の順に処理（書き込み先の状態を先に最新にする）
+            changed = set(watcher.poll()) | set(retry)
+            retry = []
+            transfer.backup_run = backup_store.new_run_id()
+            for path in (transfer.sales_path, transfer.stock_path, transfer.price_path):
+                if path not in changed:
+                    continue
+                transfer.written = {}
+                try:
+                    results = handlers[path]()
+                except Exception as e:
+                    retry.append(path)
+                    self.queue.put(("error", e))
+                    continue
+                finally:
+                    # 自分の書き込みによる更新は変更として扱わない。書き込み直後の署名を基準にするため、
+                    # 書き込んでいないファイルや書き込み後に他で更新された分は次の周期に変更として検知する
+                    # （例外でも在庫表を書き込み済みなら在庫表だけ基準を更新する）
+                    for written_path, signature in transfer.written.items():
+                        watcher.reset(written_path, signature)
+                if results:
+                    for result in results:
+                        run_log.log_result(f"watch_{result.kind}", result)
+                    self.queue.put(("applied", results))
+        self.queue.put(("stopped", None))
+
+    def poll(self):
+        """溜まっているメッセージをすべて取り出して返す（ブロックしない）"""
+        messages = []
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                return messages
@@ -0,0 +1,108 @@
+"""転記処理をバックグラウンドスレッドで実行する補助（UI 非依存）
+
+GUI は `TransferWorker.poll()` を after() で定期的に呼び出し、
+キュー経由で進捗・結果を受け取る（Tk ウィジェットはメインスレッドからのみ操作する）。
+"""
+import queue
+import threading
+import time
+
+import engine
+
+
+class ProgressThrottle:
+    """進捗通知を時間で間引き、残り時間(ETA)を付けて sink へ転送する。
+
+    sink(done, total, message, eta) の eta は秒数（算出できない場合は None）。
+    メッセージが変わった時点（フェーズ切替）と完了時は間引かずに通知する。
+    """
+
+    def __init__(self, sink, interval: float = 0.1, clock=time.monotonic):
+        self._sink = sink
+        self._interval = interval
+        self._clock = clock
+        self._message = None
+        self._phase_start = 0.0
+        self._last = 0.0
+
+    def __call__(self, done, total, message):
+        now = self._clock()
+        phase_changed = message != self._message
+        if phase_changed:
+            self._message = message
+            self._phase_start = now
+        finished = total and done >= total
+        if not phase_changed and not finished and now - self._last < self._interval:
+            return
+        self._last = now
+        eta = None
+        if total and done:
+            eta = (now - self._phase_start) / done * (total - done)
+        self._sink(done, total, message, eta)
+
+
+def format_eta(eta):
+    """ETA 秒数を表示用文字列に変換"""
+    if eta is None:
+        return ""
+    eta = int(round(eta))
+    if eta >= 60:
+        return f"残り約{eta // 60}分{eta % 60:02}秒"
+    return f"残り約{eta}秒"
+
+
+class TransferWorker:
+    """engine の転記関数を別スレッドで実行する。
+
+    job は job(progress=..., cancel=...) で呼び出せる callable（functools.partial 等）。
+    キューには以下のタプルが入る:
+        ("progress", done, total, message, eta)
+        ("done", TransferResult)
+        ("cancelled", None)
+        ("error", Exception)
+    """
+
+    def __init__(self, job, progress_interval: float = 0.1):
+        self._job = job
+        self._progress_interval = progress_interval
+        self._cancel = threading.Event()
+        self.queue = queue.Queue()
+        # 終了時に保存途中のまま打ち切られないよう daemon にはしない
+        self._thread = threading.Thread(target=self._run, name="TransferWorker")
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """キャンセル要求（保存開始後は無効。保存はそのまま完了する）"""
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self):
+        progress = ProgressThrottle(
+            lambda done, total, message, eta: self.queue.put(("progress", done, total, message, eta)),
+            interval=self._progress_interval,
+        )
+        try:
+            result = self._job(progress=progress, cancel=self._cancel)
+        except engine.TransferCancelled:
+            self.queue.put(("cancelled", None))
+        except Exception as e:
+            self.queue.put(("error", e))
+        else:
+            self.queue.put(("done", result))
+
+    def poll(self):
+        """溜まっているメッセージをすべて取り出して返す（ブロックしない）"""
+        messages = []
+        while True:
+            try:
+                messages.append(self.queue.get_nowait())
+            except queue.Empty:
+                return messages
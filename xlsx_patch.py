@@ -0,0 +1,398 @@
+"""xlsx の部分書き換え（対象ワークシート XML のセルだけを書き換える）
+
+openpyxl の load/save は全シート・全スタイルを読み直して書き出すため遅く、
+openpyxl が扱えない要素は失われる。ここでは zip 内の対象シート XML だけを
+文字列レベルで書き換え、他のメンバーは圧縮済みバイト列のまま複写する。
+
+- 書き換えたセル以外の数式・書式・図形などはそのまま残る
+- 数式セルを値で上書きした場合は calcChain.xml を削除（Excel が開く際に再構築）
+- workbook.xml に fullCalcOnLoad を立て、Excel で開いた時に数式を再計算させる
+- 共有数式の親セル・配列数式などを上書きする場合は PatchUnsupported を送出する
+  （呼び出し側で openpyxl による保存にフォールバックする）
+"""
+import os
+import posixpath
+import re
+import struct
+import zipfile
+import zlib
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELS_PART = "xl/_rels/workbook.xml.rels"
+CALC_CHAIN_PART = "xl/calcChain.xml"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+
+_ATTR_RE = re.compile(r"""([\w:]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_CELL_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+
+
+class PatchUnsupported(Exception):
+    """部分書き換えでは安全に扱えないブック・セル"""
+
+
+# --- セル番地 ---
+def column_letter(column: int) -> str:
+    letters = ""
+    while column > 0:
+        column, rem = divmod(column - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def _parse_ref(ref):
+    m = _CELL_REF_RE.fullmatch(ref.replace("$", ""))
+    if not m:
+        raise PatchUnsupported(f"セル番地を解釈できません: {ref}")
+    return int(m.group(2)), column_index(m.group(1))
+
+
+# --- ブック構造 ---
+def sheet_part_names(zf: zipfile.ZipFile):
+    """シート名 → ワークシート XML のパート名（例: xl/worksheets/sheet1.xml）"""
+    workbook = ElementTree.fromstring(zf.read(WORKBOOK_PART))
+    rels = ElementTree.fromstring(zf.read(WORKBOOK_RELS_PART))
+    targets = {}
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            part = target.lstrip("/")
+        else:
+            part = posixpath.normpath(posixpath.join(posixpath.dirname(WORKBOOK_PART), target))
+        targets[rel.get("Id")] = part
+    parts = {}
+    for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+        parts[sheet.get("name")] = targets.get(sheet.get(f"{{{NS_REL}}}id"))
+    return parts
+
+
+# --- セル XML ---
+def _attrs(text):
+    return {name: double or single for name, double, single in _ATTR_RE.findall(text)}
+
+
+def _render_attrs(attrs):
+    return "".join(f' {k}="{v.replace(chr(34), "&quot;")}"' for k, v in attrs.items())
+
+
+def _render_cell(prefix, ref, old_attrs, value):
+    """値から <c> 要素を生成（スタイル s 等は元セルから引き継ぐ）"""
+    attrs = {"r": ref}
+    for key, val in old_attrs.items():
+        # 型・値メタデータは値と一緒に置き換える
+        if key not in ("r", "t", "cm", "vm"):
+            attrs[key] = val
+    if value is None:
+        return f"<{prefix}c{_render_attrs(attrs)}/>"
+    if isinstance(value, bool):
+        attrs["t"] = "b"
+        body = f"<{prefix}v>{int(value)}</{prefix}v>"
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and (value != value or value in (float("inf"), float("-inf"))):
+            raise PatchUnsupported(f"{ref}: 数値として書き込めない値です: {value}")
+        body = f"<{prefix}v>{value!r}</{prefix}v>"
+    elif isinstance(value, str):
+        attrs["t"] = "inlineStr"
+        body = f'<{prefix}is><{prefix}t xml:space="preserve">{escape(value)}</{prefix}t></{prefix}is>'
+    else:
+        raise PatchUnsupported(f"{ref}: 未対応の値の型です: {type(value).__name__}")
+    return f"<{prefix}c{_render_attrs(attrs)}>{body}</{prefix}c>"
+
+
+class _SheetPatcher:
+    """1 シート分の XML 書き換え"""
+
+    def __init__(self, xml: str):
+        m = re.search(r"<(\w+:)?sheetData\b", xml)
+        if not m:
+            raise PatchUnsupported("sheetData が見つかりません")
+        self.xml = xml
+        self.prefix = m.group(1) or ""
+        p = re.escape(self.prefix)
+        self._row_re = re.compile(rf"<{p}row\b([^>]*?)(/>|>(.*?)</{p}row>)", re.S)
+        self._cell_re = re.compile(rf"<{p}c\b([^>]*?)(/>|>(.*?)</{p}c>)", re.S)
+        self._formula_re = re.compile(rf"<{p}f\b([^>]*?)(/>|>)", re.S)
+        self.replaced_formula = False
+
+    def apply(self, cells):
+        """cells: {(row, column): value} を反映した XML を返す"""
+        by_row = {}
+        for (row, column), value in cells.items():
+            by_row.setdefault(row, {})[column] = value
+        prefix = self.prefix
+        p = re.escape(prefix)
+        m = re.search(rf"<{p}sheetData\s*/>", self.xml)
+        if m:
+            xml = self.xml[:m.start()] + f"<{prefix}sheetData></{prefix}sheetData>" + self.xml[m.end():]
+        else:
+            xml = self.xml
+        start = re.search(rf"<{p}sheetData\b[^>]*>", xml).end()
+        end = xml.index(f"</{prefix}sheetData>", start)
+        data = xml[start:end]
+
+        pieces = []
+        pos = 0
+        row_num = 0
+        pending = sorted(by_row)
+        for m in self._row_re.finditer(data):
+            attrs = _attrs(m.group(1))
+            row_num = int(attrs["r"]) if "r" in attrs else row_num + 1
+            # 既存行より前に来る新規行を挿入
+            while pending and pending[0] < row_num:
+                new_row = pending.pop(0)
+                pieces.append(data[pos:m.start()])
+                pos = m.start()
+                pieces.append(self._render_new_row(new_row, by_row[new_row]))
+            if pending and pending[0] == row_num:
+                pending.pop(0)
+                pieces.append(data[pos:m.start()])
+                pieces.append(self._patch_row(row_num, attrs, m.group(3) or "", by_row[row_num]))
+                pos = m.end()
+        pieces.append(data[pos:])
+        for new_row in pending:
+            pieces.append(self._render_new_row(new_row, by_row[new_row]))
+        xml = xml[:start] + "".join(pieces) + xml[end:]
+        return self._update_dimension(xml, cells)
+
+    def _render_new_row(self, row_num, values):
+        cells = "".join(
+            _render_cell(self.prefix, f"{column_letter(col)}{row_num}", {}, value)
+            for col, value in sorted(values.items())
+        )
+        return f'<{self.prefix}row r="{row_num}">{cells}</{self.prefix}row>'
+
+    def _patch_row(self, row_num, row_attrs, inner, values):
+        cells = []
+        col = 0
+        last_end = 0
+        for m in self._cell_re.finditer(inner):
+            attrs = _attrs(m.group(1))
+            if "r" in attrs:
+                _, col = _parse_ref(attrs["r"])
+            else:
+                col += 1
+            cells.append([col, attrs, m.group(0), m.group(3) or ""])
+            last_end = m.end()
+        tail = inner[last_end:]
+
+        existing = {cell[0]: cell for cell in cells}
+        for col, value in values.items():
+            ref = f"{column_letter(col)}{row_num}"
+            if col in existing:
+                cell = existing[col]
+                self._check_formula(ref, cell[3])
+                cell[2] = _render_cell(self.prefix, ref, cell[1], value)
+            else:
+                cells.append([col, {}, _render_cell(self.prefix, ref, {}, value), ""])
+                # spans は最適化用のヒントなので範囲外のセルを追加したら外す
+                row_attrs.pop("spans", None)
+        cells.sort(key=lambda cell: cell[0])
+        body = "".join(cell[2] for cell in cells) + tail
+        return f"<{self.prefix}row{_render_attrs(row_attrs)}>{body}</{self.prefix}row>"
+
+    def _check_formula(self, ref, inner):
+        m = self._formula_re.search(inner)
+        if not m:
+            return
+        attrs = _attrs(m.group(1))
+        kind = attrs.get("t", "normal")
+        if kind in ("array", "dataTable") or (kind == "shared" and "ref" in attrs):
+            raise PatchUnsupported(f"{ref}: 共有数式・配列数式のセルは部分書き換えできません")
+        self.replaced_formula = True
+
+    def _update_dimension(self, xml, cells):
+        p = re.escape(self.prefix)
+        m = re.search(rf'<{p}dimension\b[^>]*\bref="([^"]*)"', xml)
+        if not m or not cells:
+            return xml
+        refs = m.group(1).split(":")
+        try:
+            (r1, c1), (r2, c2) = _parse_ref(refs[0]), _parse_ref(refs[-1])
+        except PatchUnsupported:
+            return xml
+        rows = [row for row, _ in cells]
+        cols = [col for _, col in cells]
+        r1, c1 = min(r1, *rows), min(c1, *cols)
+        r2, c2 = max(r2, *rows), max(c2, *cols)
+        new_ref = f"{column_letter(c1)}{r1}:{column_letter(c2)}{r2}"
+        return xml[:m.start(1)] + new_ref + xml[m.end(1):]
+
+
+def _set_full_calc_on_load(xml: str) -> str:
+    """workbook.xml の calcPr に fullCalcOnLoad="1" を設定"""
+    m = re.search(r"<(\w+:)?calcPr\b([^>]*?)(/?)>", xml)
+    if m:
+        prefix, attrs_text, close = m.group(1) or "", m.group(2), m.group(3)
+        attrs = _attrs(attrs_text)
+        attrs["fullCalcOnLoad"] = "1"
+        return xml[:m.start()] + f"<{prefix}calcPr{_render_attrs(attrs)}{close}>" + xml[m.end():]
+    m = re.search(r"<(\w+:)?workbook\b", xml)
+    prefix = (m.group(1) or "") if m else ""
+    for follower in ("oleSize", "customWorkbookViews", "pivotCaches", "smartTagPr", "smartTagTypes",
+                     "webPublishing", "fileRecoveryPr", "webPublishObjects", "extLst"):
+        idx = xml.find(f"<{prefix}{follower}")
+        if idx >= 0:
+            break
+    else:
+        idx = xml.rindex(f"</{prefix}workbook>")
+    return xml[:idx] + f'<{prefix}calcPr fullCalcOnLoad="1"/>' + xml[idx:]
+
+
+def _drop_calc_chain_refs(rels_xml: str, content_types_xml: str):
+    rels_xml = re.sub(r"<Relationship\b[^>]*calcChain[^>]*/>", "", rels_xml)
+    content_types_xml = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', "", content_types_xml)
+    return rels_xml, content_types_xml
+
+
+def _read_utf8(zf, part):
+    """zip 内の XML パートを文字列で取得（UTF-8 以外は未対応）"""
+    raw = zf.read(part)
+    m = re.match(rb'\s*<\?xml[^>]*encoding\s*=\s*["\']([^"\']+)', raw)
+    if m and m.group(1).upper().replace(b"-", b"") != b"UTF8":
+        raise PatchUnsupported(f"UTF-8 以外の XML です: {part}")
+    return raw.decode("utf-8-sig")
+
+
+# --- zip 書き出し（未変更メンバーは圧縮済みバイト列のまま複写） ---
+class _RawZipWriter:
+    def __init__(self, fp):
+        self.fp = fp
+        self.entries = []
+
+    @staticmethod
+    def _dos_time(date_time):
+        year, month, day, hour, minute, second = date_time
+        if year < 1980:
+            return 0, (1 << 5) | 1
+        return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+    def _write_entry(self, info, name_bytes, flags, method, crc, csize, usize, payload_chunks):
+        if csize >= 0xFFFFFFFF or usize >= 0xFFFFFFFF or self.fp.tell() >= 0xFFFFFFFF:
+            raise PatchUnsupported("ZIP64 形式のブックは部分書き換えできません")
+        offset = self.fp.tell()
+        dos_time, dos_date = self._dos_time(info.date_time)
+        self.fp.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, method, dos_time, dos_date,
+                                  crc, csize, usize, len(name_bytes), 0))
+        self.fp.write(name_bytes)
+        for chunk in payload_chunks:
+            self.fp.write(chunk)
+        self.entries.append((info, name_bytes, flags, method, dos_time, dos_date, crc, csize, usize, offset))
+
+    def copy_raw(self, src_fp, info):
+        """src の圧縮済みデータをそのまま書き込む"""
+        src_fp.seek(info.header_offset)
+        header = src_fp.read(30)
+        if header[:4] != b"PK\x03\x04":
+            raise PatchUnsupported(f"zip ヘッダーが不正です: {info.filename}")
+        name_len, extra_len = struct.unpack("<HH", header[26:30])
+        src_fp.seek(info.header_offset + 30 + name_len + extra_len)
+        flags = info.flag_bits & ~0x08  # サイズはローカルヘッダーに書くのでデータディスクリプタ不要
+
+        def chunks(remaining=info.compress_size):
+            while remaining > 0:
+                chunk = src_fp.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    raise PatchUnsupported(f"zip データが途中で終わっています: {info.filename}")
+                remaining -= len(chunk)
+                yield chunk
+
+        self._write_entry(info, self._name_bytes(info), flags, info.compress_type,
+                          info.CRC, info.compress_size, info.file_size, chunks())
+
+    def write_bytes(self, info, data: bytes):
+        """data を deflate 圧縮して書き込む"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        flags = info.flag_bits & 0x800
+        self._write_entry(info, self._name_bytes(info), flags, zipfile.ZIP_DEFLATED,
+                          zlib.crc32(data) & 0xFFFFFFFF, len(compressed), len(data), [compressed])
+
+    @staticmethod
+    def _name_bytes(info):
+        return info.filename.encode("utf-8" if info.flag_bits & 0x800 else "cp437")
+
+    def close(self):
+        cd_offset = self.fp.tell()
+        for info, name_bytes, flags, method, dos_time, dos_date, crc, csize, usize, offset in self.entries:
+            self.fp.write(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, method, dos_time, dos_date,
+                                      crc, csize, usize, len(name_bytes), 0, 0, 0, info.internal_attr,
+                                      info.external_attr, offset))
+            self.fp.write(name_bytes)
+        cd_size = self.fp.tell() - cd_offset
+        count = len(self.entries)
+        if count >= 0xFFFF:
+            raise PatchUnsupported("zip メンバー数が多すぎます")
+        self.fp.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def patch_workbook(src_path, dst_path, changes):
+    """src_path のブックの指定セルだけを書き換えて dst_path に書き出す。
+
+    changes: {シート名: {(行, 列): 値}}（値は数値・文字列・bool・None）
+    src_path と dst_path は別ファイルであること（置き換えは呼び出し側で行う）。
+    戻り値: 書き換えたセル数
+    """
+    changes = {name: cells for name, cells in changes.items() if cells}
+    with zipfile.ZipFile(src_path) as zf:
+        parts = sheet_part_names(zf)
+        new_parts = {}
+        replaced_formula = False
+        for sheet_name, cells in changes.items():
+            part = parts.get(sheet_name)
+            if not part:
+                raise PatchUnsupported(f"シートが見つかりません: {sheet_name}")
+            patcher = _SheetPatcher(_read_utf8(zf, part))
+            new_parts[part] = patcher.apply(cells).encode("utf-8")
+            replaced_formula = replaced_formula or patcher.replaced_formula
+
+        if changes:
+            new_parts[WORKBOOK_PART] = _set_full_calc_on_load(_read_utf8(zf, WORKBOOK_PART)).encode("utf-8")
+        names = set(zf.namelist())
+        drop = set()
+        if replaced_formula and CALC_CHAIN_PART in names:
+            drop.add(CALC_CHAIN_PART)
+            rels, content_types = _drop_calc_chain_refs(
+                _read_utf8(zf, WORKBOOK_RELS_PART), _read_utf8(zf, CONTENT_TYPES_PART))
+            new_parts[WORKBOOK_RELS_PART] = rels.encode("utf-8")
+            new_parts[CONTENT_TYPES_PART] = content_types.encode("utf-8")
+
+        with open(src_path, "rb") as src_fp, open(dst_path, "wb") as dst_fp:
+            writer = _RawZipWriter(dst_fp)
+            for info in zf.infolist():
+                if info.filename in drop:
+                    continue
+                if info.filename in new_parts:
+                    writer.write_bytes(info, new_parts[info.filename])
+                else:
+                    writer.copy_raw(src_fp, info)
+            writer.close()
+    return sum(len(cells) for cells in changes.values())
+
+
+def temp_path(path):
+    """path を置き換えるための同じフォルダの一時ファイル名（os.replace が同じドライブ内で行えるように）"""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), f".~{os.path.basename(path)}.tmp")
+
+
+def patch_workbook_in_place(path, changes):
+    """patch_workbook で同じフォルダの一時ファイルに書き出してから元ファイルを置き換える"""
+    tmp_path = temp_path(path)
+    try:
+        count = patch_workbook(path, tmp_path, changes)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
@@ -0,0 +1,403 @@
+"""ブックの読み込みバックエンド
+
+転記で必要な読み込み（シート名の一覧・作業中のシート・上部の行・指定列の値）だけの
+小さなインターフェースで、次の 2 つの実装を切り替える（READER_BACKEND）。
+
+- openpyxl: これまでどおり openpyxl の read-only ブックで読む
+- fast: zip 内のワークシート XML を iterparse で順に読み、必要な列のセルだけを値に変換する。
+  共有文字列（sharedStrings.xml）は文字列のセルを初めて読む時点で、必要な番号まで読み進める。
+  セルオブジェクトを作らず、必要な行を読み終えた時点で XML の解析を打ち切る
+
+値は openpyxl（data_only）と同じ型で返す（数値は int / float、日付書式の数値は datetime、
+エラー値は "#N/A" などの文字列）。fast で扱えないブック・セル（日付型のセル、時間の長さの書式、
+範囲外の日付など）は ReaderUnsupported を送出し、呼び出し側で openpyxl で読み直す。
+"""
+import datetime
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import xlsx_patch
+
+BACKENDS = ("fast", "openpyxl")
+
+NS_MAIN = xlsx_patch.NS_MAIN
+NS_REL = xlsx_patch.NS_REL
+NS_PKG_REL = xlsx_patch.NS_PKG_REL
+SHARED_STRINGS_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"
+STYLES_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+
+_ROW = f"{{{NS_MAIN}}}row"
+_CELL = f"{{{NS_MAIN}}}c"
+_VALUE = f"{{{NS_MAIN}}}v"
+_INLINE = f"{{{NS_MAIN}}}is"
+_TEXT = f"{{{NS_MAIN}}}t"
+_RUN = f"{{{NS_MAIN}}}r"
+_SI = f"{{{NS_MAIN}}}si"
+_DIMENSION = f"{{{NS_MAIN}}}dimension"
+_SHEET_DATA = f"{{{NS_MAIN}}}sheetData"
+
+# 日付とみなす組み込みの表示形式（openpyxl の組み込み表示形式と同じ範囲）と、時間の長さの形式
+_BUILTIN_DATE_FORMATS = frozenset(range(14, 23)) | {45, 46, 47}
+_BUILTIN_TIMEDELTA_FORMATS = frozenset({46})
+_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_DATE_CODE_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_TIMEDELTA_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+_WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+_MAC_EPOCH = datetime.datetime(1904, 1, 1)
+_DIGITS = "0123456789"
+
+
+class ReaderUnsupported(Exception):
+    """fast バックエンドでは openpyxl と同じ値で読めないブック・セル"""
+
+
+class OpenpyxlReader:
+    """openpyxl の read-only・data_only ブック"""
+
+    name = "openpyxl"
+
+    def __init__(self, path):
+        import openpyxl
+        self._workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+    @property
+    def sheetnames(self):
+        return self._workbook.sheetnames
+
+    @property
+    def active(self):
+        """作業中のシート名"""
+        return self._workbook.active.title
+
+    def _sheet(self, sheetname):
+        """read-only のシート。dimension が古い・"A1" だけのブックで行・列が欠けないよう、
+        dimension を捨てて実際の行を最後まで読む"""
+        sheet = self._workbook[sheetname]
+        sheet.reset_dimensions()
+        return sheet
+
+    def rows(self, sheetname, min_row=1, max_row=None):
+        """min_row〜max_row 行目の値タプルを順に返す"""
+        for values in self._sheet(sheetname).iter_rows(min_row=min_row, max_row=max_row, values_only=True):
+            yield tuple(values)
+
+    def columns(self, sheetname, columns, min_row=1):
+        """指定列だけを (行番号, (列の値, ...)) で順に返す"""
+        min_col, max_col = min(columns), max(columns)
+        offsets = [column - min_col for column in columns]
+        rows = self._sheet(sheetname).iter_rows(min_row=min_row, min_col=min_col, max_col=max_col,
+                                                   values_only=True)
+        for row_num, values in enumerate(rows, start=min_row):
+            yield row_num, tuple(values[offset] if offset < len(values) else None for offset in offsets)
+
+    def close(self):
+        self._workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _text_content(element):
+    """共有文字列・インライン文字列の本文（ふりがな rPh は含めない）"""
+    parts = []
+    for child in element:
+        if child.tag == _TEXT:
+            parts.append(child.text or "")
+        elif child.tag == _RUN:
+            text = child.find(_TEXT)
+            if text is not None:
+                parts.append(text.text or "")
+    return "".join(parts).replace("x005F_", "")
+
+
+class _SharedStrings:
+    """sharedStrings.xml を必要な番号まで読み進める共有文字列表"""
+
+    def __init__(self, archive, part):
+        self._archive = archive
+        self._part = part
+        self._strings = []
+        self._source = None
+        self._events = None
+
+    def __getitem__(self, index):
+        strings = self._strings
+        if index >= len(strings):
+            self._read_until(index)
+        return strings[index]
+
+    def _read_until(self, index):
+        if self._events is None:
+            if self._part is None:
+                raise ReaderUnsupported("共有文字列がありません")
+            self._source = self._archive.open(self._part)
+            self._events = ElementTree.iterparse(self._source, events=("end",))
+        for _, element in self._events:
+            if element.tag == _SI:
+                self._strings.append(_text_content(element))
+                element.clear()
+                if index < len(self._strings):
+                    return
+        raise ReaderUnsupported(f"共有文字列の番号が範囲外です: {index}")
+
+    def close(self):
+        if self._source is not None:
+            self._source.close()
+
+
+def _is_date_format(code):
+    code = _FORMAT_STRIP_RE.sub("", code.split(";")[0])
+    return _DATE_CODE_RE.search(code) is not None
+
+
+def _relationship_targets(archive, rels_part, base):
+    """{rId: (種類, パート名)}"""
+    targets = {}
+    rels = ElementTree.fromstring(archive.read(rels_part))
+    for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        target = rel.get("Target", "")
+        part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(
+            posixpath.join(posixpath.dirname(base), target))
+        targets[rel.get("Id")] = (rel.get("Type"), part)
+    return targets
+
+
+def _column_of(ref, _cache={}):
+    """セル番地（"AB12"）の列番号"""
+    letters = ref.rstrip(_DIGITS)
+    column = _cache.get(letters)
+    if column is None:
+        column = _cache[letters] = xlsx_patch.column_index(letters.replace("$", ""))
+    return column
+
+
+def _dimension_end(ref):
+    """dimension の ref（"A1:J37"）から (最終列, 最終行)。解釈できなければ (None, None)"""
+    end = (ref or "").split(":")[-1].replace("$", "")
+    letters = end.rstrip(_DIGITS)
+    if not letters or letters == end or not letters.isalpha():
+        return None, None
+    return xlsx_patch.column_index(letters.upper()), int(end[len(letters):])
+
+
+def _first(parser):
+    """_parse が最初に返す dimension（sheetData の無いシートは (None, None)）"""
+    try:
+        return next(parser)
+    except StopIteration:
+        return None, None
+    except (ElementTree.ParseError, KeyError, ValueError) as e:
+        raise ReaderUnsupported(f"ワークシートを解析できません: {e}") from e
+
+
+def _cast_number(text):
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+class FastReader:
+    """ワークシート XML を iterparse で読む。必要な列・行だけを値に変換する"""
+
+    name = "fast"
+
+    def __init__(self, path):
+        try:
+            self._archive = zipfile.ZipFile(path)
+        except zipfile.BadZipFile as e:
+            raise ReaderUnsupported(f"xlsx ではありません: {e}") from e
+        try:
+            self._open_workbook()
+        except (KeyError, ValueError, ElementTree.ParseError) as e:
+            self._archive.close()
+            raise ReaderUnsupported(f"ブックの構造を解析できません: {e}") from e
+
+    def _open_workbook(self):
+        archive = self._archive
+        workbook = ElementTree.fromstring(archive.read(xlsx_patch.WORKBOOK_PART))
+        targets = _relationship_targets(archive, xlsx_patch.WORKBOOK_RELS_PART, xlsx_patch.WORKBOOK_PART)
+        self._parts = {}
+        for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+            self._parts[sheet.get("name")] = targets.get(sheet.get(f"{{{NS_REL}}}id"), (None, None))[1]
+        self._sheetnames = list(self._parts)
+
+        view = workbook.find(f"{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        self._active = self._sheetnames[active] if 0 <= active < len(self._sheetnames) else self._sheetnames[0]
+
+        properties = workbook.find(f"{{{NS_MAIN}}}workbookPr")
+        date1904 = properties is not None and properties.get("date1904", "").lower() in ("1", "true")
+        self._epoch = _MAC_EPOCH if date1904 else _WINDOWS_EPOCH
+
+        parts = {kind: part for kind, part in targets.values()}
+        self._shared_strings = _SharedStrings(archive, parts.get(SHARED_STRINGS_TYPE))
+        self._date_styles, self._timedelta_styles = self._read_styles(parts.get(STYLES_TYPE))
+
+    def _read_styles(self, part):
+        """日付書式・時間の長さの書式のセルスタイル番号"""
+        date_styles, timedelta_styles = set(), set()
+        if part is None or part not in self._archive.namelist():
+            return date_styles, timedelta_styles
+        styles = ElementTree.fromstring(self._archive.read(part))
+        custom = {int(fmt.get("numFmtId")): fmt.get("formatCode", "")
+                  for fmt in styles.iter(f"{{{NS_MAIN}}}numFmt")}
+        cell_xfs = styles.find(f"{{{NS_MAIN}}}cellXfs")
+        for index, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+            format_id = int(xf.get("numFmtId", 0))
+            if format_id in custom:
+                code = custom[format_id]
+                is_date, is_timedelta = _is_date_format(code), _TIMEDELTA_RE.search(code.split(";")[0]) is not None
+            else:
+                is_date, is_timedelta = format_id in _BUILTIN_DATE_FORMATS, format_id in _BUILTIN_TIMEDELTA_FORMATS
+            if is_date:
+                date_styles.add(index)
+            if is_timedelta:
+                timedelta_styles.add(index)
+        return date_styles, timedelta_styles
+
+    @property
+    def sheetnames(self):
+        return list(self._sheetnames)
+
+    @property
+    def active(self):
+        return self._active
+
+    def _value(self, cell, ref):
+        """セル要素の値（openpyxl の data_only と同じ型）"""
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            child = cell.find(_INLINE)
+            return _text_content(child) if child is not None else None
+        text = cell.findtext(_VALUE)
+        if not text:
+            return None
+        if data_type == "n":
+            value = _cast_number(text)
+            style = cell.get("s")
+            if style and int(style) in self._date_styles:
+                return self._to_date(value, int(style), ref)
+            return value
+        if data_type == "s":
+            return self._shared_strings[int(text)]
+        if data_type == "b":
+            return bool(int(text))
+        if data_type in ("str", "e"):
+            return text
+        raise ReaderUnsupported(f"{ref} のセルの型 {data_type} は扱えません")
+
+    def _to_date(self, value, style, ref):
+        if style in self._timedelta_styles:
+            raise ReaderUnsupported(f"{ref} は時間の長さの書式です")
+        day, fraction = divmod(value, 1)
+        diff = datetime.timedelta(milliseconds=round(fraction * 86400 * 1000))
+        if 0 <= value < 1 and diff.days == 0:
+            return (datetime.datetime.min + diff).time()
+        if 0 < value < 60 and self._epoch == _WINDOWS_EPOCH:
+            day += 1
+        try:
+            return self._epoch + datetime.timedelta(days=day) + diff
+        except OverflowError as e:
+            raise ReaderUnsupported(f"{ref} の日付が範囲外です") from e
+
+    def _parse(self, sheetname, max_row):
+        """(行番号, 行要素) を順に返す。max_row を超えた行は (行番号, None) を返して打ち切る（省略時は最後まで）。
+        最初の値は dimension の (最終列, 最終行)（無ければ (None, None)）。他のツールが書いたブックは dimension が
+        古い・"A1" だけのことがあるため、dimension では打ち切らない（行の幅の目安にだけ使う）"""
+        part = self._parts[sheetname]
+        if part is None:
+            raise ReaderUnsupported(f"{sheetname} シートのパートが見つかりません")
+        with self._archive.open(part) as source:
+            # 開始タグのイベントは取らない（セル数の 2 倍のイベントになるため）
+            dimension = None
+            limit = None
+            row_num = 0
+            for _, element in ElementTree.iterparse(source):
+                tag = element.tag
+                if tag == _ROW:
+                    if limit is None:
+                        dimension = dimension or (None, None)
+                        yield dimension
+                        limit = max_row or 0
+                    ref = element.get("r")
+                    row_num = int(ref) if ref else row_num + 1
+                    if limit and row_num > limit:
+                        yield row_num, None
+                        return
+                    yield row_num, element
+                    element.clear()
+                elif tag == _DIMENSION:
+                    dimension = _dimension_end(element.get("ref"))
+            if limit is None:
+                yield dimension or (None, None)
+
+    def _cells(self, row_element, wanted=None):
+        """行要素の {列: 値}（wanted を指定すればその列だけ変換する）"""
+        cells = {}
+        column = 0
+        for cell in row_element:
+            if cell.tag != _CELL:
+                continue
+            ref = cell.get("r")
+            column = _column_of(ref) if ref else column + 1
+            if wanted is None or column in wanted:
+                cells[column] = self._value(cell, ref or f"{column}列目")
+        return cells
+
+    def rows(self, sheetname, min_row=1, max_row=None):
+        parser = self._parse(sheetname, max_row)
+        max_col, _ = _first(parser)
+        counter = min_row
+        row_num = 0
+        for row_num, element in self._guard(parser):
+            if element is None:
+                break
+            for _ in range(counter, row_num):
+                counter += 1
+                yield (None,) * max_col if max_col else ()
+            if counter <= row_num:
+                counter += 1
+                cells = self._cells(element)
+                width = max(max_col or 0, max(cells) if cells else 0)
+                yield tuple(cells.get(column) for column in range(1, width + 1))
+        if max_row is not None and max_row < row_num:
+            for _ in range(counter, max_row + 1):
+                yield (None,) * max_col if max_col else ()
+
+    def columns(self, sheetname, columns, min_row=1):
+        wanted = set(columns)
+        parser = self._parse(sheetname, None)
+        _first(parser)
+        empty = (None,) * len(columns)
+        counter = min_row
+        for row_num, element in self._guard(parser):
+            for _ in range(counter, row_num):
+                yield counter, empty
+                counter += 1
+            if counter <= row_num:
+                cells = self._cells(element, wanted)
+                yield counter, tuple(cells.get(column) for column in columns)
+                counter += 1
+
+    @staticmethod
+    def _guard(parser):
+        """解析中の XML・値のエラーを ReaderUnsupported にする"""
+        try:
+            yield from parser
+        except (ElementTree.ParseError, KeyError, ValueError) as e:
+            raise ReaderUnsupported(f"ワークシートを解析できません: {e}") from e
+
+    def close(self):
+        self._shared_strings.close()
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()